@@ -1,19 +1,29 @@
 # app/api.py
 
 import os
+import threading
+from datetime import date, datetime, time, timedelta, timezone
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import Settings
+from .logging_system import configure_logging, get_logger, log_timings, trace, stage, render_metrics, CONTENT_TYPE
 from .ingestion import ingest_pdfs
-from .rag.retriever import retrieve_documents
-from .llm import answer_with_context
-from .models.reranker_training import train_reranker  # NEW IMPORT
+from .rag.retriever import aretrieve_documents
+from .rag.reranker import activate_reranker, register_reranker
+from backend.model_registry import get_model_registry
+from backend.jobs import get_job_manager
+from backend.job_routes import job_router
+from backend.config import MODEL_WARMUP
+from backend.rag.filters import MetadataFilter
 
 settings = Settings()
 
+configure_logging(settings.debug)
+logger = get_logger(__name__)
+
 app = FastAPI(title="RAG System API")
 
 app.add_middleware(
@@ -24,6 +34,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reranker training runs as a background job in a worker process
+jobs = get_job_manager("app")
+app.include_router(job_router(jobs))
+
 # Static files
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
@@ -36,9 +50,27 @@ def serve_frontend():
     return FileResponse(index_path)
 
 
+@app.on_event("startup")
+def warm_models():
+    # Load + warm the shared reranker in the background (see backend/model_registry.py)
+    registry = get_model_registry()
+    register_reranker()
+    if MODEL_WARMUP:
+        threading.Thread(target=registry.warm_all, name="model-warmup", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_jobs():
+    # Retrained weights are swapped in once warmed, no restart needed
+    jobs.on_complete("train_reranker", lambda job: activate_reranker(job["result"]["version"]))
+    jobs.start()
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    # Readiness: 503 until every registered model is loaded and warmed
+    report = get_model_registry().health()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
 
 
 @app.post("/ingest")
@@ -47,23 +79,66 @@ def ingest_endpoint():
     return {"message": "Ingestion complete", "documents": num_docs, "chunks": num_chunks}
 
 
+def _epoch(day: str) -> float:
+    return datetime.combine(date.fromisoformat(day), time.min, tzinfo=timezone.utc).timestamp()
+
+
+def _payload_filter(payload: dict):
+    """
+    Metadata filter from the optional payload keys: sources (PDF filenames
+    in raw_dir), page_from / page_to (1-based, inclusive), date_from /
+    date_to (YYYY-MM-DD, inclusive). Raises ValueError on bad values.
+    """
+    sources = payload.get("sources")
+    date_to = payload.get("date_to")
+    flt = MetadataFilter(
+        sources=[os.path.join(settings.raw_dir, name) for name in sources] if sources else None,
+        page_from=payload.get("page_from"),
+        page_to=payload.get("page_to"),
+        date_from=_epoch(payload["date_from"]) if payload.get("date_from") else None,
+        date_to=_epoch(date_to) + timedelta(days=1).total_seconds() if date_to else None,
+    )
+    return None if flt.is_empty else flt
+
+
 @app.post("/query")
-def query_endpoint(payload: dict):
+async def query_endpoint(payload: dict):
     question = payload.get("query", "")
     if not question:
         return {"error": "Query cannot be empty"}
 
-    retrieved_docs = retrieve_documents(question)
-    context = "\n\n".join([d.page_content for d in retrieved_docs])
-    answer = answer_with_context(question, context)
+    try:
+        filters = _payload_filter(payload)
+    except (TypeError, ValueError) as e:
+        return {"error": f"Invalid filter: {e}"}
+
+    with trace() as stage_ms:
+        with stage("request"):
+            result = await aretrieve_documents(question, filters=filters)
+    log_timings(logger, "/query", stage_ms)
+
+    response = {
+        "answer": result["answer"],
+        "context_documents": result["num_chunks"],
+        "timings": result["timings"],
+        "reranker_version": result["reranker_version"],
+        "prompt_tokens": result["prompt_tokens"],
+    }
+    if payload.get("include_timings"):
+        response["stage_ms"] = stage_ms
+    return response
+
 
-    return {"answer": answer, "context_documents": len(retrieved_docs)}
+@app.get("/metrics")
+def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
 
 
 # ---------------------------------------------------
 # NEW: Train Reranker Endpoint
 # ---------------------------------------------------
-@app.post("/train/reranker")
+@app.post("/train/reranker", status_code=202)
 def train_reranker_endpoint():
-    logs = train_reranker()
-    return {"message": "Training complete", "logs": logs}
+    # Poll /jobs/{job_id}; the result holds the new version and the training logs
+    job = jobs.submit("train_reranker", "app.models.reranker_training:train_reranker", group="train")
+    return {"message": "Training started", "job_id": job["id"], "status": job["status"]}
@@ -24,6 +24,12 @@ class Settings(BaseSettings):
     embedding_model: str = "text-embedding-3-small"
     chat_model: str = "gpt-4o-mini"
 
+    # ------------------------
+    # Ingestion
+    # ------------------------
+    ingest_workers: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    ingest_batch_size: int = 256
+
     # ------------------------
     # App settings
     # ------------------------
@@ -1,10 +1,39 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 
-from .config import settings
+from backend.embedding_cache import get_embedding_cache
+
+from .config import Settings
+
+settings = Settings()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper around the shared on-disk embedding cache.
+    Chunks that survive a reindex and repeated queries are not re-embedded.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str):
+        self.inner = inner
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_embedding_cache().embed(self.model_name, texts, self.inner.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_embedding_cache().embed(
+            self.model_name, [text], lambda t: [self.inner.embed_query(t[0])]
+        )[0]
 
 
-def get_embedding_model() -> OpenAIEmbeddings:
-    return OpenAIEmbeddings(
-        model=settings.openai_embedding_model,
-        api_key=settings.openai_api_key,
+def get_embedding_model() -> CachedEmbeddings:
+    return CachedEmbeddings(
+        OpenAIEmbeddings(
+            model=settings.embedding_model,
+            api_key=settings.openai_api_key,
+        ),
+        model_name=settings.embedding_model,
     )
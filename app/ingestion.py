@@ -2,17 +2,55 @@
 
 import os
 import glob
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.schema import Document  # LangChain v0.2 compatible
 
+from backend.config import API_WORKERS, DENSE_BACKEND
+from backend.manifest import IngestManifest
+from backend.pipeline import parallel_map
+from backend.rag.chunking import chunk_id, document_date
+
 from .config import Settings
 from .rag.chunking import semantic_adaptive_chunk
-from .vectorstore import add_documents
+from .vectorstore import add_documents, delete_documents, get_app_flat_index, index_generation, refresh_flat_index
+from .rag.hybrid_search import export_shared_index, index_documents, remove_documents, shared_index
 
 settings = Settings()
 
+# Recorded in the manifest; bump when chunk text or metadata changes so
+# existing files are re-ingested (v1: page / page_end / doc_date for filters)
+CHUNKER_VERSION = "app-pages-v1"
+
+
+def _manifest_path() -> str:
+    return os.path.join(settings.data_dir, "chroma", "manifest.json")
+
+
+def _load_pdf_pages(path: str) -> List[Tuple[int, str]]:
+    """
+    Worker: extract the non-empty pages of one PDF as (page_number, text).
+    """
+    pages = PyPDFLoader(path).load()
+    return [(i, page.page_content) for i, page in enumerate(pages) if page.page_content]
+
+
+def _load_and_chunk_pdf(path: str) -> List[Tuple[int, List[str]]]:
+    """
+    Worker: extract one PDF and chunk each of its pages.
+    """
+    return [(page_no, semantic_adaptive_chunk(text)) for page_no, text in _load_pdf_pages(path)]
+
+
+def _write_batch(docs: List[Document], ids: List[str]) -> int:
+    """
+    Upsert one batch into the vectorstore and make it searchable by BM25.
+    """
+    add_documents(docs, ids=ids)
+    index_documents(ids, [d.page_content for d in docs], [d.metadata for d in docs])
+    return len(docs)
+
 
 def load_pdfs(raw_dir: Optional[str] = None) -> List[str]:
     """
@@ -29,12 +67,8 @@ def load_pdfs(raw_dir: Optional[str] = None) -> List[str]:
 
     page_texts: List[str] = []
 
-    for path in pdf_paths:
-        loader = PyPDFLoader(path)
-        pages = loader.load()
-        for page in pages:
-            if page.page_content:
-                page_texts.append(page.page_content)
+    for _, pages in parallel_map(_load_pdf_pages, pdf_paths, workers=settings.ingest_workers):
+        page_texts.extend(text for _, text in pages)
 
     return page_texts
 
@@ -64,10 +98,15 @@ def chunk_pages_to_documents(page_texts: List[str]) -> List[Document]:
 def ingest_pdfs(raw_dir: Optional[str] = None):
     """
     Main ingestion pipeline:
-    1. Load raw PDFs into page texts
-    2. Chunk pages into semantic chunks
-    3. Turn chunks into Document objects
-    4. Push Documents into the vectorstore
+    0. Diff PDFs against the content-hash manifest; drop chunks of
+       modified / removed files and skip unchanged ones
+    1. Load raw PDFs into page texts       } in parallel worker
+    2. Chunk pages into semantic chunks    } processes, per PDF
+    3. Turn chunks into Document objects with deterministic ids
+    4. Upsert Documents into the vectorstore in batches
+    5. Append the new chunks to the BM25 index
+    6. Rebuild the shared indexes (flat dense index with DENSE_BACKEND=flat,
+       BM25 export with API_WORKERS > 1) and bump the index generation
 
     Returns:
       (num_pdfs, num_chunks)
@@ -83,16 +122,70 @@ def ingest_pdfs(raw_dir: Optional[str] = None):
             "No PDFs found in {}. Drop PDFs there and run again.".format(raw_dir)
         )
 
-    # 1) Load pages
-    page_texts = load_pdfs(raw_dir)
+    # 0) Incremental: only new / modified files are re-processed
+    manifest = IngestManifest.load(_manifest_path())
+    to_ingest, removed, _ = manifest.diff(pdf_paths, CHUNKER_VERSION)
+
+    stale_ids = manifest.chunk_ids(list(to_ingest) + removed)
+    if stale_ids:
+        delete_documents(stale_ids)
+        remove_documents(stale_ids)
+    for source in removed:
+        manifest.forget(source)
+
+    num_chunks = 0
+    batch: List[Document] = []
+    batch_ids: List[str] = []
+
+    # 1-2) Load + chunk PDFs in worker processes, streamed back in order
+    for path, page_chunks in parallel_map(_load_and_chunk_pdf, list(to_ingest), workers=settings.ingest_workers):
+        file_ids = []
+        doc_date = document_date(path)
+
+        # 3) Build Documents (page chunks never span pages: page_end == page)
+        for page_no, chunks in page_chunks:
+            for chunk_index, chunk in enumerate(chunks):
+                metadata = {
+                    "source": path,
+                    "page_index": page_no,
+                    "page": page_no + 1,
+                    "page_end": page_no + 1,
+                    "doc_date": doc_date,
+                    "chunk_index": chunk_index,
+                }
+                batch.append(Document(page_content=chunk, metadata=metadata))
+                batch_ids.append(chunk_id(path, f"{page_no}:{chunk_index}"))
+                file_ids.append(batch_ids[-1])
+
+        manifest.record(path, to_ingest[path], file_ids, CHUNKER_VERSION)
+
+        # 4-5) Single writer: flush full batches
+        if len(batch) >= settings.ingest_batch_size:
+            num_chunks += _write_batch(batch, batch_ids)
+            batch, batch_ids = [], []
+
+    if batch:
+        num_chunks += _write_batch(batch, batch_ids)
+
+    manifest.save()
+
+    # 6) Re-export the memory-mapped indexes, then tell the other workers
+    if to_ingest or removed:
+        if API_WORKERS > 1:
+            export_shared_index()
+        if DENSE_BACKEND == "flat":
+            refresh_flat_index()
+        index_generation().bump()
 
-    # 2) Chunk pages and build Documents
-    docs = chunk_pages_to_documents(page_texts)
-
-    # 3) Store in vectorstore
-    if docs:
-        add_documents(docs)
+    return num_pdfs, num_chunks
 
-    num_chunks = len(docs)
 
-    return num_pdfs, num_chunks
+def prepare_shared_indexes() -> None:
+    """
+    Build the indexes API workers map if they do not exist yet. Called
+    once by the launcher before it starts API_WORKERS processes.
+    """
+    if shared_index() is None:
+        export_shared_index()
+    if DENSE_BACKEND == "flat" and get_app_flat_index() is None:
+        refresh_flat_index()
@@ -9,20 +9,28 @@ Bank-grade LLM answer generator with:
 - OpenAI / LangChain v0.2+ support
 """
 
+from functools import lru_cache
 from typing import Optional
 from langchain_openai import ChatOpenAI
 
+from backend.rag.token_budget import get_token_counter
+from .logging_system import stage, LLM_TOKENS
+
+CHAT_MODEL = "gpt-4o-mini"
+
 # --------------------------------------------------------------------
 # 1. Load model (replace with AzureOpenAI if needed)
 # --------------------------------------------------------------------
 
+@lru_cache(maxsize=1)
 def _load_llm() -> ChatOpenAI:
     """
     Load model using LangChain v0.2+ compatible API.
     You may replace with gpt-4o-mini or Azure endpoints.
+    Built once per process so its HTTP connection pool is reused.
     """
     return ChatOpenAI(
-        model="gpt-4o-mini",
+        model=CHAT_MODEL,
         temperature=0.0,
         max_tokens=600,
     )
@@ -62,27 +70,55 @@ Instructions:
 # 3. Main function used by retriever + FastAPI
 # --------------------------------------------------------------------
 
-def answer_with_context(query: str, context: str) -> str:
-    """
-    Generate an LLM answer constrained strictly to retrieved context.
-    Required for bank-grade RAG deployments.
-    """
-
-    llm = _load_llm()
-
+def _build_messages(query: str, context: str):
     # Build final prompt
     prompt = USER_PROMPT_TEMPLATE.format(
         query=query.strip(),
         context=context.strip()
     )
 
-    messages = [
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": prompt},
     ]
 
+
+def count_prompt_tokens(query: str, context: str) -> int:
+    """
+    Tokens of the chat prompt answer_with_context() sends.
+    """
+    return get_token_counter(CHAT_MODEL).count_messages(_build_messages(query, context))
+
+
+def _record_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
+
+
+def answer_with_context(query: str, context: str) -> str:
+    """
+    Generate an LLM answer constrained strictly to retrieved context.
+    Required for bank-grade RAG deployments.
+    """
+
     # Call model
-    response = llm.invoke(messages)
+    with stage("llm"):
+        response = _load_llm().invoke(_build_messages(query, context))
+    _record_usage(response)
 
     # LangChain returns AIMessage with .content
     return response.content
+
+
+async def aanswer_with_context(query: str, context: str) -> str:
+    """
+    Async variant of answer_with_context() for the async API path.
+    """
+
+    with stage("llm"):
+        response = await _load_llm().ainvoke(_build_messages(query, context))
+    _record_usage(response)
+
+    return response.content
@@ -0,0 +1,40 @@
+# app/logging_system.py
+
+"""
+Logging and request instrumentation for the app stack.
+
+- configure_logging(): one consistent log format for the API process
+- stage / trace / counters: the shared metrics layer (backend/metrics.py),
+  re-exported so app modules instrument themselves the same way the
+  backend does and both show up on /metrics
+- log_timings(): one INFO line per request with its stage breakdown
+"""
+
+import logging
+from typing import Dict
+
+from backend.metrics import (  # noqa: F401
+    CACHE_REQUESTS,
+    CONTENT_TYPE,
+    LLM_TOKENS,
+    RERANK_CANDIDATES,
+    record_stage,
+    render_metrics,
+    stage,
+    trace,
+)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure_logging(debug: bool = False):
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, format=LOG_FORMAT)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def log_timings(logger: logging.Logger, endpoint: str, timings: Dict[str, float]):
+    breakdown = " ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items())
+    logger.info(f"{endpoint} {breakdown}")
@@ -4,30 +4,19 @@
 Runtime neural reranker for your RAG system.
 
 Features:
-- Loads your fine-tuned model from app/models/reranker_model/
-- Falls back to pre-trained lightweight model if fine-tuned version does not exist
+- Serves the active reranker version (fine-tuned by /train/reranker, or
+  the pretrained base) through the same ServingModel as app/rag/reranker.py
 - Provides a clean cross_encoder_rerank() function used in retrieval
+- Scores in length-sorted batches padded to the longest pair
+- Loaded on first use through the shared model registry, not at import
 """
 
-import os
-import torch
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from langchain.schema import Document
 
-
-# ------------------------------------------------------------
-# Model paths
-# ------------------------------------------------------------
-
-# Fine-tuned model directory
-FINE_TUNED_MODEL_DIR = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)), "models", "reranker_model"
-)
-
-# Fallback model
-FALLBACK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-2-v2"
+from ..logging_system import stage, RERANK_CANDIDATES
+from ..rag.reranker import _load_model
 
 
 # ------------------------------------------------------------
@@ -36,35 +25,23 @@ FALLBACK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-2-v2"
 
 def load_reranker():
     """
-    Loads the fine-tuned reranker if available.
-    Otherwise loads a default pre-trained model.
+    The active version's shared cross-encoder (picks up newly activated
+    versions), or None if no model can be loaded.
     """
-
-    if os.path.exists(FINE_TUNED_MODEL_DIR):
-        print("🔹 Loading fine-tuned reranker model...")
-        tokenizer = AutoTokenizer.from_pretrained(FINE_TUNED_MODEL_DIR)
-        model = AutoModelForSequenceClassification.from_pretrained(FINE_TUNED_MODEL_DIR)
-    else:
-        print("⚠️ Fine-tuned reranker not found. Using fallback model:", FALLBACK_MODEL_NAME)
-        tokenizer = AutoTokenizer.from_pretrained(FALLBACK_MODEL_NAME)
-        model = AutoModelForSequenceClassification.from_pretrained(FALLBACK_MODEL_NAME)
-
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
-    model.eval()
-
-    return tokenizer, model, device
-
-
-# Load once on module import
-TOKENIZER, MODEL, DEVICE = load_reranker()
+    loaded = _load_model()
+    return loaded[1] if loaded is not None else None
 
 
 # ------------------------------------------------------------
 # Reranking function
 # ------------------------------------------------------------
 
-def cross_encoder_rerank(query: str, docs: List[Document], top_k: int = 5) -> List[Tuple[Document, float]]:
+def cross_encoder_rerank(
+    query: str,
+    docs: List[Document],
+    top_k: int = 5,
+    batch_size: Optional[int] = None,
+) -> List[Tuple[Document, float]]:
     """
     Reranks retrieved documents using the cross-encoder model.
     Returns: list of (document, score) sorted descending.
@@ -73,25 +50,21 @@ def cross_encoder_rerank(query: str, docs: List[Document], top_k: int = 5) -> Li
     if not docs:
         return []
 
-    scored_docs = []
-
-    for doc in docs:
-        text = doc.page_content
+    model = load_reranker()
+    if model is None:
+        # Keep the retrieval order
+        return [(doc, 0.0) for doc in docs[:top_k]]
 
-        inputs = TOKENIZER(
+    with stage("rerank"):
+        scores = model.score(
             query,
-            text,
-            truncation=True,
-            padding="max_length",
+            [doc.page_content for doc in docs],
+            batch_size=batch_size,
             max_length=128,
-            return_tensors="pt",
-        ).to(DEVICE)
-
-        with torch.no_grad():
-            logits = MODEL(**inputs).logits
-            score = float(logits.squeeze().cpu().item())
+        )
+    RERANK_CANDIDATES.inc(len(docs))
 
-        scored_docs.append((doc, score))
+    scored_docs = list(zip(docs, scores))
 
     # Sort by score descending
     scored_docs.sort(key=lambda x: x[1], reverse=True)
@@ -4,7 +4,9 @@
 Neural Reranker Training Script (Backprop)
 Now supports:
 - being called from FastAPI
-- returning training logs as a string for the UI
+- saving each run as a new reranker version (backend/rag/reranker_versions.py),
+  which the app activates once the job succeeds
+- returning training logs for the UI
 """
 
 import os
@@ -20,13 +22,14 @@ multiprocessing.set_start_method("spawn", force=True)
 
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+from backend.rag.reranker_versions import new_version, version_dir, write_version_meta
+
 
 # -------------------------------------------------------------
 # 1. Config
 # -------------------------------------------------------------
 
 MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-2-v2"
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "reranker_model")
 NUM_EPOCHS = 3
 LEARNING_RATE = 2e-5
 
@@ -63,7 +66,7 @@ TRAIN_DATA = [
 # 3. Training function (returns logs)
 # -------------------------------------------------------------
 
-def train_reranker() -> str:
+def train_reranker() -> dict:
 
     logs = []
     logs.append("Starting reranker training process...\n")
@@ -113,10 +116,17 @@ def train_reranker() -> str:
         avg = epoch_loss / len(TRAIN_DATA)
         logs.append(f"Epoch {epoch+1} average loss: {avg:.4f}\n")
 
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    model.save_pretrained(OUTPUT_DIR)
-    tokenizer.save_pretrained(OUTPUT_DIR)
+    version = new_version()
+    save_path = version_dir(version)
+    os.makedirs(save_path, exist_ok=True)
+    model.save_pretrained(save_path)
+    tokenizer.save_pretrained(save_path)
+    write_version_meta(version, {
+        "base": MODEL_NAME,
+        "epochs": NUM_EPOCHS,
+        "samples": len(TRAIN_DATA),
+    })
 
-    logs.append("\nTraining complete. Fine-tuned model saved.\n")
+    logs.append(f"\nTraining complete. Fine-tuned model saved as version {version}.\n")
 
-    return "".join(logs)
+    return {"version": version, "model_path": save_path, "logs": "".join(logs)}
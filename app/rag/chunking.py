@@ -1,7 +1,25 @@
 # app/rag/chunking.py
 
+"""
+Sentence-aware adaptive chunker.
+
+Each page is tokenized once: sentences (NLTK punkt) and words become
+integer offset arrays into the page text. Windowing, merging of small
+chunks and overlap all work on those offsets; the page text is sliced
+only when the final chunk strings are built. The output is identical
+to the original string-based implementation
+(benchmarks/bench_chunking.py checks this and times both).
+
+Token counts for windowing default to whitespace words; pass any
+callable str -> int (e.g. token_counter("gpt-4o-mini")) to count real
+model tokens instead.
+"""
+
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
 import nltk
-from typing import List
+import numpy as np
 
 # Ensure sentence tokenizer exists
 try:
@@ -10,6 +28,19 @@ except LookupError:
     nltk.download("punkt")
 
 
+# Tokenized pages kept for re-chunking (see _tokenize_page)
+PAGE_CACHE_SIZE = 64
+
+# str.split() whitespace: every such code point is <= U+3000
+_MAX_SPACE = 0x3000
+_IS_SPACE = np.array([chr(c).isspace() for c in range(_MAX_SPACE + 1)] + [False])
+
+# A chunk is a list of parts joined by single spaces:
+#   ("s", i)        sentence i, sliced verbatim from the page
+#   ("w", lo, hi)   words lo..hi-1 of one sentence, joined by single spaces
+Part = Tuple
+
+
 def split_into_sentences(text: str) -> List[str]:
     """
     Breaks raw text into sentences.
@@ -18,85 +49,194 @@ def split_into_sentences(text: str) -> List[str]:
     return [s.strip() for s in sentences if s.strip()]
 
 
+def sentence_spans(text: str, splitter: Optional[Callable[[str], List[str]]] = None) -> List[Tuple[int, int]]:
+    """
+    (start, end) offsets of the stripped sentences of `text`. Punkt returns
+    slices of the input, so each one is found right after the previous one.
+    """
+    spans = []
+    pos = 0
+    for sentence in (splitter or split_into_sentences)(text):
+        start = text.find(sentence, pos)
+        pos = start + len(sentence)
+        spans.append((start, pos))
+    return spans
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    """
+    Model tokenizer counts (tiktoken, see backend/rag/token_budget.py).
+    """
+    from backend.rag.token_budget import get_token_counter
+
+    counter = get_token_counter(model)
+    return lambda s: counter.count(s)
+
+
+class _Page:
+    """
+    One page tokenized once: sentence spans + word offset arrays.
+
+    Words are found for the whole page at once (runs of non-whitespace,
+    as str.split() sees them), with a forced break at every sentence
+    edge so no word spans two sentences.
+    """
+
+    def __init__(self, text: str, spans: List[Tuple[int, int]]):
+        self.text = text
+        self.spans = spans
+
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        word = ~_IS_SPACE[np.minimum(codes, _MAX_SPACE + 1)]
+
+        bounds = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        sent_start, sent_end = bounds[:, 0], bounds[:, 1]
+
+        is_start = word.copy()
+        is_start[1:] &= ~word[:-1]
+        is_start[sent_start] = True
+        is_end = word.copy()
+        is_end[:-1] &= ~word[1:]
+        is_end[sent_end - 1] = True
+        # ...and close/open the neighbouring word when text runs into a sentence
+        is_end[sent_start[sent_start > 0] - 1] |= word[sent_start[sent_start > 0] - 1]
+        is_start[sent_end[sent_end < len(word)]] |= word[sent_end[sent_end < len(word)]]
+
+        # Words outside every sentence are never used; keep the arrays
+        # aligned anyway (every start has its end)
+        self.word_start = np.flatnonzero(is_start)
+        self.word_end = np.flatnonzero(is_end) + 1
+
+        # Sentence i covers words sent_lo[i]..sent_hi[i]-1
+        self.sent_lo = np.searchsorted(self.word_start, sent_start).tolist()
+        self.sent_hi = np.searchsorted(self.word_start, sent_end).tolist()
+
+    def part_words(self, part: Part) -> Tuple[int, int]:
+        if part[0] == "s":
+            return self.sent_lo[part[1]], self.sent_hi[part[1]]
+        return part[1], part[2]
+
+    def words_text(self, lo: int, hi: int) -> str:
+        # Words lo..hi-1 lie inside one sentence: split() of the slice is exactly them
+        if lo >= hi:
+            return ""
+        return " ".join(self.text[int(self.word_start[lo]):int(self.word_end[hi - 1])].split())
+
+    def render(self, parts: List[Part]) -> str:
+        out = []
+        for part in parts:
+            if part[0] == "s":
+                start, end = self.spans[part[1]]
+                out.append(self.text[start:end])
+            else:
+                out.append(self.words_text(part[1], part[2]))
+        return " ".join(out)
+
+    def tail(self, parts: List[Part], overlap_tokens: int) -> str:
+        """
+        words[-overlap_tokens:] of a chunk, with list slice semantics.
+        """
+        ranges = [self.part_words(p) for p in parts]
+        n_words = sum(hi - lo for lo, hi in ranges)
+        skip = slice(-overlap_tokens, None).indices(n_words)[0]
+
+        out = []
+        for lo, hi in ranges:
+            if skip >= hi - lo:
+                skip -= hi - lo
+                continue
+            out.append(self.words_text(lo + skip, hi))
+            skip = 0
+        return " ".join(out)
+
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def _tokenize_page(text: str, splitter: Optional[Callable[[str], List[str]]] = None) -> _Page:
+    # Re-chunking a page (another chunk size, a re-ingest) skips punkt and the word scan
+    return _Page(text, sentence_spans(text, splitter))
+
+
 def semantic_adaptive_chunk(
     text: str,
     max_tokens: int = 350,
     min_tokens: int = 80,
     overlap_tokens: int = 40,
     tokenizer=None,
+    sentence_splitter: Optional[Callable[[str], List[str]]] = None,
 ) -> List[str]:
     """
     Bank-grade chunking:
     - sentence-level segmentation
-    - dynamic windowing
-    - soft overlap
+    - dynamic windowing (max_tokens, counted by `tokenizer`)
+    - small chunks (< min_tokens words) merged into the next
+    - soft overlap (last overlap_tokens words of the previous chunk)
     """
+    page = _tokenize_page(text, sentence_splitter)
+    n_sentences = len(page.spans)
 
-    # Basic fallback tokenizer
+    # Basic fallback tokenizer: whitespace words, already counted
     if tokenizer is None:
-        tokenizer = lambda s: len(s.split())
-
-    sentences = split_into_sentences(text)
-
-    chunks = []
-    current_chunk = []
+        sent_lens = [hi - lo for lo, hi in zip(page.sent_lo, page.sent_hi)]
+    else:
+        sent_lens = [tokenizer(text[s:e]) for s, e in page.spans]
+
+    # 1. Windowing over sentences; each chunk is a list of parts plus
+    #    its word count (for merging)
+    chunks: List[Tuple[List[Part], int]] = []
+    current: List[Part] = []
     current_len = 0
+    current_words = 0
 
-    for sentence in sentences:
-        sent_len = tokenizer(sentence)
+    for i in range(n_sentences):
+        sent_len = sent_lens[i]
+        lo, hi = page.sent_lo[i], page.sent_hi[i]
 
-        # Hard split very long sentences
+        # Hard split very long sentences into max_tokens-word pieces
         if sent_len > max_tokens:
-            words = sentence.split()
-            temp = []
-            count = 0
-
-            for w in words:
-                if count + 1 > max_tokens:
-                    chunks.append(" ".join(temp))
-                    temp = []
-                    count = 0
-                temp.append(w)
-                count += 1
-
-            if temp:
-                chunks.append(" ".join(temp))
-
+            step = max_tokens
+            if max_tokens <= 0:
+                # One word per piece, after an empty one (as the string version did)
+                step = 1
+                chunks.append(([("w", lo, lo)], 0))
+            for start in range(lo, hi, step):
+                end = min(start + step, hi)
+                chunks.append(([("w", start, end)], end - start))
             continue
 
         # Create new chunk if window is exceeded
         if current_len + sent_len > max_tokens:
-            chunks.append(" ".join(current_chunk).strip())
-            current_chunk = [sentence]
+            chunks.append((current, current_words))
+            current = [("s", i)]
             current_len = sent_len
+            current_words = hi - lo
         else:
-            current_chunk.append(sentence)
+            current.append(("s", i))
             current_len += sent_len
-
-    if current_chunk:
-        chunks.append(" ".join(current_chunk).strip())
-
-    # Merge small chunks
-    merged = []
-    for c in chunks:
-        if not merged:
-            merged.append(c)
-            continue
-
-        if len(merged[-1].split()) < min_tokens:
-            merged[-1] = merged[-1] + " " + c
+            current_words += hi - lo
+
+    if current:
+        chunks.append((current, current_words))
+
+    # 2. Merge small chunks into the next one
+    merged: List[List[Part]] = []
+    merged_words: List[int] = []
+    for parts, n_words in chunks:
+        if merged and merged_words[-1] < min_tokens:
+            merged[-1].extend(parts)
+            merged_words[-1] += n_words
         else:
-            merged.append(c)
+            merged.append(parts)
+            merged_words.append(n_words)
 
-    # Apply overlap
+    # 3. Overlap (last words of the previous chunk); only now slice the text
     final_chunks = []
-    for idx, c in enumerate(merged):
+    for idx, parts in enumerate(merged):
+        body = page.render(parts)
         if idx == 0:
-            final_chunks.append(c)
+            final_chunks.append(body)
             continue
 
-        prev_words = merged[idx - 1].split()
-        overlap = " ".join(prev_words[-overlap_tokens:])
-        final_chunks.append(f"{overlap} {c}".strip())
+        overlap = page.tail(merged[idx - 1], overlap_tokens)
+        final_chunks.append(f"{overlap} {body}".strip())
 
     return final_chunks
@@ -7,7 +7,8 @@ This module implements:
 - deduplication
 - stable sorting
 - overlap-aware merging
-- token budgeting
+- token budgeting (model tokenizer via backend/rag/token_budget.py, with
+  cached per-chunk counts; the last chunk is cut at a sentence boundary)
 - audit-friendly formatting
 
 The output is a clean, deterministic block of text
@@ -17,21 +18,26 @@ that can be safely fed into an LLM for constrained reasoning.
 from typing import List
 import hashlib
 
+from backend.rag.token_budget import context_budget, get_token_counter
+from ..logging_system import stage
+
 
 def _hash_text(t: str) -> str:
     """Stable SHA-1 hash for deduplication."""
     return hashlib.sha1(t.encode("utf-8")).hexdigest()
 
 
-def _tokenize(text: str) -> List[str]:
-    """Simple fallback tokenizer; banks prefer deterministic tokenizers."""
+def _words(text: str) -> List[str]:
+    """Whitespace words, for the tiny/noisy chunk filter."""
     return text.split()
 
 
+@stage("context_build")
 def build_context(
     chunks: List[str],
     max_tokens: int = 1400,
     min_chunk_len: int = 20,
+    model: str = "gpt-4o-mini",
 ) -> str:
     """
     Build the final context for the LLM.
@@ -40,7 +46,7 @@ def build_context(
     1. Deduplicate chunks (banks require deterministic behavior)
     2. Remove tiny/noisy chunks
     3. Preserve ranking order
-    4. Merge until token budget reached
+    4. Merge until the token budget (`model` tokens) is reached
     """
 
     if not chunks:
@@ -49,6 +55,7 @@ def build_context(
     # 1️⃣ Deduplicate
     seen = set()
     deduped = []
+    hashes = []
 
     for c in chunks:
         h = _hash_text(c)
@@ -56,22 +63,22 @@ def build_context(
         if h not in seen:
             seen.add(h)
             deduped.append(c)
-
-    # 2️⃣ Remove tiny or noisy chunks
-    cleaned = [c for c in deduped if len(_tokenize(c)) >= min_chunk_len]
-
-    # 3️⃣ Build context until token budget is reached
-    final = []
-    token_count = 0
-
-    for c in cleaned:
-        c_tokens = len(_tokenize(c))
-
-        if token_count + c_tokens > max_tokens:
-            break
-
-        final.append(c)
-        token_count += c_tokens
+            hashes.append(h)
+
+    # 2️⃣ Remove tiny or noisy chunks (fewer than min_chunk_len words)
+    kept = [i for i, c in enumerate(deduped) if len(_words(c)) >= min_chunk_len]
+    cleaned = [deduped[i] for i in kept]
+
+    # 3️⃣ Pack in rank order until the token budget is reached; counts are
+    #    cached under the content hash
+    counter = get_token_counter(model)
+    packed, _ = counter.pack(
+        cleaned,
+        context_budget(model, max_tokens=max_tokens),
+        keys=[hashes[i] for i in kept],
+        overheads=[counter.count(f"[CHUNK {idx}]") + 2 for idx in range(1, len(cleaned) + 1)],
+    )
+    final = [c for _, c in packed]
 
     # 4️⃣ Join cleanly with audit markers
     formatted = ""
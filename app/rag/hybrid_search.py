@@ -8,14 +8,333 @@ It is a pure-Python BM25 implementation compatible with
 Python 3.9 and works completely offline.
 
 It loads documents from your Chroma vectorstore and
-builds a sparse index on startup.
+builds a sparse index on first use. After that the index is
+maintained incrementally:
+- new chunks append postings
+- removed chunks are tombstoned and compacted later
+- N, df and total length are running counters; IDF and length
+  normalisation are applied at query time
+
+When SciPy is available, queries are scored through CSR segments
+(backend/rag/sparse_bm25.py) instead of the postings dicts:
+- a base matrix, plus a mask of its columns that were removed since
+- a small delta matrix of the chunks added since, rebuilt on change
+- the delta is merged into a new base in a background thread once it
+  (or the removed columns) grows past a fraction of the base; requests
+  keep scoring with the old segments until the merged one is swapped in
+
+Metadata filters (backend/rag/filters.py) restrict scoring to the
+matching chunks: a candidate mask over the snapshot's columns, or a
+per-document check on the pure-Python path.
+
+With several API workers (API_WORKERS > 1) an in-process index per
+worker would cost N copies and drift apart after an ingest. Instead the
+ingesting worker exports a memory-mapped BM25 generation
+(backend/rag/bm25.py) that every worker maps, and bumps the app's index
+generation; sync_indexes() reopens it in the other workers.
 """
 
 import math
-from typing import List, Dict
+import threading
+from typing import List, Dict, Iterable, Optional, Tuple
 from collections import defaultdict
 
-from ..vectorstore import get_vectorstore
+import numpy as np
+
+from backend.config import API_WORKERS
+from backend.rag.bm25 import BM25Index, open_index
+from backend.rag.filters import FilterColumns, MetadataFilter
+from backend.rag.sparse_bm25 import SCIPY_AVAILABLE, SparseBM25
+
+from ..vectorstore import bm25_index_dir, get_vectorstore, index_generation, reopen_vectorstore
+
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Compact postings once this fraction of indexed docs is tombstoned
+COMPACT_RATIO = 0.25
+
+# Merge the matrix segments once the delta holds this fraction of the
+# base's columns (or COMPACT_RATIO of the base's columns are removed)
+MERGE_RATIO = 0.1
+
+
+def _tokenize(text: str) -> List[str]:
+    return [t.lower() for t in text.split()]
+
+
+class _Segment:
+    """
+    Immutable CSR block: one column per chunk in `cols`, with the add
+    sequence number of each column's version and its filter columns.
+    """
+
+    def __init__(self, engine: SparseBM25, cols: List[str], seqs: "np.ndarray", filters: FilterColumns):
+        self.engine = engine
+        self.cols = cols
+        self.seqs = seqs
+        self.filters = filters
+        self.col_of = {doc_id: i for i, doc_id in enumerate(cols)}
+
+
+class IncrementalBM25:
+    """
+    In-memory inverted index supporting add / delete without a rebuild.
+    """
+
+    def __init__(self, use_matrix: bool = True):
+        self.use_matrix = use_matrix and SCIPY_AVAILABLE
+
+        # Matrix segments (see module docstring)
+        self._base: Optional[_Segment] = None
+        self._dead = set()                   # base columns removed since the merge
+        self._live = None                    # cached ~dead mask, None if nothing is dead
+        self._pending: Dict[str, None] = {}  # chunks not in the base, in add order
+        self._delta: Optional[_Segment] = None
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        self._merging = False
+        self._removed_while_merging: List[str] = []
+
+        self.postings = defaultdict(dict)   # term -> {doc_id: tf}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.doc_lens: Dict[str, int] = {}
+        self.docs: Dict[str, str] = {}
+        self.metas: Dict[str, dict] = {}
+        self.df = defaultdict(int)
+        self.total_len = 0
+        self.tombstones = set()
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lens)
+
+    @property
+    def avgdl(self) -> float:
+        return self.total_len / max(self.num_docs, 1)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[dict] = None) -> None:
+        if doc_id in self.doc_lens:
+            self.remove(doc_id)
+
+        # Re-added after a delete: drop stale postings before reusing the id
+        if doc_id in self.tombstones:
+            self._purge(doc_id)
+
+        tokens = _tokenize(text)
+        tf = defaultdict(int)
+        for tok in tokens:
+            tf[tok] += 1
+
+        for tok, freq in tf.items():
+            self.postings[tok][doc_id] = freq
+            self.df[tok] += 1
+
+        self.doc_terms[doc_id] = list(tf)
+        self.doc_lens[doc_id] = len(tokens)
+        self.docs[doc_id] = text
+        self.metas[doc_id] = metadata or {}
+        self.total_len += len(tokens)
+
+        self._seq[doc_id] = self._next_seq
+        self._next_seq += 1
+        self._pending[doc_id] = None
+        self._delta = None
+
+    def remove(self, doc_id: str) -> None:
+        if doc_id not in self.doc_lens:
+            return
+
+        if doc_id in self._pending:
+            del self._pending[doc_id]
+            self._delta = None
+        elif self._base is not None and doc_id in self._base.col_of:
+            self._dead.add(self._base.col_of[doc_id])
+            self._live = None
+        if self._merging:
+            self._removed_while_merging.append(doc_id)
+        del self._seq[doc_id]
+
+        for tok in self.doc_terms[doc_id]:
+            self.df[tok] -= 1
+            if self.df[tok] <= 0:
+                del self.df[tok]
+
+        self.total_len -= self.doc_lens.pop(doc_id)
+        del self.docs[doc_id]
+        del self.metas[doc_id]
+        self.tombstones.add(doc_id)
+
+        if len(self.tombstones) > COMPACT_RATIO * max(self.num_docs, 1):
+            self.compact()
+
+    def _purge(self, doc_id: str) -> None:
+        for tok in self.doc_terms.pop(doc_id, []):
+            postings = self.postings.get(tok)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[tok]
+        self.tombstones.discard(doc_id)
+
+    def compact(self) -> None:
+        """
+        Physically remove tombstoned postings.
+        """
+        for doc_id in list(self.tombstones):
+            self._purge(doc_id)
+
+    def _segment(self, doc_ids: List[str]) -> _Segment:
+        """
+        CSR segment of the current postings of `doc_ids` (O(their postings)).
+        """
+        postings = defaultdict(list)
+        for col, doc_id in enumerate(doc_ids):
+            for tok in self.doc_terms[doc_id]:
+                postings[tok].append((col, self.postings[tok][doc_id]))
+
+        engine = SparseBM25.from_postings(postings, [self.doc_lens[d] for d in doc_ids], k1=K1, b=B)
+        seqs = np.fromiter((self._seq[d] for d in doc_ids), dtype=np.int64, count=len(doc_ids))
+        return _Segment(engine, doc_ids, seqs, FilterColumns.from_metadatas([self.metas[d] for d in doc_ids]))
+
+    def _segments(self) -> Tuple[Optional[_Segment], Optional["np.ndarray"], Optional[_Segment]]:
+        """
+        (base, live column mask or None, delta or None) to score with.
+        """
+        if self._base is None and self._pending:
+            # First build: everything is the base
+            self._base = self._segment(list(self._pending))
+            self._pending.clear()
+        if self._delta is None and self._pending:
+            self._delta = self._segment(list(self._pending))
+        if self._live is None and self._dead:
+            live = np.ones(len(self._base.cols), dtype=bool)
+            live[list(self._dead)] = False
+            self._live = live
+        return self._base, self._live if self._dead else None, self._delta if self._pending else None
+
+    def needs_merge(self) -> bool:
+        if not self.use_matrix or self._merging or self._base is None:
+            return False
+        size = len(self._base.cols)
+        return len(self._pending) > MERGE_RATIO * size or len(self._dead) > COMPACT_RATIO * size
+
+    def begin_merge(self):
+        """
+        Capture the segments to merge. Call with the index lock held, then
+        merge_segments() without it and end_merge() with it again.
+        """
+        self._merging = True
+        self._removed_while_merging = []
+        base, live, delta = self._segments()
+        return base, live, delta, self._next_seq
+
+    @staticmethod
+    def merge_segments(capture) -> _Segment:
+        """
+        One base segment from captured segments; reads no index state.
+        """
+        base, live, delta, _ = capture
+        parts = [(base, live)] + ([(delta, None)] if delta is not None else [])
+
+        engine = SparseBM25.hstack([(seg.engine, keep) for seg, keep in parts])
+        cols, seqs, filters = [], [], []
+        for seg, keep in parts:
+            rows = np.arange(len(seg.cols)) if keep is None else np.flatnonzero(keep)
+            cols.extend(seg.cols[r] for r in rows.tolist())
+            seqs.append(seg.seqs[rows])
+            filters.append(seg.filters.take(rows))
+        return _Segment(engine, cols, np.concatenate(seqs), FilterColumns.concat(filters))
+
+    def end_merge(self, capture, merged: Optional[_Segment]) -> None:
+        """
+        Swap in `merged` (None: the merge failed). Changes made since
+        begin_merge() are carried over as delta chunks and dead columns.
+        """
+        self._merging = False
+        base, _, _, next_seq = capture
+        if merged is None or self._base is not base:
+            return
+
+        self._base = merged
+        self._dead = set()
+        for doc_id in self._removed_while_merging:
+            col = merged.col_of.get(doc_id)
+            if col is not None and self._seq.get(doc_id) != merged.seqs[col]:
+                self._dead.add(col)
+        self._live = None
+        self._pending = {d: None for d in self._pending if self._seq[d] >= next_seq}
+        self._delta = None
+        self._removed_while_merging = []
+
+    def merge(self) -> None:
+        """
+        Merge the segments in the calling thread (tests, single-threaded use).
+        """
+        capture = self.begin_merge()
+        self.end_merge(capture, self.merge_segments(capture))
+
+    def search(self, query: str, k: int, filters: Optional[MetadataFilter] = None) -> List[Dict]:
+        N = self.num_docs
+        if N == 0:
+            return []
+        if filters is not None and filters.is_empty:
+            filters = None
+
+        if self.use_matrix:
+            base, live, delta = self._segments()
+            tokens = _tokenize(query)
+            corpus = (N, self.df, self.avgdl)
+
+            hits = []
+            for seg, keep in ((base, live), (delta, None)):
+                if seg is None:
+                    continue
+                allowed = seg.filters.mask(filters) if filters is not None else None
+                if keep is not None:
+                    allowed = keep if allowed is None else allowed & keep
+                if allowed is not None and not allowed.any():
+                    continue
+                cols, scores = seg.engine.top_k(tokens, k, allowed, corpus)
+                hits.extend((float(s), seg.cols[c]) for c, s in zip(cols.tolist(), scores.tolist()))
+
+            hits.sort(key=lambda x: x[0], reverse=True)
+            return [{"content": self.docs[doc_id], "score": score, "id": doc_id} for score, doc_id in hits[:k]]
+
+        avgdl = self.avgdl
+        doc_scores = defaultdict(float)
+
+        for tok in _tokenize(query):
+            postings = self.postings.get(tok)
+            if not postings:
+                continue
+
+            df_tok = self.df[tok]
+            idf = math.log(1 + (N - df_tok + 0.5) / (df_tok + 0.5))
+
+            for doc_id, freq in postings.items():
+                if doc_id in self.tombstones:
+                    continue
+                if filters is not None and not filters.matches(self.metas[doc_id]):
+                    continue
+
+                doc_len = self.doc_lens[doc_id]
+                doc_scores[doc_id] += idf * ((freq * (K1 + 1)) /
+                                             (freq + K1 * (1 - B + B * (doc_len / avgdl))))
+
+        # Sort by score
+        ranked = sorted(
+            doc_scores.items(),
+            key=lambda x: x[1],
+            reverse=True
+        )[:k]
+
+        return [
+            {"content": self.docs[doc_id], "score": float(score), "id": doc_id}
+            for doc_id, score in ranked
+        ]
 
 
 # -------------------------
@@ -23,12 +342,10 @@ from ..vectorstore import get_vectorstore
 # -------------------------
 
 BM25_INDEX = None
-BM25_DOCS = None
-AVG_DOC_LEN = 0.0
+_INDEX_LOCK = threading.Lock()
 
-
-def _tokenize(text: str) -> List[str]:
-    return [t.lower() for t in text.split()]
+# Memory-mapped export shared by all API workers (API_WORKERS > 1)
+SHARED_BM25 = None
 
 
 def _build_bm25_index():
@@ -37,98 +354,126 @@ def _build_bm25_index():
     Called automatically when bm25_search() is first used.
     """
 
-    global BM25_INDEX, BM25_DOCS, AVG_DOC_LEN
+    global BM25_INDEX
 
     vs = get_vectorstore()
 
     # Pull ALL documents from Chroma
     # (Bank-grade systems sometimes store a sparse index separately)
-    all_docs = vs.get(include=["documents"])["documents"]
+    all_docs = vs.get(include=["documents", "metadatas"])
 
-    BM25_DOCS = all_docs
+    index = IncrementalBM25()
+    for doc_id, text, meta in zip(all_docs["ids"], all_docs["documents"], all_docs["metadatas"]):
+        index.add(doc_id, text, meta)
 
-    # Document frequencies
-    df = defaultdict(int)
+    BM25_INDEX = index
 
-    tokenized_docs = []
-    doc_lengths = []
 
-    for text in all_docs:
-        tokens = _tokenize(text)
-        tokenized_docs.append(tokens)
+def _merge_index(index: IncrementalBM25, capture) -> None:
+    # The O(index) part runs without the lock; searches use the old segments
+    merged = None
+    try:
+        merged = IncrementalBM25.merge_segments(capture)
+    finally:
+        with _INDEX_LOCK:
+            index.end_merge(capture, merged)
 
-        doc_lengths.append(len(tokens))
 
-        # Count unique tokens for DF
-        unique_tokens = set(tokens)
-        for t in unique_tokens:
-            df[t] += 1
+def index_documents(ids: Iterable[str], texts: Iterable[str],
+                    metadatas: Optional[Iterable[dict]] = None) -> None:
+    """
+    Append postings for newly stored chunks.
+    No-op until the index has been built; the lazy build picks them up.
+    """
+    with _INDEX_LOCK:
+        if BM25_INDEX is None:
+            return
+        ids, texts = list(ids), list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        for doc_id, text, meta in zip(ids, texts, metadatas):
+            BM25_INDEX.add(doc_id, text, meta)
 
-    AVG_DOC_LEN = sum(doc_lengths) / max(len(doc_lengths), 1)
 
-    # Build index
-    index = defaultdict(dict)
+def remove_documents(ids: Iterable[str]) -> None:
+    """
+    Tombstone chunks that were deleted from the vectorstore.
+    """
+    with _INDEX_LOCK:
+        if BM25_INDEX is None:
+            return
+        for doc_id in ids:
+            BM25_INDEX.remove(doc_id)
 
-    N = len(all_docs)
 
-    for doc_id, tokens in enumerate(tokenized_docs):
-        tf = defaultdict(int)
+def export_shared_index() -> None:
+    """
+    Export every chunk in the vectorstore as a new memory-mapped BM25
+    generation for the API workers to map.
+    """
+    global SHARED_BM25
 
-        for tok in tokens:
-            tf[tok] += 1
+    all_docs = get_vectorstore().get(include=["documents", "metadatas"])
+    index = BM25Index.build(all_docs["documents"], all_docs["metadatas"], all_docs["ids"])
+    index.export(bm25_index_dir())
 
-        for tok, freq in tf.items():
-            # BM25 parameters
-            k1 = 1.5
-            b = 0.75
+    with _INDEX_LOCK:
+        SHARED_BM25 = open_index(bm25_index_dir())
 
-            df_tok = df[tok]
-            idf = math.log(1 + (N - df_tok + 0.5) / (df_tok + 0.5))
 
-            score = idf * ((freq * (k1 + 1)) /
-                           (freq + k1 * (1 - b + b * (len(tokens) / AVG_DOC_LEN))))
+def shared_index():
+    global SHARED_BM25
+    with _INDEX_LOCK:
+        if SHARED_BM25 is None:
+            SHARED_BM25 = open_index(bm25_index_dir())
+        return SHARED_BM25
 
-            index[tok][doc_id] = score
 
-    BM25_INDEX = index
+def sync_indexes() -> None:
+    """
+    Reopen Chroma and BM25 if another worker ingested since this one last
+    looked (the app index generation moved). A file read otherwise.
+    """
+    global BM25_INDEX, SHARED_BM25
 
+    if not index_generation().changed():
+        return
 
-def bm25_search(query: str, k: int = 10) -> List[Dict]:
+    reopen_vectorstore()
+    with _INDEX_LOCK:
+        # The in-process index is rebuilt lazily from the reopened store
+        BM25_INDEX = None
+        SHARED_BM25 = None
+
+
+def bm25_search(query: str, k: int = 10, filters: Optional[MetadataFilter] = None) -> List[Dict]:
     """
-    Pure Python BM25 search against all documents in vectorstore.
+    Pure Python BM25 search against all documents in vectorstore,
+    restricted to chunks matching `filters` if given.
 
     Output format:
     [
-        { "content": "...", "score": 13.24 },
+        { "content": "...", "score": 13.24, "id": "..." },
         ...
     ]
     """
 
-    global BM25_INDEX
-
-    if BM25_INDEX is None:
-        _build_bm25_index()
-
-    tokens = _tokenize(query)
-
-    doc_scores = defaultdict(float)
-
-    for tok in tokens:
-        if tok in BM25_INDEX:
-            for doc_id, score in BM25_INDEX[tok].items():
-                doc_scores[doc_id] += score
-
-    # Sort by score
-    ranked = sorted(
-        doc_scores.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )
-
-    # Limit results
-    ranked = ranked[:k]
-
-    return [
-        {"content": BM25_DOCS[doc_id], "score": float(score)}
-        for doc_id, score in ranked
-    ]
+    if API_WORKERS > 1:
+        shared = shared_index()
+        if shared is not None:
+            # Backend result format: negated scores, "text"
+            return [
+                {"content": r["text"], "score": -r["score"], "id": r["id"]}
+                for r in shared.search(query, k, filters)
+            ]
+
+    with _INDEX_LOCK:
+        if BM25_INDEX is None:
+            _build_bm25_index()
+
+        index = BM25_INDEX
+        hits = index.search(query, k, filters)
+        capture = index.begin_merge() if index.needs_merge() else None
+
+    if capture is not None:
+        threading.Thread(target=_merge_index, args=(index, capture), name="bm25-merge", daemon=True).start()
+    return hits
@@ -8,16 +8,24 @@ This implementation:
 - Provides safe fallback if the model cannot be loaded
 - Works offline once downloaded
 - Fully compatible with Python 3.9
+- Scores candidates in length-sorted, dynamically padded batches
+- Can serve through ONNX Runtime (int8) instead of PyTorch: RERANKER_BACKEND=onnx
+- Shares one loaded model with the backend stack via backend/model_registry.py
+- Serves the active fine-tuned version (backend/rag/reranker_versions.py)
+  and follows swaps / rollbacks made by the backend without a restart
 """
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 
+from backend.config import RERANKER_MODEL, RERANKER_BACKEND
+from ..logging_system import stage, RERANK_CANDIDATES
+
 logger = logging.getLogger(__name__)
 
 try:
-    from transformers import AutoTokenizer, AutoModelForSequenceClassification
-    import torch
+    import transformers  # noqa: F401
+    from backend.rag.reranker_versions import ServingModel
 
     HF_AVAILABLE = True
 
@@ -26,38 +34,48 @@ except Exception:
     logger.warning("HuggingFace transformers not available. Using fallback reranker.")
 
 
-# Global model cache
-_TOKENIZER = None
-_MODEL = None
+# Global serving handle (models are owned by the model registry)
+_SERVING = ServingModel(RERANKER_MODEL, RERANKER_BACKEND) if HF_AVAILABLE else None
 
 
-def _load_model():
+def register_reranker():
     """
-    Lazy load the reranker model on first use.
+    Register the active version with the model registry (startup warm-up).
     """
-    global _TOKENIZER, _MODEL
+    if HF_AVAILABLE:
+        _SERVING.register()
 
-    if not HF_AVAILABLE:
-        return False
 
-    if _MODEL is not None:
-        return True
+def activate_reranker(version: str):
+    """
+    Swap the serving reranker to a newly trained `version` once it is
+    warmed; other workers follow through active.json.
+    """
+    if HF_AVAILABLE:
+        _SERVING.activate(version)
 
-    try:
-        model_name = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
-        _TOKENIZER = AutoTokenizer.from_pretrained(model_name)
-        _MODEL = AutoModelForSequenceClassification.from_pretrained(model_name)
+def _load_model():
+    """
+    (version, model) to score this request with, or None if unavailable.
+    """
+    if not HF_AVAILABLE:
+        return None
 
-        logger.info("Loaded Cross-Encoder reranker model.")
-        return True
+    try:
+        _SERVING.sync()
+        return _SERVING.current()
 
     except Exception as e:
         logger.error(f"Could not load cross-encoder model: {e}")
-        return False
+        return None
 
 
-def cross_encoder_rerank(query: str, candidates: List[Dict]) -> List[Dict]:
+def cross_encoder_rerank(
+    query: str,
+    candidates: List[Dict],
+    batch_size: Optional[int] = None,
+) -> List[Dict]:
     """
     Reranks candidate documents based on semantic relevance.
 
@@ -67,35 +85,22 @@ def cross_encoder_rerank(query: str, candidates: List[Dict]) -> List[Dict]:
         ...
     ]
 
-    Output is sorted high → low relevance.
+    Output is sorted high → low relevance; each item carries the
+    "reranker_version" that scored it (None for the fallback ranking).
     """
 
     # Fallback: return dense+bm25 scores unchanged
-    if not _load_model():
+    loaded = _load_model()
+    if loaded is None:
         logger.warning("Cross-encoder unavailable. Using fallback ranking.")
         return sorted(candidates, key=lambda x: x["score"], reverse=True)
 
-    # Use Torch for scoring
-    rerank_inputs = [
-        (query, c["content"]) for c in candidates
-    ]
-
-    scores = []
-
-    for q, d in rerank_inputs:
-        inputs = _TOKENIZER(
-            q,
-            d,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
-        )
-
-        with torch.no_grad():
-            output = _MODEL(**inputs)
-            score = float(output.logits[0].item())
-
-        scores.append(score)
+    # Batched scoring (ONNX session or Torch model)
+    version, model = loaded
+    passages = [c["content"] for c in candidates]
+    with stage("rerank"):
+        scores = model.score(query, passages, batch_size=batch_size, max_length=512)
+    RERANK_CANDIDATES.inc(len(candidates))
 
     # Attach new scores
     reranked = []
@@ -103,7 +108,8 @@ def cross_encoder_rerank(query: str, candidates: List[Dict]) -> List[Dict]:
         reranked.append({
             "content": item["content"],
             "score": new_score,
-            "source": item.get("source", "rerank")
+            "source": item.get("source", "rerank"),
+            "reranker_version": version,
         })
 
     # Sort by cross-encoder score
@@ -1,70 +1,102 @@
 # app/rag/retriever.py
 
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 
-from ..vectorstore import get_vectorstore  # your FAISS or Chroma wrapper
-from .hybrid_search import bm25_search
+from backend.concurrency import run_blocking
+from backend.config import (
+    FUSION_METHOD,
+    FUSION_DENSE_WEIGHT,
+    FUSION_SPARSE_WEIGHT,
+    RRF_K,
+    DENSE_LEG_TIMEOUT,
+    SPARSE_LEG_TIMEOUT,
+    DENSE_BACKEND,
+)
+from backend.rag.fanout import run_legs
+from backend.rag.filters import MetadataFilter
+from backend.rag.fusion import fuse, text_key
+
+from ..logging_system import stage
+from ..vectorstore import get_vectorstore, get_app_flat_index  # your FAISS or Chroma wrapper
+from .hybrid_search import bm25_search, sync_indexes
 from .reranker import cross_encoder_rerank
 from .context_builder import build_context
-from ..llm import answer_with_context
+from ..llm import CHAT_MODEL, answer_with_context, aanswer_with_context, count_prompt_tokens
 
 
-def retrieve_documents(
-    query: str,
-    top_k_dense: int = 20,
-    top_k_sparse: int = 20,
-    final_k: int = 8,
-) -> Dict:
-    """
-    Bank-grade hybrid retrieval pipeline:
-    1. Dense search via vectorstore (OpenAI embeddings)
-    2. Sparse BM25 search (Pyserini)
-    3. Weighted hybrid merge
-    4. Optional neural reranking
-    5. Context builder
-    6. LLM answer generator
-    """
-
-    # 1️⃣ Dense vector search
+def _dense_search(query: str, k: int, filters: Optional[MetadataFilter] = None) -> List[Dict]:
     vs = get_vectorstore()
-    dense_results = vs.similarity_search_with_score(query, k=top_k_dense)
 
-    dense_docs = [
+    # DENSE_BACKEND=flat: memory-mapped index, Chroma until the first export
+    index = get_app_flat_index() if DENSE_BACKEND == "flat" else None
+    if index is not None:
+        with stage("dense_search"):
+            hits = index.search(vs.embeddings.embed_query(query), k, filters=filters)
+        return [{"content": h["text"], "score": h["score"], "source": "dense"} for h in hits]
+
+    where = filters.to_chroma_where() if filters is not None else None
+    with stage("dense_search"):
+        dense_results = vs.similarity_search_with_score(query, k=k, filter=where)
+
+    return [
         {"content": doc.page_content, "score": float(score), "source": "dense"}
         for doc, score in dense_results
     ]
 
-    # 2️⃣ Sparse BM25 search
-    sparse_results = bm25_search(query, top_k_sparse)
+
+def _sparse_search(query: str, k: int, filters: Optional[MetadataFilter] = None) -> List[Dict]:
+    with stage("bm25_search"):
+        sparse_results = bm25_search(query, k, filters)
 
     # Format to consistent shape
-    sparse_docs = [
+    return [
         {"content": r["content"], "score": float(r["score"]), "source": "sparse"}
         for r in sparse_results
     ]
 
-    # 3️⃣ Weighted hybrid scoring
-    hybrid = []
-    for d in dense_docs:
-        hybrid.append({
-            "content": d["content"],
-            "score": 0.6 * d["score"],   # dense weight
-            "source": d["source"],
-        })
 
-    for s in sparse_docs:
-        hybrid.append({
-            "content": s["content"],
-            "score": 0.4 * s["score"],  # sparse weight
-            "source": s["source"],
-        })
-
-    # Sort descending
-    hybrid_sorted = sorted(hybrid, key=lambda x: x["score"], reverse=True)
+def retrieve_context(
+    query: str,
+    top_k_dense: int = 12,
+    top_k_sparse: int = 12,
+    final_k: int = 8,
+    filters: Optional[MetadataFilter] = None,
+) -> Tuple[List[str], str, Dict, Optional[str]]:
+    """
+    Retrieval half of retrieve_documents() (steps 1-5), without the LLM call.
+    Returns (top_chunks, context, timings, reranker_version) with per-leg
+    retrieval timings. `filters` is pushed into both search legs.
+    """
 
-    # Take top candidates for reranking
-    candidate_docs = hybrid_sorted[:final_k * 2]
+    # Another API worker may have ingested since the last request
+    sync_indexes()
+
+    # 1️⃣ Dense vector search and 2️⃣ sparse BM25 search, run concurrently;
+    #    a leg that misses its deadline is dropped
+    results, timings = run_legs(
+        {
+            "dense": lambda: _dense_search(query, top_k_dense, filters),
+            "sparse": lambda: _sparse_search(query, top_k_sparse, filters),
+        },
+        timeouts={"dense": DENSE_LEG_TIMEOUT, "sparse": SPARSE_LEG_TIMEOUT},
+    )
+    dense_docs, sparse_docs = results["dense"], results["sparse"]
+
+    # 3️⃣ Rank fusion (dense is a distance, BM25 is unbounded), deduplicated
+    #    on content since LangChain results carry no chunk id
+    with stage("fusion"):
+        candidate_docs = fuse(
+            [dense_docs, sparse_docs],
+            method=FUSION_METHOD,
+            weights=[FUSION_DENSE_WEIGHT, FUSION_SPARSE_WEIGHT],
+            higher_is_better=[False, True],
+            rrf_k=RRF_K,
+            key=text_key,
+            limit=final_k * 2,
+        )
+    for d in candidate_docs:
+        d["score"] = d["fusion_score"]
 
     # 4️⃣ Neural reranking (cross encoder)
     reranked = cross_encoder_rerank(query, candidate_docs)
@@ -74,9 +106,34 @@ def retrieve_documents(
 
     # Extract plain text
     top_chunks = [d["content"] for d in reranked]
+    reranker_version = reranked[0].get("reranker_version") if reranked else None
 
     # 5️⃣ Build final context window
-    context = build_context(top_chunks)
+    context = build_context(top_chunks, model=CHAT_MODEL)
+
+    return top_chunks, context, timings, reranker_version
+
+
+def retrieve_documents(
+    query: str,
+    top_k_dense: int = 12,
+    top_k_sparse: int = 12,
+    final_k: int = 8,
+    filters: Optional[MetadataFilter] = None,
+) -> Dict:
+    """
+    Bank-grade hybrid retrieval pipeline:
+    1. Dense search via vectorstore (OpenAI embeddings)
+    2. Sparse BM25 search, concurrently with 1
+    3. Rank fusion
+    4. Optional neural reranking
+    5. Context builder
+    6. LLM answer generator
+    """
+
+    top_chunks, context, timings, reranker_version = retrieve_context(
+        query, top_k_dense, top_k_sparse, final_k, filters
+    )
 
     # 6️⃣ Generate LLM answer
     answer = answer_with_context(query, context)
@@ -87,4 +144,36 @@ def retrieve_documents(
         "answer": answer,
         "context": top_chunks,
         "num_chunks": len(top_chunks),
+        "timings": timings,
+        "reranker_version": reranker_version,
+        "prompt_tokens": count_prompt_tokens(query, context),
+    }
+
+
+async def aretrieve_documents(
+    query: str,
+    top_k_dense: int = 12,
+    top_k_sparse: int = 12,
+    final_k: int = 8,
+    filters: Optional[MetadataFilter] = None,
+) -> Dict:
+    """
+    Async pipeline: retrieval + reranking run on the shared executor,
+    the LLM call is awaited so no thread is held during generation.
+    """
+
+    top_chunks, context, timings, reranker_version = await run_blocking(
+        retrieve_context, query, top_k_dense, top_k_sparse, final_k, filters
+    )
+
+    answer = await aanswer_with_context(query, context)
+
+    return {
+        "query": query,
+        "answer": answer,
+        "context": top_chunks,
+        "num_chunks": len(top_chunks),
+        "timings": timings,
+        "reranker_version": reranker_version,
+        "prompt_tokens": count_prompt_tokens(query, context),
     }
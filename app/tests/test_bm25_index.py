@@ -0,0 +1,62 @@
+import math
+
+from backend.rag.bm25 import BM25Index, b, compute_idf, k1, tokenize
+
+
+DOCS = [
+    "Customer data must be encrypted at rest",
+    "Encryption in transit uses TLS",
+    "The marketing team owns brand guidelines",
+    "Access control reviews happen quarterly for customer data",
+]
+METAS = [{"source": f"doc{i}.pdf", "page": i} for i in range(len(DOCS))]
+
+
+def _full_scan_scores(query):
+    corpus = [tokenize(d) for d in DOCS]
+    idf = compute_idf(corpus)
+    avgdl = sum(len(d) for d in corpus) / len(corpus)
+    scores = []
+    for tokens in corpus:
+        score = 0.0
+        for q in tokenize(query):
+            tf = tokens.count(q)
+            if tf:
+                score += idf[q] * (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+        scores.append(score)
+    return scores
+
+
+def test_postings_match_full_scan():
+    index = BM25Index.build(DOCS, METAS)
+    expected = _full_scan_scores("customer data encryption")
+
+    for r in index.search("customer data encryption", top_k=10):
+        assert math.isclose(-r["score"], expected[r["chunk_index"]], rel_tol=1e-6)
+        assert r["source"] == METAS[r["chunk_index"]]["source"]
+
+
+def test_roundtrip(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    BM25Index.build(DOCS, METAS, ids=["a", "b", "c", "d"]).save(path)
+
+    loaded = BM25Index.load(path)
+    assert loaded.search("marketing", top_k=1)[0]["text"] == DOCS[2]
+    assert loaded.search("nonexistent") == []
+
+
+def test_mapped_export_matches_in_memory(tmp_path):
+    from backend.rag.bm25 import open_index
+    from backend.rag.filters import MetadataFilter
+
+    index = BM25Index.build(DOCS, METAS, ids=["a", "b", "c", "d"])
+    index.export(str(tmp_path))
+    mapped = open_index(str(tmp_path))
+
+    # Postings are mapped from disk, not copied into the process
+    assert not mapped.matrix.tf.indices.flags.owndata
+    for query in ("customer data encryption", "marketing", "nonexistent"):
+        assert mapped.search(query, top_k=10) == index.search(query, top_k=10)
+
+    flt = MetadataFilter(sources=["doc3.pdf"])
+    assert [r["id"] for r in mapped.search("customer data", top_k=10, filters=flt)] == ["d"]
@@ -0,0 +1,20 @@
+from app.rag.chunking import semantic_adaptive_chunk
+from benchmarks.bench_chunking import SETTINGS, legacy_chunk, regex_sentences, synthetic_pages
+
+
+def test_matches_string_chunker():
+    # Includes sentences longer than max_tokens (hard split) and mixed whitespace
+    for text in synthetic_pages(20, 500):
+        for setting in SETTINGS + [(25, 5, 0)]:
+            expected = legacy_chunk(text, *setting, splitter=regex_sentences)
+            assert semantic_adaptive_chunk(text, *setting, sentence_splitter=regex_sentences) == expected
+
+
+def test_custom_tokenizer_counts_windows():
+    text = "One two three. Four five six. Seven eight nine."
+    # Every sentence "costs" 10 tokens: one sentence per window
+    chunks = semantic_adaptive_chunk(
+        text, max_tokens=10, min_tokens=0, overlap_tokens=1,
+        tokenizer=lambda s: 10, sentence_splitter=regex_sentences,
+    )
+    assert chunks == ["One two three.", "three. Four five six.", "six. Seven eight nine."]
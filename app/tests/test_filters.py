@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from backend.rag.bm25 import BM25Index
+from backend.rag.filters import FilterColumns, MetadataFilter
+from backend.rag.flat_index import build_flat_index, get_flat_index
+
+
+METAS = [
+    {"source": "a.pdf", "page": 1, "page_end": 2, "doc_date": 100.0},
+    {"source": "a.pdf", "page": 3, "page_end": 3, "doc_date": 100.0},
+    {"source": "b.pdf", "page": 1, "doc_date": 200.0},  # page_end defaults to page
+    {"source": "c.pdf"},                                 # no page / date
+]
+
+FILTERS = [
+    MetadataFilter(sources=["a.pdf"]),
+    MetadataFilter(page_from=2, page_to=3),
+    MetadataFilter(page_to=1),
+    MetadataFilter(date_from=150.0),
+    MetadataFilter(date_to=200.0),
+    MetadataFilter(sources=["b.pdf", "missing.pdf"], page_from=1, date_from=200.0),
+    MetadataFilter(sources=["missing.pdf"]),
+]
+
+
+def test_mask_agrees_with_matches():
+    columns = FilterColumns.from_metadatas(METAS)
+    for flt in FILTERS:
+        assert columns.mask(flt).tolist() == [flt.matches(m) for m in METAS]
+    assert MetadataFilter(page_from=2, page_to=3).key() in columns._masks
+
+
+def test_chroma_where_and_validation():
+    assert MetadataFilter().to_chroma_where() is None
+    assert MetadataFilter(sources=["b", "a"]).to_chroma_where() == {"source": {"$in": ["a", "b"]}}
+    assert MetadataFilter(page_from=2, page_to=4).to_chroma_where() == {
+        "$and": [
+            {"page": {"$lte": 4}},
+            {"$or": [{"page_end": {"$gte": 2}}, {"page": {"$gte": 2}}]},
+        ]
+    }
+    with pytest.raises(ValueError):
+        MetadataFilter(page_from=5, page_to=2)
+
+
+def test_bm25_search_only_scores_allowed_docs():
+    docs = ["customer data policy", "customer data retention", "customer data access", "customer data"]
+    index = BM25Index.build(docs, METAS)
+
+    hits = index.search("customer data", top_k=10, filters=MetadataFilter(sources=["a.pdf"]))
+    assert sorted(h["chunk_index"] for h in hits) == [0, 1]
+    assert index.search("customer data", top_k=10, filters=MetadataFilter(sources=["missing.pdf"])) == []
+
+
+def test_flat_search_with_filter(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((400, 16)).astype(np.float32)
+    ids = [f"c{i}" for i in range(400)]
+    metas = [{"source": f"{i % 4}.pdf", "page": i // 4 + 1, "doc_date": float(i)} for i in range(400)]
+    batches = [(ids, vectors, [""] * 400, metas)]
+
+    for nlist in (0, 8):
+        build_flat_index(iter(batches), len(ids), root=str(tmp_path), nlist=nlist)
+        index = get_flat_index(str(tmp_path))
+
+        flt = MetadataFilter(sources=["1.pdf"], date_to=200.0)
+        hits = index.search(vectors[5], 10, nprobe=8, filters=flt)
+        assert [h["id"] for h in hits][0] == "c5"
+        assert len(hits) == 10 and all(flt.matches(h["metadata"]) for h in hits)
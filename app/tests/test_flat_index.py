@@ -0,0 +1,74 @@
+import numpy as np
+
+from backend.rag.flat_index import build_flat_index, get_flat_index
+
+
+def _corpus(n=500, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    ids = [f"c{i}" for i in range(n)]
+    metas = [{"source": "a.pdf", "page": i // 10} for i in range(n)]
+    return vectors, ids, metas
+
+
+def _batches(vectors, ids, metas, size=128):
+    for s in range(0, len(ids), size):
+        yield ids[s:s + size], vectors[s:s + size], [f"text {i}" for i in ids[s:s + size]], metas[s:s + size]
+
+
+def _exact_ids(vectors, ids, query, k):
+    sims = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-sims)[:k]]
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    vectors, ids, metas = _corpus()
+    build_flat_index(_batches(vectors, ids, metas), len(ids), root=str(tmp_path))
+    index = get_flat_index(str(tmp_path))
+
+    query = vectors[7] + 0.1
+    hits = index.search(query, 5)
+    assert [h["id"] for h in hits] == _exact_ids(vectors, ids, query, 5)
+    assert hits[0]["metadata"] == {"source": "a.pdf", "page": 0}
+    assert hits[0]["text"] == "text c7"
+    assert all(a["score"] <= b["score"] for a, b in zip(hits, hits[1:]))
+
+
+def test_ivf_int8_and_generation_swap(tmp_path):
+    vectors, ids, metas = _corpus()
+    root = str(tmp_path)
+    build_flat_index(_batches(vectors, ids, metas), len(ids), root=root)
+    first = get_flat_index(root)
+
+    # Probing every list of an IVF index is exact search (up to int8 rounding)
+    build_flat_index(_batches(vectors, ids, metas), len(ids), root=root, dtype="int8", nlist=8)
+    index = get_flat_index(root)
+    assert index.generation != first.generation and index.vectors.dtype == np.int8
+
+    query = vectors[42]
+    assert index.search(query, 1, nprobe=8)[0]["id"] == "c42"
+    assert len(set(h["id"] for h in index.search(query, 10, nprobe=8)) & set(_exact_ids(vectors, ids, query, 10))) >= 9
+
+
+def test_publish_keeps_unfinished_generations(tmp_path):
+    from backend.rag.mmap_store import new_generation
+
+    vectors, ids, metas = _corpus(n=50)
+    root = str(tmp_path)
+    build_flat_index(_batches(vectors, ids, metas), len(ids), root=root)
+    first = get_flat_index(root).generation
+
+    # Another build still writing its generation (no header yet)
+    pending, pending_dir = new_generation(root)
+    build_flat_index(_batches(vectors, ids, metas), len(ids), root=root)
+    live = get_flat_index(root)
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == sorted([pending, live.generation])
+    assert first != live.generation
+
+
+def test_generation_missing_a_required_array_is_not_served(tmp_path):
+    vectors, ids, metas = _corpus(n=50)
+    header = build_flat_index(_batches(vectors, ids, metas), len(ids), root=str(tmp_path))
+
+    (tmp_path / header["generation"] / "doc_offsets.npy").unlink()
+    assert get_flat_index(str(tmp_path)) is None
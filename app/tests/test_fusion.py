@@ -0,0 +1,41 @@
+import math
+
+from backend.rag.fusion import fuse
+
+
+DENSE = [  # cosine distance, lower = better
+    {"id": "a", "text": "alpha", "score": 0.10},
+    {"id": "b", "text": "beta", "score": 0.30},
+    {"id": "c", "text": "gamma", "score": 0.50},
+]
+SPARSE = [  # BM25, higher = better
+    {"id": "b", "text": "beta", "score": 12.0},
+    {"id": "d", "text": "delta", "score": 4.0},
+]
+
+
+def test_rrf_dedups_and_rewards_agreement():
+    fused = fuse([DENSE, SPARSE], method="rrf", rrf_k=60)
+
+    assert [d["id"] for d in fused] == ["b", "a", "d", "c"]
+    assert math.isclose(fused[0]["fusion_score"], 1 / 62 + 1 / 61)
+
+
+def test_normalized_fusion_respects_score_direction():
+    for method in ("minmax", "zscore"):
+        fused = fuse(
+            [DENSE, SPARSE],
+            method=method,
+            weights=[1.0, 0.0],
+            higher_is_better=[False, True],
+        )
+        # Sparse weight 0: order follows dense distances, best first
+        assert [d["id"] for d in fused][:2] == ["a", "b"]
+
+
+def test_limit_and_text_fallback_key():
+    no_ids = [{"content": "same chunk", "score": 1.0}, {"content": "other", "score": 0.5}]
+    fused = fuse([no_ids, no_ids[:1]], limit=1)
+
+    assert len(fused) == 1
+    assert fused[0]["content"] == "same chunk"
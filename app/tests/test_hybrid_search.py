@@ -0,0 +1,55 @@
+from app.rag.hybrid_search import IncrementalBM25
+from backend.rag.filters import MetadataFilter
+
+
+def _scores(index, query):
+    return sorted((r["id"], round(r["score"], 9)) for r in index.search(query, 10))
+
+
+def test_incremental_updates_match_fresh_build():
+    incremental = IncrementalBM25()
+    incremental.add("a", "red fox jumps")
+    incremental.add("b", "lazy dog sleeps red")
+    incremental.add("c", "fox and dog")
+    incremental.remove("b")
+    incremental.add("a", "fox fox fox")
+    incremental.add("d", "red red dog")
+
+    fresh = IncrementalBM25()
+    fresh.add("c", "fox and dog")
+    fresh.add("a", "fox fox fox")
+    fresh.add("d", "red red dog")
+
+    for query in ["red dog", "fox", "lazy"]:
+        assert _scores(incremental, query) == _scores(fresh, query)
+
+    assert incremental.num_docs == 3
+    assert "b" not in {r["id"] for r in incremental.search("lazy sleeps", 10)}
+
+
+def test_segment_merge_carries_over_concurrent_changes():
+    index = IncrementalBM25()
+    for i, text in enumerate(["red fox", "lazy dog", "fox and dog", "red red dog"]):
+        index.add(f"d{i}", text, {"source": f"{i % 2}.pdf"})
+    index.search("red", 10)  # first build: everything is the base
+    index.add("d4", "blue fox")
+    index.remove("d1")
+
+    capture = index.begin_merge()
+    merged = IncrementalBM25.merge_segments(capture)
+    # Changes while the merge runs outside the lock
+    index.remove("d0")
+    index.add("d2", "blue dog", {"source": "0.pdf"})
+    index.add("d5", "red cat", {"source": "1.pdf"})
+    index.end_merge(capture, merged)
+
+    fresh = IncrementalBM25()
+    fresh.add("d2", "blue dog", {"source": "0.pdf"})
+    fresh.add("d3", "red red dog", {"source": "1.pdf"})
+    fresh.add("d4", "blue fox", {"source": "0.pdf"})
+    fresh.add("d5", "red cat", {"source": "1.pdf"})
+
+    for query in ["red dog", "fox", "blue", "lazy"]:
+        assert _scores(index, query) == _scores(fresh, query)
+    flt = MetadataFilter(sources=["1.pdf"])
+    assert sorted(r["id"] for r in index.search("red dog", 10, flt)) == ["d3", "d5"]
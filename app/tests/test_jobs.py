@@ -0,0 +1,78 @@
+import logging
+import time
+
+import pytest
+
+from backend.jobs import JobManager, JobStore, disallow_cancel, report_progress
+
+
+def slow_task(seconds: float, fail: bool = False) -> dict:
+    logging.getLogger("test_jobs").info("working")
+    report_progress(step=1)
+    time.sleep(seconds)
+    if fail:
+        raise ValueError("boom")
+    return {"slept": seconds}
+
+
+def committing_task(seconds: float) -> dict:
+    disallow_cancel()
+    time.sleep(seconds)
+    return {"committed": True}
+
+
+def _wait(store, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError("job did not finish")
+
+
+def test_jobs_run_in_worker_processes(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    manager = JobManager("test", store=store, workers=2, poll_sec=0.05)
+    done = []
+    manager.on_complete("sleep", done.append)
+    manager.start()
+
+    ok = manager.submit("sleep", "app.tests.test_jobs:slow_task", {"seconds": 0.1})
+    bad = manager.submit("sleep", "app.tests.test_jobs:slow_task", {"seconds": 0, "fail": True})
+    slow = manager.submit("sleep", "app.tests.test_jobs:slow_task", {"seconds": 30})
+
+    job = _wait(store, ok["id"])
+    assert job["status"] == "succeeded" and job["result"] == {"slept": 0.1}
+    assert job["progress"] == {"step": 1}
+    assert any("working" in line["message"] for line in store.logs(ok["id"]))
+
+    job = _wait(store, bad["id"])
+    assert job["status"] == "failed" and "boom" in job["error"]
+
+    # Wait until it is running, then cancel it
+    while store.get(slow["id"])["status"] != "running":
+        time.sleep(0.05)
+    assert manager.cancel(slow["id"])["status"] == "cancelled"
+
+    deadline = time.time() + 10
+    while not done and time.time() < deadline:
+        time.sleep(0.05)
+    assert [j["id"] for j in done] == [ok["id"]]
+
+    # Nothing is left running for a later process to find
+    assert store.fail_interrupted("test") == 0
+
+
+def test_cancel_is_refused_once_a_job_commits(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    manager = JobManager("test", store=store, workers=1, poll_sec=0.05)
+    manager.start()
+
+    job = manager.submit("commit", "app.tests.test_jobs:committing_task", {"seconds": 1})
+    while store.get(job["id"])["progress"].get("cancellable") is not False:
+        time.sleep(0.05)
+
+    with pytest.raises(RuntimeError):
+        manager.cancel(job["id"])
+    assert _wait(store, job["id"])["result"] == {"committed": True}
@@ -0,0 +1,52 @@
+import os
+
+from backend.manifest import IngestManifest
+
+
+def test_diff_tracks_new_modified_removed(tmp_path):
+    a = tmp_path / "a.pdf"
+    b = tmp_path / "b.pdf"
+    a.write_bytes(b"alpha")
+    b.write_bytes(b"beta")
+
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    to_ingest, removed, unchanged = manifest.diff([str(a), str(b)])
+    assert set(to_ingest) == {str(a), str(b)} and not removed and not unchanged
+
+    for source, sha in to_ingest.items():
+        manifest.record(source, sha, [source + "#0"])
+    manifest.save()
+
+    # Modify a, delete b
+    a.write_bytes(b"alpha v2")
+    os.utime(a, (1, 1))
+    os.remove(b)
+
+    reloaded = IngestManifest.load(manifest.path)
+    to_ingest, removed, unchanged = reloaded.diff([str(a)])
+    assert list(to_ingest) == [str(a)]
+    assert removed == [str(b)]
+    assert reloaded.chunk_ids(removed) == [str(b) + "#0"]
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    a = tmp_path / "a.pdf"
+    a.write_bytes(b"alpha")
+
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    (source, sha), = manifest.diff([str(a)])[0].items()
+    manifest.record(source, sha, [])
+
+    assert manifest.diff([str(a)]) == ({}, [], [str(a)])
+
+
+def test_other_chunker_version_is_reingested(tmp_path):
+    a = tmp_path / "a.pdf"
+    a.write_bytes(b"alpha")
+
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    (source, sha), = manifest.diff([str(a)], chunker="v1")[0].items()
+    manifest.record(source, sha, [], chunker="v1")
+
+    assert manifest.diff([str(a)], chunker="v1") == ({}, [], [str(a)])
+    assert manifest.diff([str(a)], chunker="v2") == ({str(a): sha}, [], [])
@@ -0,0 +1,36 @@
+import asyncio
+
+from backend.concurrency import run_blocking
+from backend.metrics import Registry, stage, trace
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    hits = registry.counter("hits_total", "Cache hits", ["cache"])
+    latency = registry.histogram("latency_seconds", "Latency", ["stage"], buckets=[0.1, 1.0])
+
+    hits.inc(cache="query")
+    hits.inc(2, cache="query")
+    latency.observe(0.05, stage="bm25")
+    latency.observe(0.5, stage="bm25")
+
+    text = registry.render()
+    assert 'hits_total{cache="query"} 3' in text
+    assert 'latency_seconds_bucket{stage="bm25",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="bm25",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{stage="bm25"} 2' in text
+
+
+def test_trace_follows_work_onto_executor():
+    def work():
+        with stage("dense_search"):
+            pass
+        return "done"
+
+    async def handler():
+        with trace() as timings:
+            await run_blocking(work)
+        return timings
+
+    timings = asyncio.run(handler())
+    assert set(timings) == {"dense_search"}
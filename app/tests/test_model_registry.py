@@ -0,0 +1,83 @@
+import threading
+
+from backend.model_registry import ModelRegistry
+
+
+def test_loads_once_and_warms():
+    registry = ModelRegistry()
+    loads, warms = [], []
+
+    def loader():
+        loads.append(1)
+        return object()
+
+    registry.register("ce", loader, lambda m: warms.append(m))
+    registry.register("ce", lambda: None)  # already registered: ignored
+
+    threads = [threading.Thread(target=registry.get, args=("ce",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1
+    assert registry.health()["status"] == "loading"
+
+    registry.warm_all()
+    registry.warm_all()
+    assert warms == [registry.get("ce")]
+    assert registry.ready and registry.health()["status"] == "ok"
+
+
+def test_failed_load_reported_and_retried():
+    registry = ModelRegistry()
+    attempts = []
+
+    def loader():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("weights not found")
+        return "model"
+
+    registry.register("ce", loader)
+    registry.warm_all()
+
+    report = registry.health()
+    assert report["status"] == "error" and not report["ready"]
+    assert report["models"]["ce"]["error"] == "weights not found"
+
+    assert registry.get("ce") == "model"
+    assert registry.health()["status"] == "ok"
+
+
+def test_serving_model_keeps_only_active_and_rollback_target(tmp_path, monkeypatch):
+    import time
+
+    from backend import model_registry
+    from backend.rag import reranker_versions as rv
+
+    registry = ModelRegistry()
+    monkeypatch.setattr(model_registry, "_REGISTRY", registry)
+    monkeypatch.setattr(model_registry, "load_cross_encoder", lambda name, backend: object())
+    monkeypatch.setattr(model_registry, "_warm_cross_encoder", lambda model: None)
+    monkeypatch.setattr(rv, "RERANKER_DIR", str(tmp_path))
+    monkeypatch.setattr(rv, "VERSIONS_DIR", str(tmp_path / "versions"))
+    monkeypatch.setattr(rv, "STATE_PATH", str(tmp_path / "active.json"))
+
+    serving = rv.ServingModel("base-model", "torch")
+    serving.current()
+    versions = []
+    for _ in range(3):
+        version = rv.new_version()
+        (tmp_path / "versions" / version).mkdir(parents=True)
+        rv.write_version_meta(version, {})
+        versions.append(version)
+
+        serving.activate(version)
+        while serving.swap["state"] == "loading":
+            time.sleep(0.01)
+        assert serving.version == version
+
+    # Active v3 + rollback target v2, plus the always-available base
+    loaded = {serving._key(v) for v in versions + [rv.BASE_VERSION]} & set(registry.status())
+    assert loaded == {serving._key(versions[2]), serving._key(versions[1]), serving._key(rv.BASE_VERSION)}
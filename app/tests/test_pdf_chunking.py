@@ -0,0 +1,52 @@
+from backend.rag import chunking
+from backend.rag.chunking import chunk_words, iter_page_chunks, iter_pdf_chunks
+
+
+def test_chunks_keep_pages_offsets_and_overlap():
+    pages = [(1, "a b c d"), (2, ""), (3, "e f\ng h i")]
+    doc = "\n".join(text for _, text in pages)
+
+    chunks = list(iter_page_chunks(pages, "doc.pdf", chunk_size=4, overlap=1))
+
+    assert [c["text"] for c in chunks] == ["a b c d", "d e f g", "g h i"]
+    assert [(c["page"], c["page_end"]) for c in chunks] == [(1, 1), (1, 3), (3, 3)]
+    for c in chunks:
+        # Offsets index the pages joined with "\n"
+        assert " ".join(doc[c["char_start"]:c["char_end"]].split()) == c["text"]
+    assert len({c["id"] for c in chunks}) == 3
+
+
+def test_no_trailing_chunk_of_overlap_only():
+    chunks = list(iter_page_chunks([(1, "a b c d e f")], "doc.pdf", chunk_size=3, overlap=1))
+    assert [c["text"] for c in chunks] == ["a b c", "c d e", "e f"]
+
+    chunks = list(iter_page_chunks([(1, "a b c d e")], "doc.pdf", chunk_size=3, overlap=1))
+    assert [c["text"] for c in chunks] == ["a b c", "c d e"]
+
+
+def test_chunk_words_windows():
+    assert chunk_words("a b  c\nd e", chunk_size=2) == ["a b", "c d", "e"]
+    assert chunk_words("   ", chunk_size=2) == []
+
+
+class _FakeReader:
+    PAGES = {"a.pdf": ["a b c", "d e", "f g h i"], "b.pdf": [], "c.pdf": ["x y z"]}
+
+    def __init__(self, path):
+        self.pages = [type("Page", (), {"extract_text": lambda self, t=t: t})() for t in self.PAGES[path]]
+        self.metadata = None
+
+
+def test_pdf_chunks_stream_per_document(monkeypatch):
+    monkeypatch.setattr(chunking, "PdfReader", _FakeReader)
+    monkeypatch.setattr(chunking.os.path, "getmtime", lambda path: 0.0)
+
+    def read(skip=()):
+        stream = iter_pdf_chunks(["a.pdf", "b.pdf", "c.pdf"], chunk_size=3, overlap=1, workers=1, pages_per_task=2)
+        return {path: [c["text"] for c in chunks] for path, chunks in stream if path not in skip}
+
+    pages = list(enumerate(_FakeReader.PAGES["a.pdf"], start=1))
+    a_chunks = [c["text"] for c in iter_page_chunks(pages, "a.pdf", 3, 1)]
+    assert read() == {"a.pdf": a_chunks, "b.pdf": [], "c.pdf": ["x y z"]}
+    # Chunks left unread are skipped
+    assert read(skip={"a.pdf"}) == {"b.pdf": [], "c.pdf": ["x y z"]}
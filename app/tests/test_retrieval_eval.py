@@ -0,0 +1,29 @@
+import math
+
+from benchmarks.retrieval_eval import dedup_ranking, evaluate, mrr_at_k, ndcg_at_k, recall_at_k
+
+
+QRELS = {"a": 2, "b": 1, "z": 0}
+
+
+def test_rank_metrics():
+    ranking = ["x", "b", "a", "y"]
+
+    assert recall_at_k(ranking, QRELS, 2) == 0.5
+    assert recall_at_k(ranking, QRELS, 3) == 1.0
+    assert mrr_at_k(ranking, QRELS, 10) == 0.5
+    assert mrr_at_k(ranking, QRELS, 1) == 0.0
+
+    dcg = 1 / math.log2(3) + 3 / math.log2(4)
+    ideal = 3 / math.log2(2) + 1 / math.log2(3)
+    assert math.isclose(ndcg_at_k(ranking, QRELS, 10), dcg / ideal)
+
+
+def test_evaluate_averages_over_queries():
+    rankings = [dedup_ranking(["a", "a", "b"]), ["y", "x"]]
+    out = evaluate(rankings, [QRELS, {"x": 1}], ks=[1, 5])
+
+    assert out["recall@1"] == 0.25  # (0.5 + 0) / 2
+    assert out["recall@5"] == 1.0
+    assert out["mrr@5"] == 0.75
+    assert math.isclose(out["ndcg@5"], (1.0 + 1 / math.log2(3)) / 2, abs_tol=1e-4)
@@ -1,6 +1,6 @@
 def test_imports():
     import app.config  # noqa: F401
     import app.ingestion  # noqa: F401
-    import app.retrieval  # noqa: F401
+    import app.rag.retriever  # noqa: F401
     import app.llm  # noqa: F401
     import app.api  # noqa: F401
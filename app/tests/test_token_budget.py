@@ -0,0 +1,35 @@
+from backend.rag.token_budget import TokenCounter, context_budget, context_window, text_key
+
+
+def test_pack_in_rank_order_and_cut_last_chunk_at_sentence():
+    counter = TokenCounter("gpt-4o")
+    first = "Keys are rotated yearly. " * 10
+    second = "Backups are encrypted. They are stored in a second region. " * 20
+    third = "Never reached."
+
+    budget = counter.count(first) + 60
+    packed, used = counter.pack([first, second, third], budget)
+
+    assert [i for i, _ in packed] == [0, 1]
+    assert packed[0][1] == first
+    cut = packed[1][1]
+    assert second.startswith(cut) and len(cut) < len(second)
+    assert cut.endswith(".")
+    assert used <= budget
+
+
+def test_changed_text_under_same_chunk_id_is_recounted():
+    counter = TokenCounter("gpt-4o")
+    # A re-ingested chunk keeps its id but not its text: counts follow the text
+    old, new = "some chunk text", "different text entirely, much longer than before"
+    n_old = counter.pack([old], 1000)[1]
+    n_new = counter.pack([new], 1000)[1]
+
+    assert n_new == len(counter.encoding.encode(new)) != n_old
+    assert counter.count(new, key=text_key(new)) == n_new
+
+
+def test_context_budget_respects_model_window():
+    assert context_window("gpt-4o-2024-08-06") == 128000
+    assert context_budget("gpt-4o", overhead_tokens=100, max_tokens=3000) == 3000
+    assert context_budget("gpt-4", overhead_tokens=8000, max_tokens=3000) == 0
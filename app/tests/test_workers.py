@@ -0,0 +1,21 @@
+from backend.workers import IndexGeneration, InterProcessLock
+
+
+def test_generation_bump_seen_by_other_processes(tmp_path):
+    path = str(tmp_path / "generation")
+    writer, reader = IndexGeneration(path), IndexGeneration(path)
+
+    assert writer.bump() == 1
+    assert not writer.changed()  # its own bump
+    assert reader.changed() and not reader.changed()
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "dispatch.lock")
+    first, second = InterProcessLock(path), InterProcessLock(path)
+
+    assert first.acquire(blocking=False)
+    assert not second.acquire(blocking=False)
+    first.release()
+    assert second.acquire(blocking=False)
+    second.release()
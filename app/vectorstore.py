@@ -4,21 +4,22 @@ import os
 from typing import Optional, List
 
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain.schema import Document
 
+from backend.rag.flat_index import build_flat_index, get_flat_index
+from backend.workers import IndexGeneration, get_index_generation
+
 from .config import Settings
+from .embeddings import CachedEmbeddings, get_embedding_model
 
 settings = Settings()
 
 _VECTORSTORE: Optional[Chroma] = None
 
 
-def _load_embeddings() -> OpenAIEmbeddings:
-    return OpenAIEmbeddings(
-        model=settings.embedding_model,
-        openai_api_key=settings.openai_api_key,
-    )
+def _load_embeddings() -> CachedEmbeddings:
+    # OpenAI embeddings behind the shared on-disk cache
+    return get_embedding_model()
 
 
 def get_vectorstore() -> Chroma:
@@ -45,10 +46,68 @@ def get_vectorstore() -> Chroma:
     return _VECTORSTORE
 
 
-def add_documents(docs: List[Document]) -> None:
+def reopen_vectorstore() -> None:
+    """
+    Drop the singleton so the next call reopens Chroma from disk, e.g.
+    after another API worker ingested; Chroma caches its system per path.
+    """
+    global _VECTORSTORE
+    if _VECTORSTORE is not None:
+        _VECTORSTORE._client.clear_system_cache()
+        _VECTORSTORE = None
+
+
+def add_documents(docs: List[Document], ids: Optional[List[str]] = None) -> List[str]:
     """
     Add new documents to the vectorstore and persist it.
+    Passing deterministic ids makes the write an idempotent upsert.
+    Returns the ids assigned to the stored chunks.
     """
     vs = get_vectorstore()
-    vs.add_documents(docs)
+    ids = vs.add_documents(docs, ids=ids)
     vs.persist()
+    return ids
+
+
+def delete_documents(ids: List[str]) -> None:
+    """
+    Remove chunks from the vectorstore by id and persist it.
+    """
+    if not ids:
+        return
+    vs = get_vectorstore()
+    vs.delete(ids=ids)
+    vs.persist()
+
+
+def flat_index_dir() -> str:
+    return os.path.join(settings.data_dir, "flat")
+
+
+def refresh_flat_index(batch_size: int = 1024):
+    """
+    Export the stored embeddings into a new generation of the
+    memory-mapped flat index (DENSE_BACKEND=flat, see backend/rag/flat_index.py).
+    """
+    vs = get_vectorstore()
+    count = vs._collection.count()
+
+    def batches():
+        for offset in range(0, count, batch_size):
+            page = vs.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+
+    return build_flat_index(batches(), count, root=flat_index_dir())
+
+
+def get_app_flat_index():
+    return get_flat_index(flat_index_dir())
+
+
+def bm25_index_dir() -> str:
+    return os.path.join(settings.data_dir, "bm25")
+
+
+def index_generation() -> IndexGeneration:
+    # Bumped after each ingest; API workers reopen their indexes when it moves
+    return get_index_generation(os.path.join(settings.data_dir, "index_generation"))
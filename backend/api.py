@@ -1,18 +1,37 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime, time as dt_time, timedelta, timezone
 import os
 import json
+import time
+import asyncio
+import logging
+import threading
 
-from backend.vectorstore import list_documents, delete_document, rebuild_index
-from backend.ingestion import ingest_pdfs
-from backend.rag.retriever import hybrid_retrieve
+from backend.vectorstore import (
+    list_documents, remove_document, refresh_bm25_index, refresh_flat_index, reopen_collection, embedding_function,
+)
+from backend.rag.retriever import hybrid_retrieve_timed
+from backend.rag.bm25 import load_index
+from backend.rag.filters import MetadataFilter
+from backend.rag.flat_index import get_flat_index
 from backend.rag.reranker import CrossEncoderReranker
-from backend.llm import generate_answer, stream_answer
-from backend.training import train_crossencoder
-from backend.config import DATA_DIR
+from backend.rag.reranker_versions import list_versions
+from backend.llm import agenerate_answer, astream_answer
+from backend.concurrency import run_blocking
+from backend.jobs import get_job_manager
+from backend.job_routes import job_router
+from backend import job_tasks
+from backend.query_cache import QueryCache
+from backend.metrics import trace, stage, record_stage, run_traced, render_metrics, CONTENT_TYPE
+from backend.model_registry import get_model_registry
+from backend.workers import get_index_generation
+from backend.config import DATA_DIR, STREAM_HEARTBEAT_SEC, MODEL_WARMUP, DENSE_BACKEND
+
+logger = logging.getLogger(__name__)
 
 # -------------------------------------------------------
 # FASTAPI APP
@@ -33,7 +52,88 @@ app.add_middleware(
 # INITIALIZE RERANKER
 # -------------------------------------------------------
 
-reranker = CrossEncoderReranker()
+# Cached answers were scored by the old model: drop them on every swap
+reranker = CrossEncoderReranker(on_swap=lambda version: query_cache.invalidate())
+
+# Answers for repeated / near-duplicate questions; dropped on index changes
+query_cache = QueryCache(embed_fn=embedding_function)
+
+# Bumped after every index rebuild, by whichever process did it
+index_generation = get_index_generation()
+
+# Training / ingestion / reindex run as background jobs in worker processes
+jobs = get_job_manager("backend")
+app.include_router(job_router(jobs))
+
+
+@app.on_event("startup")
+def load_bm25_index():
+    # Load the persisted BM25 inverted index once per process;
+    # build it from Chroma if it has never been persisted.
+    if not load_index().docs:
+        refresh_bm25_index()
+
+
+@app.on_event("startup")
+def load_flat_index():
+    # DENSE_BACKEND=flat: export Chroma's embeddings once if no generation
+    # exists yet; afterwards every worker just maps the live generation
+    if DENSE_BACKEND == "flat" and get_flat_index() is None:
+        refresh_flat_index()
+
+
+@app.on_event("startup")
+def warm_models():
+    # Register the models this process serves with and load + warm them
+    # in the background; /health reports ready once they are done.
+    registry = get_model_registry()
+    reranker.serving.register()
+    registry.register(
+        "embedding/chroma-default",
+        lambda: embedding_function,
+        lambda f: f.inner(["warm up"]),  # bypass the embedding cache
+    )
+    if MODEL_WARMUP:
+        threading.Thread(target=registry.warm_all, name="model-warmup", daemon=True).start()
+
+
+def _reload_indexes():
+    # Another process rewrote Chroma + the BM25 export: pick both up here
+    # (the flat index follows its CURRENT file on its own)
+    reopen_collection()
+    load_index()
+    query_cache.invalidate()
+
+
+async def _sync_indexes():
+    # Per request: a file read unless another worker / job bumped the generation
+    if index_generation.changed():
+        await run_blocking(_reload_indexes)
+
+
+def _index_changed(job: dict):
+    if index_generation.changed():
+        _reload_indexes()
+
+
+def _reranker_trained(job: dict):
+    if job["result"].get("activate"):
+        reranker.activate(job["result"]["version"])
+
+
+@app.on_event("startup")
+def start_jobs():
+    jobs.on_complete("ingest", _index_changed)
+    jobs.on_complete("reindex", _index_changed)
+    jobs.on_complete("delete", _index_changed)
+    jobs.on_complete("train_reranker", _reranker_trained)
+    jobs.start()
+
+
+def _submit(kind: str, spec: tuple, **params) -> dict:
+    target, group = spec
+    job = jobs.submit(kind, target, params, group=group)
+    return {"job_id": job["id"], "status": job["status"]}
 
 # -------------------------------------------------------
 # REQUEST MODELS
@@ -42,6 +142,14 @@ reranker = CrossEncoderReranker()
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
+    include_timings: bool = False  # add a per-stage "stage_ms" breakdown
+
+    # Metadata filters, applied inside both retrievers
+    sources: Optional[List[str]] = None  # document filenames (as in /documents)
+    page_from: Optional[int] = None      # pages are 1-based, inclusive
+    page_to: Optional[int] = None
+    date_from: Optional[date] = None     # document date, inclusive (UTC)
+    date_to: Optional[date] = None
 
     class Config:
         extra = "ignore"  # ignore any old openai_api_key sent by frontend
@@ -57,6 +165,7 @@ class TrainRerankerRequest(BaseModel):
     samples: List[TrainingSample]
     num_epochs: int
     batch_size: int
+    activate: bool = True  # swap the new version in once it is warmed
 
     class Config:
         extra = "ignore"  # ignore legacy fields if any
@@ -71,6 +180,13 @@ def root():
     return {"status": "ok", "message": "RAG backend running"}
 
 
+@app.get("/health")
+def health():
+    # Readiness: 503 until every registered model is loaded and warmed
+    report = get_model_registry().health()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
 # ----------------- DOCUMENTS --------------------------
 
 @app.get("/documents")
@@ -78,7 +194,7 @@ def get_docs():
     return {"documents": list_documents()}
 
 
-@app.post("/documents/upload")
+@app.post("/documents/upload", status_code=202)
 async def upload_docs(files: List[UploadFile] = File(...)):
     os.makedirs(DATA_DIR, exist_ok=True)
 
@@ -95,82 +211,313 @@ async def upload_docs(files: List[UploadFile] = File(...)):
         with open(dest_path, "wb") as f:
             f.write(content)
 
-    # Ingest PDFs and update vectorstore
-    ingest_pdfs()
-
-    return {"documents": list_documents()}
+    # Ingest + index in a background job; poll /jobs/{job_id}
+    return {"documents": list_documents(), **_submit("ingest", job_tasks.INGEST)}
 
 
-@app.delete("/documents/{filename}")
+@app.delete("/documents/{filename}", status_code=202)
 def delete_file(filename: str):
-    delete_document(filename)
-    return {"documents": list_documents()}
+    # The PDF goes now; dropping its chunks and rebuilding the indexes runs
+    # as an "index" job, queued behind any ingest / reindex in progress
+    remove_document(filename)
+    return {"documents": list_documents(), **_submit("delete", job_tasks.DELETE, filename=filename)}
 
 
-@app.post("/documents/reindex")
-def reindex():
-    count = rebuild_index()
-    return {"indexed_chunks": count}
+@app.post("/documents/reindex", status_code=202)
+def reindex(full: bool = False):
+    # Incremental by default: only new / modified PDFs are re-chunked.
+    # A full rebuild writes a staging collection; cancelling it is refused
+    # (409) once it swaps that in.
+    # The job result has indexed_chunks, batches, elapsed_sec, chunks_per_sec, progress
+    return _submit("reindex", job_tasks.REINDEX, full=full)
 
 
 # ----------------- QUERY RAG (NON-STREAMING) ----------
 
-@app.post("/query")
-def query(req: QueryRequest):
-    # Hybrid retrieve
-    retrieved = hybrid_retrieve(req.query, req.top_k)
+def _epoch(day: date) -> float:
+    return datetime.combine(day, dt_time.min, tzinfo=timezone.utc).timestamp()
+
+
+def _request_filter(req: QueryRequest) -> Optional[MetadataFilter]:
+    """
+    The request's metadata filter, or None; 400 on an invalid range.
+    """
+    try:
+        flt = MetadataFilter(
+            sources=[os.path.join(DATA_DIR, name) for name in req.sources] if req.sources else None,
+            page_from=req.page_from,
+            page_to=req.page_to,
+            date_from=_epoch(req.date_from) if req.date_from else None,
+            # date_to is inclusive: everything before the next day
+            date_to=_epoch(req.date_to + timedelta(days=1)) if req.date_to else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return None if flt.is_empty else flt
+
+
+def _filter_scope(flt: Optional[MetadataFilter]) -> tuple:
+    return flt.key() if flt is not None else ()
+
+
+def _retrieve_and_rerank(query: str, top_k: int, filters: Optional[MetadataFilter] = None):
+    """
+    Returns (reranked, timings); timings has one entry per retrieval leg.
+    """
+    # Hybrid retrieve (dense + BM25 concurrently)
+    try:
+        retrieved, timings = hybrid_retrieve_timed(query, top_k, filters)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
 
     # Cross-encoder reranking
-    reranked = reranker.rerank(req.query, retrieved)
+    return reranker.rerank(query, retrieved), timings
+
+
+def _reranker_version(sources: list) -> str:
+    # The version that scored these sources (cached answers keep theirs)
+    return sources[0].get("reranker_version", reranker.version) if sources else reranker.version
+
 
-    # Final LLM answer (backend key only)
-    answer = generate_answer(
+async def _answer_query(req: QueryRequest) -> dict:
+    filters = _request_filter(req)
+    scope = _filter_scope(filters)
+    await _sync_indexes()
+
+    cached = await run_blocking(query_cache.lookup, req.query, req.top_k, scope)
+    if cached is not None:
+        return {
+            "answer": cached["answer"],
+            "sources": cached["sources"],
+            "cache": cached["cache"],
+            "reranker_version": _reranker_version(cached["sources"]),
+        }
+
+    generation = query_cache.generation
+
+    # Retrieval + reranking on the sized executor
+    reranked, timings = await run_blocking(_retrieve_and_rerank, req.query, req.top_k, filters)
+
+    # Final LLM answer (backend key only), awaited without holding a thread;
+    # the context is packed to the model's token budget
+    prompt_info = {}
+    answer = await agenerate_answer(
         query=req.query,
-        retrieved=reranked
+        retrieved=reranked,
+        prompt_info=prompt_info,
     )
 
+    await run_blocking(query_cache.store, req.query, req.top_k, answer, reranked,
+                       generation=generation, scope=scope)
+
     return {
         "answer": answer,
-        "sources": reranked
+        "sources": reranked,
+        "timings": timings,
+        "reranker_version": _reranker_version(reranked),
+        "prompt_tokens": prompt_info["prompt_tokens"],
+        "context_chunks": prompt_info["context_chunks"],
     }
 
 
+@app.post("/query")
+async def query(req: QueryRequest):
+    with trace() as stage_ms:
+        with stage("request"):
+            response = await _answer_query(req)
+
+    if req.include_timings:
+        response["stage_ms"] = stage_ms
+    return response
+
+
 # ----------------- QUERY RAG (STREAMING) --------------
 
+def _event(type_: str, **fields) -> str:
+    return json.dumps({"type": type_, **fields}) + "\n"
+
+
+async def _heartbeat_until(task: asyncio.Future):
+    """
+    Yield a heartbeat event every STREAM_HEARTBEAT_SEC until `task` is done.
+    """
+    while not task.done():
+        done, _ = await asyncio.wait({task}, timeout=STREAM_HEARTBEAT_SEC)
+        if not done:
+            yield _event("heartbeat")
+
+
 @app.post("/query-stream")
-def query_stream(req: QueryRequest):
+async def query_stream(req: QueryRequest):
     """
-    Streaming endpoint.
-    Sends JSON lines:
+    Streaming endpoint. Returns immediately and sends JSON lines:
+      {"type": "progress", "stage": "started"}
+      {"type": "progress", "stage": "retrieved", "count": n, "timings": {...}}
+      {"type": "progress", "stage": "reranked", "count": n}
+      {"type": "sources", "sources": [...]}
       {"type": "token", "content": "..."}
-      {"type": "meta", "sources": [...]}
+      {"type": "meta", "sources": [...], "timings": {...}, "reranker_version": "...",
+       "prompt_tokens": n, "context_chunks": n}
+    plus {"type": "heartbeat"} while waiting on a slow stage, and
+    {"type": "error", "detail": "..."} in place of the rest if a stage fails.
+
+    A cache hit skips retrieval and replays sources, tokens and meta, each
+    sources / meta event carrying "cache". With include_timings the meta
+    event also carries "stage_ms". An invalid filter is a 400 before streaming.
     """
+    filters = _request_filter(req)
+    scope = _filter_scope(filters)
+    await _sync_indexes()
+    start = time.perf_counter()
+    stage_ms = {}
+
+    def elapsed_ms(since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 3)
+
+    def blocking(fn, *args):
+        # Retrieval executor, recording into this request's breakdown
+        return asyncio.ensure_future(run_blocking(run_traced, stage_ms, fn, *args))
+
+    async def event_generator():
+        yield _event("progress", stage="started")
+
+        pending = None
+        try:
+            pending = blocking(query_cache.lookup, req.query, req.top_k, scope)
+            async for hb in _heartbeat_until(pending):
+                yield hb
+            cached = pending.result()
+
+            if cached is not None:
+                yield _event("sources", sources=cached["sources"], cache=cached["cache"])
+                for token in cached["tokens"]:
+                    yield _event("token", content=token)
+                meta = {
+                    "sources": cached["sources"],
+                    "cache": cached["cache"],
+                    "reranker_version": _reranker_version(cached["sources"]),
+                }
+                if req.include_timings:
+                    meta["stage_ms"] = dict(stage_ms, request=elapsed_ms(start))
+                yield _event("meta", **meta)
+                return
+
+            generation = query_cache.generation
+
+            # Hybrid retrieve (dense + BM25 concurrently)
+            pending = blocking(hybrid_retrieve_timed, req.query, req.top_k, filters)
+            async for hb in _heartbeat_until(pending):
+                yield hb
+            retrieved, timings = pending.result()
+            yield _event("progress", stage="retrieved", count=len(retrieved), timings=timings)
+
+            # Cross-encoder reranking
+            pending = blocking(reranker.rerank, req.query, retrieved)
+            async for hb in _heartbeat_until(pending):
+                yield hb
+            reranked = pending.result()
+            yield _event("progress", stage="reranked", count=len(reranked))
+
+            # Sources go out before generation so clients can render citations
+            yield _event("sources", sources=reranked)
+
+            # Stream tokens (astream_answer records the llm histograms; the
+            # breakdown is filled in here since the trace does not span yields)
+            tokens = []
+            prompt_info = {}
+            llm_start = time.perf_counter()
+            stream = astream_answer(req.query, reranked, prompt_info).__aiter__()
+            while True:
+                pending = asyncio.ensure_future(stream.__anext__())
+                async for hb in _heartbeat_until(pending):
+                    yield hb
+                try:
+                    token = pending.result()
+                except StopAsyncIteration:
+                    break
+                if not tokens:
+                    stage_ms["llm_first_token"] = elapsed_ms(llm_start)
+                tokens.append(token)
+                yield _event("token", content=token)
+
+        except Exception as e:
+            logger.exception("query-stream failed")
+            yield _event("error", detail=str(e) or type(e).__name__)
+            return
+
+        finally:
+            # Client went away mid-stage: stop waiting on the pending step
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+        stage_ms["llm"] = elapsed_ms(llm_start)
+        stage_ms["request"] = elapsed_ms(start)
+        record_stage("request", stage_ms["request"] / 1000)
+
+        # Final metadata, kept for clients of the original protocol
+        meta = {
+            "sources": reranked,
+            "timings": timings,
+            "reranker_version": _reranker_version(reranked),
+            "prompt_tokens": prompt_info.get("prompt_tokens"),
+            "context_chunks": prompt_info.get("context_chunks"),
+        }
+        if req.include_timings:
+            meta["stage_ms"] = stage_ms
+        yield _event("meta", **meta)
+
+        # Only complete streams are cached
+        await run_blocking(query_cache.store, req.query, req.top_k, "".join(tokens), reranked,
+                           tokens=tokens, generation=generation, scope=scope)
 
-    # Hybrid retrieve & rerank once
-    retrieved = hybrid_retrieve(req.query, req.top_k)
-    reranked = reranker.rerank(req.query, retrieved)
+    return StreamingResponse(event_generator(), media_type="text/plain")
 
-    def event_generator():
-        # Stream tokens
-        for token in stream_answer(req.query, reranked):
-            msg = json.dumps({"type": "token", "content": token})
-            yield msg + "\n"
 
-        # After streaming completes, send metadata (sources)
-        meta = json.dumps({"type": "meta", "sources": reranked})
-        yield meta + "\n"
+# ----------------- METRICS ----------------------------
 
-    return StreamingResponse(event_generator(), media_type="text/plain")
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format: stage histograms, cache / rerank / token counters
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
 
 
 # ----------------- TRAIN RERANKER ---------------------
 
-@app.post("/train-reranker")
+@app.post("/train-reranker", status_code=202)
 def train_reranker(req: TrainRerankerRequest):
-    model_path = train_crossencoder(
-        samples=req.samples,
-        epochs=req.num_epochs,
+    # Result: version + model_path; activated on success if req.activate
+    return _submit(
+        "train_reranker",
+        job_tasks.TRAIN_RERANKER,
+        samples=[s.dict() for s in req.samples],
+        num_epochs=req.num_epochs,
         batch_size=req.batch_size,
+        activate=req.activate,
     )
 
-    return {"status": "ok", "model_path": model_path}
+
+# ----------------- RERANKER VERSIONS ------------------
+
+def _swap_reranker(fn, *args) -> dict:
+    # Starts a background load + warm; poll GET /reranker for completion
+    try:
+        return fn(*args)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/reranker")
+def reranker_status():
+    return {**reranker.serving.status(), "versions": list_versions()}
+
+
+@app.post("/reranker/activate/{version}")
+def activate_reranker(version: str):
+    return _swap_reranker(reranker.activate, version)
+
+
+@app.post("/reranker/rollback")
+def rollback_reranker():
+    return _swap_reranker(reranker.rollback)
@@ -0,0 +1,55 @@
+"""
+Sized thread pool for blocking retrieval / reranking work.
+
+Async request handlers hand CPU- and IO-bound sync calls (Chroma, BM25,
+cross-encoder) to this executor, so a slow LLM generation never holds
+one of its threads and the event loop stays free.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from backend.config import RETRIEVAL_WORKERS
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+# Retrieval legs are submitted from work already running on _EXECUTOR;
+# a separate pool means a saturated _EXECUTOR can never deadlock on them.
+_LEG_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=RETRIEVAL_WORKERS,
+                thread_name_prefix="retrieval",
+            )
+        return _EXECUTOR
+
+
+def get_leg_executor() -> ThreadPoolExecutor:
+    global _LEG_EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _LEG_EXECUTOR is None:
+            _LEG_EXECUTOR = ThreadPoolExecutor(
+                max_workers=2 * RETRIEVAL_WORKERS,
+                thread_name_prefix="retrieval-leg",
+            )
+        return _LEG_EXECUTOR
+
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """
+    Await a sync function on the retrieval executor. Context variables
+    (e.g. the request trace) are carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(ctx.run, fn, *args, **kwargs))
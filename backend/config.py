@@ -7,5 +7,97 @@ DATA_DIR = "data"
 VECTOR_DB_DIR = "vectorstore"
 MODEL_DIR = "models"
 RERANKER_DIR = "models/reranker"
+BM25_INDEX_PATH = os.path.join(VECTOR_DB_DIR, "bm25_index.json")
+# Memory-mapped BM25 export (CSR postings), shared by all API workers
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", os.path.join(VECTOR_DB_DIR, "bm25"))
+MANIFEST_PATH = os.path.join(VECTOR_DB_DIR, "manifest.json")
+
+# Bulk indexing: flush a write batch at whichever limit is hit first
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "256"))
+INDEX_BATCH_MAX_CHARS = int(os.getenv("INDEX_BATCH_MAX_CHARS", "500000"))
+
+# Embedding cache (kept outside VECTOR_DB_DIR so full rebuilds reuse it)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join("cache", "embeddings.sqlite3"))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(1024 ** 3)))
+EMBED_CACHE_LRU_SIZE = int(os.getenv("EMBED_CACHE_LRU_SIZE", "10000"))
+
+# Query response cache (similarity 0 disables the semantic tier)
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0"))
+QUERY_CACHE_RECENT = int(os.getenv("QUERY_CACHE_RECENT", "256"))
+
+# Cross-encoder reranker: "torch" (PyTorch / sentence-transformers) or "onnx"
+# (ONNX Runtime, exported on first use into ONNX_RERANKER_DIR)
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch")
+# Pairs per cross-encoder forward pass (length-sorted, padded per batch)
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+ONNX_RERANKER_DIR = os.getenv("ONNX_RERANKER_DIR", os.path.join(MODEL_DIR, "onnx"))
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1") == "1"
+# Threads per ONNX Runtime call; requests already run in parallel on the
+# retrieval pool, so default to half the cores rather than all of them
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Load + warm the reranker / embedding models in the background at API
+# startup (0 = load lazily on the first query)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Dense retrieval backend: "chroma" (HNSW) or "flat" (memory-mapped
+# vectors exported from Chroma after each ingest, see backend/rag/flat_index.py).
+# Flat storage dtype float32 | float16 | int8; FLAT_INDEX_NLIST > 0 adds an
+# IVF coarse quantizer probing FLAT_INDEX_NPROBE lists (0 = exact search)
+DENSE_BACKEND = os.getenv("DENSE_BACKEND", "chroma")
+FLAT_INDEX_DIR = os.getenv("FLAT_INDEX_DIR", os.path.join(VECTOR_DB_DIR, "flat"))
+FLAT_INDEX_DTYPE = os.getenv("FLAT_INDEX_DTYPE", "float32")
+FLAT_INDEX_NLIST = int(os.getenv("FLAT_INDEX_NLIST", "0"))
+FLAT_INDEX_NPROBE = int(os.getenv("FLAT_INDEX_NPROBE", "8"))
+
+# Hybrid retrieval fusion: rrf | minmax | zscore
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf")
+FUSION_DENSE_WEIGHT = float(os.getenv("FUSION_DENSE_WEIGHT", "0.5"))
+FUSION_SPARSE_WEIGHT = float(os.getenv("FUSION_SPARSE_WEIGHT", "0.5"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# API server processes (run_api.py). 1 = development server with reload;
+# more = production mode: shared indexes are built once before the workers
+# start, each worker maps them, and all reload when INDEX_GENERATION_PATH
+# is bumped after an ingest (kept outside VECTOR_DB_DIR: a full rebuild
+# must not reset the counter)
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+INDEX_GENERATION_PATH = os.getenv("INDEX_GENERATION_PATH", os.path.join("cache", "index_generation"))
+
+# Threads for blocking retrieval / reranking work behind async handlers
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "8"))
+
+# Per-leg deadlines (seconds) for the concurrent dense / BM25 retrieval fan-out
+DENSE_LEG_TIMEOUT = float(os.getenv("DENSE_LEG_TIMEOUT", "5"))
+SPARSE_LEG_TIMEOUT = float(os.getenv("SPARSE_LEG_TIMEOUT", "1"))
+
+# Seconds between heartbeat events on /query-stream while nothing else is sent
+STREAM_HEARTBEAT_SEC = float(os.getenv("STREAM_HEARTBEAT_SEC", "2"))
+
+# LLM prompt budget (tokens): context is packed in rank order up to
+# min(CONTEXT_MAX_TOKENS, model window - ANSWER_RESERVE_TOKENS - prompt)
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+ANSWER_RESERVE_TOKENS = int(os.getenv("ANSWER_RESERVE_TOKENS", "1024"))
+# Cached per-chunk token counts (entries)
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "50000"))
+
+# Background jobs (training / ingestion / reindex): persisted state,
+# concurrent worker processes, dispatcher poll interval (seconds)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join("jobs", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SEC = float(os.getenv("JOB_POLL_SEC", "0.5"))
+
+# PDF chunking: words per chunk, words shared by consecutive chunks
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "400"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "40"))
+
+# Parallel PDF extraction/chunking (0 pending = 2x workers); each worker
+# task extracts up to INGEST_PAGES_PER_TASK pages of one PDF
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "0"))
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
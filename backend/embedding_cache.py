@@ -0,0 +1,229 @@
+"""
+Persistent embedding cache shared by the app and backend stacks.
+
+- Keyed by model name + hash of the whitespace-normalized text
+- SQLite on disk, float32 blobs
+- In-process LRU in front of SQLite for hot chunks / repeated queries,
+  holding the same float32 arrays as the store (lists are only built
+  for callers)
+- Size-based eviction of least-recently-used rows once the store
+  grows past `max_bytes`
+
+Typical use is cache.embed(model_name, texts, embed_fn): cached vectors
+are returned as-is and only the misses go to `embed_fn`, in one call.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from backend.metrics import CACHE_REQUESTS, stage
+from backend.config import EMBED_CACHE_PATH, EMBED_CACHE_MAX_BYTES, EMBED_CACHE_LRU_SIZE
+
+
+# Max keys per SQLite IN (...) lookup
+_SQL_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        path: str = EMBED_CACHE_PATH,
+        max_bytes: int = EMBED_CACHE_MAX_BYTES,
+        lru_size: int = EMBED_CACHE_LRU_SIZE,
+    ):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lru_size = lru_size
+
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------- LRU front ----------------
+
+    def _lru_get(self, key: str) -> Optional[np.ndarray]:
+        vec = self._lru.get(key)
+        if vec is not None:
+            self._lru.move_to_end(key)
+        return vec
+
+    def _lru_put(self, key: str, vec: np.ndarray):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # ---------------- public API ----------------
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        return [None if vec is None else vec.tolist() for vec in self._get_arrays(model_name, texts)]
+
+    def _get_arrays(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        keys = [cache_key(model_name, t) for t in texts]
+        out: List[Optional[np.ndarray]] = [None] * len(keys)
+
+        with self._lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                vec = self._lru_get(key)
+                if vec is not None:
+                    out[i] = vec
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing:
+                missing_keys = list(missing)
+                rows = []
+                for start in range(0, len(missing_keys), _SQL_BATCH):
+                    part = missing_keys[start:start + _SQL_BATCH]
+                    rows.extend(self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchall())
+
+                now = time.time()
+                for key, blob in rows:
+                    vec = np.frombuffer(blob, dtype=np.float32)
+                    self._lru_put(key, vec)
+                    for i in missing[key]:
+                        out[i] = vec
+
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows],
+                    )
+                    self._conn.commit()
+
+        return out
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        now = time.time()
+        rows = {}
+
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                key = cache_key(model_name, text)
+                arr = np.array(vec, dtype=np.float32)
+                rows[key] = (key, model_name, arr.tobytes(), now)
+                self._lru_put(key, arr)
+
+            if not rows:
+                return
+
+            cur = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                list(rows.values()),
+            )
+            # Vectors from one model share a size; ignored rows were already stored
+            self._total_bytes += max(cur.rowcount, 0) * len(next(iter(rows.values()))[2])
+            self._conn.commit()
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Drop least-recently-used rows until the store is at 90% of max_bytes.
+        """
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC"
+        )
+
+        doomed = []
+        freed = 0
+        for key, size in rows:
+            if self._total_bytes - freed <= target:
+                break
+            doomed.append((key,))
+            freed += size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        self._conn.commit()
+        self._total_bytes -= freed
+
+        for (key,) in doomed:
+            self._lru.pop(key, None)
+
+    def embed(
+        self,
+        model_name: str,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], Sequence[Sequence[float]]],
+    ) -> List[List[float]]:
+        """
+        Return embeddings for `texts`, calling `embed_fn` once for the misses.
+        """
+        texts = list(texts)
+        vectors = self.get_many(model_name, texts)
+
+        miss_idx = [i for i, v in enumerate(vectors) if v is None]
+        self.hits += len(texts) - len(miss_idx)
+        self.misses += len(miss_idx)
+        CACHE_REQUESTS.inc(len(texts) - len(miss_idx), cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(miss_idx), cache="embedding", result="miss")
+
+        if miss_idx:
+            miss_texts = [texts[i] for i in miss_idx]
+            with stage("embedding"):
+                fresh = embed_fn(miss_texts)
+            self.put_many(model_name, miss_texts, fresh)
+            for i, vec in zip(miss_idx, fresh):
+                vectors[i] = [float(x) for x in vec]
+
+        return vectors
+
+
+# -------------------------------------------------------
+# Process-wide cache
+# -------------------------------------------------------
+
+_CACHE: Optional[EmbeddingCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = EmbeddingCache()
+        return _CACHE
@@ -1,12 +1,49 @@
 import os
 import glob
-from backend.config import DATA_DIR
-from backend.rag.chunking import chunk_pdf
+from backend.config import DATA_DIR, INGEST_WORKERS, MANIFEST_PATH
+from backend.manifest import IngestManifest
+from backend.rag.chunking import chunker_version, iter_pdf_chunks
+from backend.vectorstore import BatchWriter, delete_chunks, get_collection, refresh_indexes
 
 
-def ingest_pdfs():
+def ingest_pdfs(workers: int = INGEST_WORKERS):
+    """
+    Incremental ingestion driven by the content-hash manifest:
+    - unchanged PDFs are skipped
+    - chunks of modified / removed PDFs are deleted
+    - new / modified PDFs are chunked and upserted (deterministic ids)
+    """
     os.makedirs(DATA_DIR, exist_ok=True)
     pdf_files = glob.glob(f"{DATA_DIR}/*.pdf")
 
-    for pdf in pdf_files:
-        chunk_pdf(pdf)
+    manifest = IngestManifest.load(MANIFEST_PATH)
+    to_ingest, removed, unchanged = manifest.diff(pdf_files, chunker_version())
+
+    # Drop chunks of files that changed or disappeared
+    stale_ids = manifest.chunk_ids(list(to_ingest) + removed)
+    if stale_ids:
+        delete_chunks(stale_ids)
+    for source in removed:
+        manifest.forget(source)
+
+    # Extract pages in parallel worker processes; chunk + write from this one
+    writer = BatchWriter(get_collection())
+    for path, chunks in iter_pdf_chunks(list(to_ingest), workers=workers):
+        ids = []
+        for chunk in chunks:
+            writer.add(chunk)
+            ids.append(chunk["id"])
+        manifest.record(path, to_ingest[path], ids, chunker_version())
+    writer.flush()
+    manifest.save()
+
+    if to_ingest or removed:
+        refresh_indexes()
+
+    summary = writer.summary()
+    summary.update({
+        "ingested_files": len(to_ingest),
+        "removed_files": len(removed),
+        "skipped_files": len(unchanged),
+    })
+    return summary
@@ -0,0 +1,87 @@
+"""
+/jobs endpoints (poll, logs, stream, cancel), shared by the backend and
+app APIs. Submitting is left to the endpoints that own each kind of work.
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from backend.concurrency import run_blocking
+from backend.config import JOB_POLL_SEC
+from backend.jobs import TERMINAL, JobManager
+
+
+def _line(type_: str, **fields) -> str:
+    return json.dumps({"type": type_, **fields}) + "\n"
+
+
+def job_router(manager: JobManager) -> APIRouter:
+    router = APIRouter(prefix="/jobs")
+
+    def _get(job_id: str) -> dict:
+        job = manager.store.get(job_id)
+        if job is None or job["queue"] != manager.queue:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return job
+
+    @router.get("")
+    def list_jobs(limit: int = 50, status: Optional[str] = None):
+        return {"jobs": manager.store.list(manager.queue, limit, status)}
+
+    @router.get("/{job_id}")
+    def get_job(job_id: str):
+        return _get(job_id)
+
+    @router.get("/{job_id}/logs")
+    def get_job_logs(job_id: str, after: int = 0):
+        _get(job_id)
+        return {"logs": manager.store.logs(job_id, after)}
+
+    @router.get("/{job_id}/stream")
+    async def stream_job(job_id: str):
+        """
+        JSON lines until the job ends:
+          {"type": "status", "status": ...}
+          {"type": "progress", "progress": {...}}
+          {"type": "log", "seq": n, "level": ..., "message": ...}
+          {"type": "done", "job": {...}}
+        """
+        _get(job_id)
+
+        async def events():
+            last_seq, last_status, last_progress = 0, None, None
+            while True:
+                # Read the job before its logs: everything logged before a
+                # terminal status is sent before "done"
+                job = await run_blocking(manager.store.get, job_id)
+                for entry in await run_blocking(manager.store.logs, job_id, last_seq):
+                    last_seq = entry["seq"]
+                    yield _line("log", **entry)
+
+                if job["status"] != last_status:
+                    last_status = job["status"]
+                    yield _line("status", status=last_status)
+                if job["progress"] != last_progress:
+                    last_progress = job["progress"]
+                    yield _line("progress", progress=last_progress)
+
+                if job["status"] in TERMINAL:
+                    yield _line("done", job=job)
+                    return
+                await asyncio.sleep(JOB_POLL_SEC)
+
+        return StreamingResponse(events(), media_type="text/plain")
+
+    @router.post("/{job_id}/cancel")
+    def cancel_job(job_id: str):
+        _get(job_id)
+        try:
+            return manager.cancel(job_id)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    return router
@@ -0,0 +1,45 @@
+"""
+Job targets run by backend/jobs.py in worker processes.
+
+Each returns a JSON-serializable result; the API process reacts to it in
+completion hooks (index reload, cache invalidation, reranker activation).
+"""
+
+from types import SimpleNamespace
+
+# Job kinds -> (target, concurrency group)
+TRAIN_RERANKER = ("backend.job_tasks:train_reranker", "train")
+INGEST = ("backend.job_tasks:ingest", "index")
+REINDEX = ("backend.job_tasks:reindex", "index")
+DELETE = ("backend.job_tasks:delete_document", "index")
+
+
+def train_reranker(samples: list, num_epochs: int, batch_size: int, activate: bool = True) -> dict:
+    from backend.training import train_crossencoder
+
+    version, model_path = train_crossencoder(
+        samples=[SimpleNamespace(**s) for s in samples],
+        epochs=num_epochs,
+        batch_size=batch_size,
+    )
+    return {"version": version, "model_path": model_path, "activate": activate}
+
+
+def ingest() -> dict:
+    from backend.ingestion import ingest_pdfs
+
+    return ingest_pdfs()
+
+
+def reindex(full: bool = False) -> dict:
+    # Incremental by default: only new / modified PDFs are re-chunked
+    from backend.vectorstore import rebuild_index
+    from backend.ingestion import ingest_pdfs
+
+    return rebuild_index() if full else ingest_pdfs()
+
+
+def delete_document(filename: str) -> dict:
+    from backend.vectorstore import delete_document
+
+    return delete_document(filename)
@@ -0,0 +1,425 @@
+"""
+Background jobs for long work (reranker training, ingestion, reindexing)
+that used to block HTTP handlers.
+
+- JobStore: jobs and their log lines in SQLite (JOBS_DB_PATH), so state,
+  progress and logs survive restarts. Queued jobs are picked up again on
+  startup; jobs that were running when the process died are marked failed
+- JobManager: a dispatcher thread starts each job in its own spawned
+  worker process, at most JOB_WORKERS at a time and one per concurrency
+  group (e.g. one index writer at a time). cancel() terminates the worker.
+  Completion hooks run back in the API process (reload indexes, caches)
+- With several API workers (API_WORKERS) every worker can submit, but only
+  the one holding the queue's dispatch lock launches jobs and runs hooks;
+  if it dies the lock is released and another worker takes over
+- Inside a job, report_progress(...) and ordinary logging records go to
+  the job's row; report_progress is a no-op outside a job
+- A job can call disallow_cancel() before a commit phase that must not be
+  cut short (e.g. swapping in a rebuilt index); cancel() is refused after
+
+Targets are "module:function" paths called with the job params as keyword
+arguments and must return something JSON-serializable. Each stack uses its
+own named queue in the shared database ("backend", "app"), so completion
+hooks always run in the process that owns the job.
+"""
+
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from backend.config import JOBS_DB_PATH, JOB_WORKERS, JOB_POLL_SEC
+from backend.workers import InterProcessLock
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL = (SUCCEEDED, FAILED, CANCELLED)
+
+_JSON_FIELDS = ("params", "progress", "result")
+
+
+class JobStore:
+    def __init__(self, path: str = JOBS_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+
+        # The API process and job workers write concurrently: WAL + busy timeout
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                queue TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                grp TEXT,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                pid INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(queue, status, created_at);
+            CREATE TABLE IF NOT EXISTS job_logs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                ts REAL NOT NULL,
+                level TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_logs_job ON job_logs(job_id, seq);
+            """
+        )
+        self._conn.commit()
+
+    def _execute(self, sql: str, args: tuple = ()) -> int:
+        with self._lock:
+            cur = self._conn.execute(sql, args)
+            self._conn.commit()
+            return cur.rowcount
+
+    def _query(self, sql: str, args: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["group"] = job.pop("grp")
+        for field in _JSON_FIELDS:
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    # ---------------- jobs ----------------
+
+    def create(self, queue: str, kind: str, target: str, params: dict, group: Optional[str] = None) -> dict:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, queue, kind, target, grp, params, status, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, queue, kind, target, group, json.dumps(params), QUEUED, time.time()),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._to_dict(rows[0]) if rows else None
+
+    def list(self, queue: str, limit: int = 50, status: Optional[str] = None) -> List[dict]:
+        if status:
+            rows = self._query(
+                "SELECT * FROM jobs WHERE queue = ? AND status = ? ORDER BY created_at DESC LIMIT ?",
+                (queue, status, limit),
+            )
+        else:
+            rows = self._query(
+                "SELECT * FROM jobs WHERE queue = ? ORDER BY created_at DESC LIMIT ?", (queue, limit)
+            )
+        return [self._to_dict(r) for r in rows]
+
+    def queued(self, queue: str) -> List[dict]:
+        rows = self._query(
+            "SELECT * FROM jobs WHERE queue = ? AND status = ? ORDER BY created_at", (queue, QUEUED)
+        )
+        return [self._to_dict(r) for r in rows]
+
+    def mark_running(self, job_id: str, pid: int) -> bool:
+        return self._execute(
+            "UPDATE jobs SET status = ?, pid = ?, started_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, pid, time.time(), job_id, QUEUED),
+        ) > 0
+
+    def finish(self, job_id: str, status: str, result=None, error: Optional[str] = None,
+               from_status=(QUEUED, RUNNING)) -> bool:
+        """
+        Move a job to a terminal state; only the first caller wins (a job
+        cancelled while finishing stays cancelled).
+        """
+        placeholders = ",".join("?" * len(from_status))
+        return self._execute(
+            f"UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+            f"WHERE id = ? AND status IN ({placeholders})",
+            (status, json.dumps(result), error, time.time(), job_id, *from_status),
+        ) > 0
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued / running job, unless it has disallowed cancelling.
+        """
+        return self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?) "
+            "AND COALESCE(json_extract(progress, '$.cancellable'), 1) != 0",
+            (CANCELLED, "Cancelled", time.time(), job_id, QUEUED, RUNNING),
+        ) > 0
+
+    def disallow_cancel(self, job_id: str, progress: dict) -> bool:
+        """
+        Store `progress` (cancellable: false) if the job was not cancelled first.
+        """
+        return self._execute(
+            "UPDATE jobs SET progress = ? WHERE id = ? AND status = ?", (json.dumps(progress), job_id, RUNNING)
+        ) > 0
+
+    def set_progress(self, job_id: str, progress: dict):
+        self._execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def fail_interrupted(self, queue: str) -> int:
+        """
+        Jobs left "running" by a previous process cannot be resumed.
+        """
+        return self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE queue = ? AND status = ?",
+            (FAILED, "Interrupted by a server restart", time.time(), queue, RUNNING),
+        )
+
+    # ---------------- logs ----------------
+
+    def append_log(self, job_id: str, level: str, message: str):
+        self._execute(
+            "INSERT INTO job_logs (job_id, ts, level, message) VALUES (?, ?, ?, ?)",
+            (job_id, time.time(), level, message),
+        )
+
+    def logs(self, job_id: str, after: int = 0, limit: int = 1000) -> List[dict]:
+        rows = self._query(
+            "SELECT seq, ts, level, message FROM job_logs WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit),
+        )
+        return [dict(r) for r in rows]
+
+
+# -------------------------------------------------------
+# Inside a job process
+# -------------------------------------------------------
+
+_CURRENT = None  # (store, job_id, progress) in a job worker process
+
+
+def report_progress(**fields):
+    """
+    Merge `fields` into the running job's progress; no-op outside a job.
+    """
+    if _CURRENT is None:
+        return
+    store, job_id, progress = _CURRENT
+    progress.update(fields)
+    store.set_progress(job_id, progress)
+
+
+def disallow_cancel():
+    """
+    From here on the running job cannot be cancelled, so a commit phase is
+    never cut short. Raises RuntimeError if it was cancelled already; no-op
+    outside a job.
+    """
+    if _CURRENT is None:
+        return
+    store, job_id, progress = _CURRENT
+    progress["cancellable"] = False
+    if not store.disallow_cancel(job_id, progress):
+        raise RuntimeError("Job was cancelled")
+
+
+class _JobLogHandler(logging.Handler):
+    def __init__(self, store: JobStore, job_id: str):
+        super().__init__(level=logging.INFO)
+        self.store = store
+        self.job_id = job_id
+        self.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.store.append_log(self.job_id, record.levelname, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def _run_job(db_path: str, job_id: str, target: str, params: dict):
+    # Entry point of the spawned worker process
+    global _CURRENT
+
+    store = JobStore(db_path)
+    _CURRENT = (store, job_id, {})
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(_JobLogHandler(store, job_id))
+
+    try:
+        module_name, fn_name = target.split(":")
+        fn = getattr(importlib.import_module(module_name), fn_name)
+        logger.info(f"Job {job_id} started: {target}")
+        result = fn(**params)
+        store.finish(job_id, SUCCEEDED, result=result, from_status=(RUNNING,))
+        logger.info(f"Job {job_id} succeeded")
+    except BaseException as e:
+        logger.exception(f"Job {job_id} failed")
+        store.finish(job_id, FAILED, error=f"{type(e).__name__}: {e}", from_status=(RUNNING,))
+
+
+# -------------------------------------------------------
+# Dispatcher (API process)
+# -------------------------------------------------------
+
+class JobManager:
+    def __init__(self, queue: str, store: Optional[JobStore] = None, workers: int = JOB_WORKERS,
+                 poll_sec: float = JOB_POLL_SEC):
+        self.queue = queue
+        self.store = store or JobStore()
+        self.workers = workers
+        self.poll_sec = poll_sec
+
+        self._hooks: Dict[str, List[Callable[[dict], None]]] = {}
+        self._running: Dict[str, multiprocessing.Process] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Spawn, not fork: the API process has threads and loaded models
+        self._ctx = multiprocessing.get_context("spawn")
+        self._dispatch_lock = InterProcessLock(f"{self.store.path}.{queue}.dispatch.lock")
+
+    def on_complete(self, kind: str, fn: Callable[[dict], None]):
+        """
+        Run fn(job) in this process after a `kind` job succeeds.
+        """
+        self._hooks.setdefault(kind, []).append(fn)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._claim_dispatch()
+        self._thread = threading.Thread(target=self._loop, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, target: str, params: Optional[dict] = None,
+               group: Optional[str] = None) -> dict:
+        job = self.store.create(self.queue, kind, target, params or {}, group)
+        self._wake.set()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is None or job["status"] in TERMINAL:
+            return job
+
+        if not self.store.cancel(job_id):
+            job = self.store.get(job_id)
+            if job["status"] not in TERMINAL:
+                raise RuntimeError(f"Job {job_id} is committing its result and can no longer be cancelled")
+            return job
+
+        with self._lock:
+            proc = self._running.get(job_id)
+        if proc is not None and proc.is_alive():
+            proc.terminate()
+        self._wake.set()
+        return self.store.get(job_id)
+
+    # ---------------- dispatcher loop ----------------
+
+    def _claim_dispatch(self) -> bool:
+        """
+        True if this process is (now) the queue's dispatcher.
+        """
+        if self._dispatch_lock.held:
+            return True
+        if not self._dispatch_lock.acquire(blocking=False):
+            return False
+        # Only the dispatcher knows no job of this queue can still be running
+        interrupted = self.store.fail_interrupted(self.queue)
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted job(s) as failed")
+        return True
+
+    def _loop(self):
+        while True:
+            try:
+                if self._claim_dispatch():
+                    self._reap()
+                    self._launch()
+            except Exception as e:
+                logger.error(f"Job dispatcher error: {e}")
+            self._wake.wait(self.poll_sec)
+            self._wake.clear()
+
+    def _launch(self):
+        with self._lock:
+            busy_groups = {
+                self.store.get(job_id)["group"] for job_id in self._running
+            } - {None}
+
+            for job in self.store.queued(self.queue):
+                if len(self._running) >= self.workers:
+                    break
+                if job["group"] is not None and job["group"] in busy_groups:
+                    continue
+
+                proc = self._ctx.Process(
+                    target=_run_job,
+                    args=(self.store.path, job["id"], job["target"], job["params"]),
+                    name=f"job-{job['kind']}",
+                )
+                proc.start()
+                if not self.store.mark_running(job["id"], proc.pid):
+                    # Cancelled between listing and starting
+                    proc.terminate()
+                    proc.join()
+                    continue
+
+                self._running[job["id"]] = proc
+                busy_groups.add(job["group"])
+
+    def _reap(self):
+        with self._lock:
+            for job_id, proc in self._running.items():
+                # Cancelled through another API worker
+                if proc.is_alive() and self.store.get(job_id)["status"] == CANCELLED:
+                    proc.terminate()
+            finished = [(job_id, p) for job_id, p in self._running.items() if not p.is_alive()]
+            for job_id, _ in finished:
+                del self._running[job_id]
+
+        for job_id, proc in finished:
+            proc.join()
+            # Still "running" means the worker died without reporting
+            self.store.finish(
+                job_id, FAILED, error=f"Worker exited with code {proc.exitcode}", from_status=(RUNNING,)
+            )
+            job = self.store.get(job_id)
+            if job["status"] == SUCCEEDED:
+                for hook in self._hooks.get(job["kind"], []):
+                    try:
+                        hook(job)
+                    except Exception as e:
+                        logger.error(f"Completion hook for job {job_id} failed: {e}")
+
+
+_MANAGERS: Dict[str, JobManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_job_manager(queue: str) -> JobManager:
+    with _MANAGERS_LOCK:
+        if queue not in _MANAGERS:
+            _MANAGERS[queue] = JobManager(queue)
+        return _MANAGERS[queue]
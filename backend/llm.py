@@ -1,44 +1,23 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+import httpx
 import os
-from typing import List, Generator
+import time
+from typing import List, Generator, AsyncGenerator, Optional, Tuple
+
+from backend.metrics import stage, record_stage, LLM_TOKENS
+from backend.rag.token_budget import context_budget, get_token_counter
 
 # Load backend/.env
 ENV_PATH = os.path.join(os.path.dirname(__file__), ".env")
 load_dotenv(ENV_PATH)
 
+MODEL_NAME = "gpt-4o"  # change model here if you like
 
-def _get_client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OpenAI API key missing in backend/.env")
-    return OpenAI(api_key=api_key)
-
-
-def _build_context(retrieved: List[dict]) -> str:
-    parts: List[str] = []
-    for doc in retrieved:
-        text = doc.get("text", "")
-        source = doc.get("source", "unknown")
-        page = doc.get("page", None)
-        prefix = f"[{source}"
-        if page is not None:
-            prefix += f", page {page}"
-        prefix += "]"
-        parts.append(f"{prefix}\n{text}")
-    return "\n\n".join(parts)
-
+# Concurrent connections held by the shared async client
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
 
-def generate_answer(query: str, retrieved: List[dict]) -> str:
-    """
-    Non-streaming answer generation using backend-only API key.
-    """
-    client = _get_client()
-    model_name = "gpt-4o"  # change model here if you like
-
-    context = _build_context(retrieved)
-
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are a precise RAG assistant for enterprises.
 
 Use ONLY the context below to answer the user's question.
@@ -50,51 +29,201 @@ Context:
 Question:
 {query}
 
-Answer:
+{answer_label}:
 """
 
-    completion = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0,
-    )
+# Created once per process; both clients keep their own connection pool
+_CLIENT = None
+_ASYNC_CLIENT = None
+
+
+def _api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OpenAI API key missing in backend/.env")
+    return api_key
+
+
+def _get_client() -> OpenAI:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = OpenAI(api_key=_api_key())
+    return _CLIENT
+
+
+def _get_async_client() -> AsyncOpenAI:
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        _ASYNC_CLIENT = AsyncOpenAI(
+            api_key=_api_key(),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(600.0, connect=5.0),
+            ),
+        )
+    return _ASYNC_CLIENT
+
+
+def _source_label(doc: dict) -> str:
+    source = doc.get("source", "unknown")
+    page = doc.get("page", None)
+    page_end = doc.get("page_end", None)
+    prefix = f"[{source}"
+    if page is not None and page_end is not None and page_end != page:
+        prefix += f", pages {page}-{page_end}"
+    elif page is not None:
+        prefix += f", page {page}"
+    return prefix + "]"
+
+
+def _build_context(retrieved: List[dict], budget: int) -> Tuple[str, int]:
+    """
+    Sources in rank order, packed into `budget` tokens (the last one may be
+    cut at a sentence boundary). Returns (context, number of sources used).
+    """
+    counter = get_token_counter(MODEL_NAME)
+    with stage("context_build"):
+        labels = [_source_label(doc) for doc in retrieved]
+        packed, _ = counter.pack(
+            [doc.get("text", "") for doc in retrieved],
+            budget,
+            # label + its newline + the blank line between sources
+            overheads=[counter.count(label) + 2 for label in labels],
+        )
+        parts = [f"{labels[i]}\n{text}" for i, text in packed]
+    return "\n\n".join(parts), len(packed)
+
+
+def _record_usage(usage):
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens, kind="completion")
+
+
+def _build_messages(
+    query: str,
+    retrieved: List[dict],
+    streaming: bool = False,
+    prompt_info: Optional[dict] = None,
+) -> List[dict]:
+    """
+    Chat messages with the context fitted to the model's token budget.
+    If given, `prompt_info` receives prompt_tokens, context_tokens_budget
+    and context_chunks.
+    """
+    fields = {"query": query, "answer_label": "Answer (streaming)" if streaming else "Answer"}
+    counter = get_token_counter(MODEL_NAME)
+
+    overhead = counter.count_messages([{"role": "user", "content": PROMPT_TEMPLATE.format(context="", **fields)}])
+    budget = context_budget(MODEL_NAME, overhead)
+    context, n_chunks = _build_context(retrieved, budget)
+
+    messages = [{"role": "user", "content": PROMPT_TEMPLATE.format(context=context, **fields)}]
+    if prompt_info is not None:
+        prompt_info.update({
+            "prompt_tokens": counter.count_messages(messages),
+            "context_tokens_budget": budget,
+            "context_chunks": n_chunks,
+        })
+    return messages
+
+
+def generate_answer(query: str, retrieved: List[dict], prompt_info: Optional[dict] = None) -> str:
+    """
+    Non-streaming answer generation using backend-only API key.
+    """
+    messages = _build_messages(query, retrieved, prompt_info=prompt_info)
+    with stage("llm"):
+        completion = _get_client().chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages,
+            temperature=0,
+        )
+    _record_usage(completion.usage)
 
     return completion.choices[0].message.content.strip()
 
 
-def stream_answer(query: str, retrieved: List[dict]) -> Generator[str, None, None]:
+def stream_answer(
+    query: str, retrieved: List[dict], prompt_info: Optional[dict] = None
+) -> Generator[str, None, None]:
     """
     Streaming answer generator. Yields small text chunks as they arrive from OpenAI.
     """
-    client = _get_client()
-    model_name = "gpt-4o"
+    messages = _build_messages(query, retrieved, streaming=True, prompt_info=prompt_info)
+    start = time.perf_counter()
+    first = True
 
-    context = _build_context(retrieved)
+    stream = _get_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
+        temperature=0,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
 
-    prompt = f"""
-You are a precise RAG assistant for enterprises.
+    for chunk in stream:
+        # The final chunk carries usage and no choices
+        _record_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta and delta.content:
+            if first:
+                record_stage("llm_first_token", time.perf_counter() - start)
+                first = False
+            yield delta.content
 
-Use ONLY the context below to answer the user's question.
-If the context is insufficient, say "I do not have enough information from the documents."
+    record_stage("llm", time.perf_counter() - start)
 
-Context:
-{context}
 
-Question:
-{query}
+async def agenerate_answer(query: str, retrieved: List[dict], prompt_info: Optional[dict] = None) -> str:
+    """
+    Async variant of generate_answer(); does not hold a worker thread.
+    """
+    messages = _build_messages(query, retrieved, prompt_info=prompt_info)
+    with stage("llm"):
+        completion = await _get_async_client().chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages,
+            temperature=0,
+        )
+    _record_usage(completion.usage)
+
+    return completion.choices[0].message.content.strip()
 
-Answer (streaming):
-"""
 
-    stream = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
+async def astream_answer(
+    query: str, retrieved: List[dict], prompt_info: Optional[dict] = None
+) -> AsyncGenerator[str, None]:
+    """
+    Async variant of stream_answer().
+    """
+    messages = _build_messages(query, retrieved, streaming=True, prompt_info=prompt_info)
+    start = time.perf_counter()
+    first = True
+
+    stream = await _get_async_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
         temperature=0,
         stream=True,
+        stream_options={"include_usage": True},
     )
 
-    for chunk in stream:
-        choice = chunk.choices[0]
-        delta = choice.delta
+    async for chunk in stream:
+        # The final chunk carries usage and no choices
+        _record_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
         if delta and delta.content:
+            if first:
+                record_stage("llm_first_token", time.perf_counter() - start)
+                first = False
             yield delta.content
+
+    record_stage("llm", time.perf_counter() - start)
@@ -0,0 +1,109 @@
+"""
+Ingestion manifest: source file -> content hash + the chunk ids it produced.
+
+Lets re-ingestion touch only new / modified files and delete the chunks
+of changed or removed ones. Size + mtime are recorded too, so files
+that were not touched on disk are skipped without being re-hashed.
+An optional chunker version is recorded as well: files chunked with
+different settings count as modified.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class IngestManifest:
+    """
+    JSON-backed {source: {"sha256", "size", "mtime", "chunk_ids", "chunker"}} map.
+    """
+
+    def __init__(self, path: str, files: Dict[str, dict] = None):
+        self.path = path
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, path: str) -> "IngestManifest":
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.files, f)
+        os.replace(tmp_path, self.path)
+
+    def _unchanged(self, source: str, chunker: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        (unchanged?, sha256). Re-hashes only when size or mtime moved.
+        """
+        entry = self.files.get(source)
+        stat = os.stat(source)
+
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            same, sha = True, entry["sha256"]
+        else:
+            sha = file_sha256(source)
+            same = bool(entry) and entry["sha256"] == sha
+
+        if same and chunker is not None and entry.get("chunker") != chunker:
+            return False, sha
+        return same, sha
+
+    def diff(
+        self, sources: Iterable[str], chunker: Optional[str] = None
+    ) -> Tuple[Dict[str, str], List[str], List[str]]:
+        """
+        Compare files on disk with the manifest (and, if given, the
+        chunker version they were chunked with).
+
+        Returns:
+          to_ingest: {source: sha256} for new or modified files
+          removed:   sources in the manifest that no longer exist
+          unchanged: sources that can be skipped
+        """
+        sources = list(sources)
+        to_ingest, unchanged = {}, []
+
+        for source in sources:
+            same, sha = self._unchanged(source, chunker)
+            if same:
+                unchanged.append(source)
+            else:
+                to_ingest[source] = sha
+
+        present = set(sources)
+        removed = [s for s in self.files if s not in present]
+        return to_ingest, removed, unchanged
+
+    def chunk_ids(self, sources: Iterable[str]) -> List[str]:
+        ids = []
+        for source in sources:
+            ids.extend(self.files.get(source, {}).get("chunk_ids", []))
+        return ids
+
+    def record(self, source: str, sha256: str, chunk_ids: List[str], chunker: Optional[str] = None):
+        stat = os.stat(source)
+        self.files[source] = {
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "chunk_ids": list(chunk_ids),
+        }
+        if chunker is not None:
+            self.files[source]["chunker"] = chunker
+
+    def forget(self, source: str):
+        self.files.pop(source, None)
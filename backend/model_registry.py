@@ -0,0 +1,184 @@
+"""
+Process-wide model registry shared by the app and backend stacks.
+
+- Each model is registered under a key with a loader (and an optional
+  warm-up call); the first get() loads it and every later caller, from
+  either stack, shares that one object
+- warm_all() loads and warms everything registered; both APIs start it
+  in the background at startup so the first query does not pay for it
+- status() / ready back the readiness report on /health
+- reload() / unload() support swapping weights at runtime (see
+  backend/rag/reranker_versions.py)
+
+Cross-encoders are keyed by backend + model name, so the app and backend
+rerankers asking for the same model get the same weights.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from backend.config import RERANKER_MODEL, RERANKER_BACKEND
+from backend.rag.cross_encoder import load_cross_encoder
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]]):
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.state = "registered"  # registered | loading | loaded | ready | error
+        self.error: Optional[str] = None
+        self.load_sec: Optional[float] = None
+        self.warm_sec: Optional[float] = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, key: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None):
+        """
+        Register a model; a key that is already registered is left as is.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = _Entry(loader, warmup)
+
+    def get(self, key: str):
+        """
+        The loaded model for `key`, loading it on first use. Concurrent
+        callers wait for the one load in progress.
+        """
+        entry = self._entries[key]
+        if entry.model is not None:
+            return entry.model
+
+        with entry.lock:
+            if entry.model is None:
+                entry.state = "loading"
+                start = time.perf_counter()
+                try:
+                    entry.model = entry.loader()
+                except Exception as e:
+                    entry.state = "error"
+                    entry.error = str(e)
+                    raise
+                entry.load_sec = round(time.perf_counter() - start, 3)
+                entry.state = "loaded" if entry.warmup else "ready"
+                entry.error = None
+                logger.info(f"Loaded model {key} in {entry.load_sec}s")
+            return entry.model
+
+    def warm(self, key: str):
+        entry = self._entries[key]
+        model = self.get(key)
+
+        with entry.lock:
+            if entry.state == "loaded":
+                start = time.perf_counter()
+                entry.warmup(model)
+                entry.warm_sec = round(time.perf_counter() - start, 3)
+                entry.state = "ready"
+
+    def reload(self, key: str):
+        """
+        Load + warm a fresh copy (e.g. retrained weights in the same
+        directory) and swap it in; callers keep the old model until then.
+        """
+        entry = self._entries[key]
+        start = time.perf_counter()
+        model = entry.loader()
+        if entry.warmup:
+            entry.warmup(model)
+
+        with entry.lock:
+            entry.model = model
+            entry.load_sec = round(time.perf_counter() - start, 3)
+            entry.state = "ready"
+            entry.error = None
+        logger.info(f"Reloaded model {key} in {entry.load_sec}s")
+
+    def unload(self, key: str):
+        """
+        Forget a model; requests still holding it finish normally.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def warm_all(self):
+        """
+        Load and warm every registered model; failures are recorded in
+        status() and do not stop the others.
+        """
+        for key in list(self._entries):
+            try:
+                self.warm(key)
+            except Exception as e:
+                logger.error(f"Could not load model {key}: {e}")
+
+    def status(self) -> Dict[str, dict]:
+        return {
+            key: {
+                "state": e.state,
+                "load_sec": e.load_sec,
+                "warm_sec": e.warm_sec,
+                "error": e.error,
+            }
+            for key, e in self._entries.items()
+        }
+
+    @property
+    def ready(self) -> bool:
+        return all(e.state == "ready" for e in self._entries.values())
+
+    def health(self) -> dict:
+        """
+        /health payload: status is ok | loading | error.
+        """
+        models = self.status()
+        if any(m["state"] == "error" for m in models.values()):
+            status = "error"
+        elif self.ready:
+            status = "ok"
+        else:
+            status = "loading"
+        return {"status": status, "ready": status == "ok", "models": models}
+
+
+_REGISTRY = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _REGISTRY
+
+
+# -------------------------------------------------------
+# Cross-encoders
+# -------------------------------------------------------
+
+def _warm_cross_encoder(model):
+    # One small batch compiles kernels / allocates buffers up front
+    model.score("warm up query", ["warm up passage", "a second, somewhat longer warm up passage"])
+
+
+def cross_encoder_key(model_name: str, backend: str) -> str:
+    return f"cross-encoder/{backend}:{model_name}"
+
+
+def register_cross_encoder(model_name: str = RERANKER_MODEL, backend: str = RERANKER_BACKEND) -> str:
+    key = cross_encoder_key(model_name, backend)
+    _REGISTRY.register(key, lambda: load_cross_encoder(model_name, backend), _warm_cross_encoder)
+    return key
+
+
+def get_cross_encoder(model_name: str = RERANKER_MODEL, backend: str = RERANKER_BACKEND):
+    """
+    Shared TorchCrossEncoder / OnnxCrossEncoder for `model_name`.
+    """
+    return _REGISTRY.get(register_cross_encoder(model_name, backend))
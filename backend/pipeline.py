@@ -0,0 +1,48 @@
+"""
+Process-pool stage for CPU-bound ingestion work (PDF text extraction + chunking).
+
+parallel_map() fans items out to worker processes and streams results
+back, in input order, to a single consumer (the vectorstore writer).
+At most `max_pending` items are in flight at once, so a slow writer
+applies backpressure instead of letting parsed chunks pile up in memory.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from backend.config import INGEST_WORKERS, INGEST_MAX_PENDING
+
+
+def parallel_map(
+    fn: Callable,
+    items: Iterable,
+    workers: int = INGEST_WORKERS,
+    max_pending: Optional[int] = INGEST_MAX_PENDING,
+) -> Iterator[Tuple[object, object]]:
+    """
+    Yield (item, fn(item)) pairs in input order.
+
+    `fn` must be a picklable top-level function. With workers <= 1
+    everything runs inline in the calling process.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+
+    max_pending = max_pending or workers * 2
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for item in items:
+            # Bounded queue: wait for the oldest result before submitting more
+            if len(pending) >= max_pending:
+                done_item, future = pending.popleft()
+                yield done_item, future.result()
+
+            pending.append((item, pool.submit(fn, item)))
+
+        while pending:
+            done_item, future = pending.popleft()
+            yield done_item, future.result()
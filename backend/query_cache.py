@@ -0,0 +1,146 @@
+"""
+Response cache for /query and /query-stream.
+
+Two tiers:
+- exact: normalized query text + top_k + metadata filter scope
+- semantic (optional): cosine similarity of the query embedding against
+  the most recent cached queries, above a configurable threshold
+
+Entries expire after a TTL and the whole cache is dropped whenever the
+index changes (upload / delete / reindex). Each entry keeps the streamed
+tokens so a /query-stream hit can be replayed in the same format.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from backend.metrics import CACHE_REQUESTS
+from backend.config import (
+    QUERY_CACHE_TTL,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_SIMILARITY,
+    QUERY_CACHE_RECENT,
+)
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"[\s?.!]+$", "", " ".join(query.lower().split()))
+
+
+class QueryCache:
+    def __init__(
+        self,
+        ttl: float = QUERY_CACHE_TTL,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        similarity: float = QUERY_CACHE_SIMILARITY,
+        recent: int = QUERY_CACHE_RECENT,
+        embed_fn: Optional[Callable[[List[str]], list]] = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.recent = recent
+        self.embed_fn = embed_fn
+
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.embed_fn is not None and self.similarity > 0
+
+    def _embed(self, text: str):
+        vec = np.asarray(self.embed_fn([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return now - entry["created"] > self.ttl
+
+    def lookup(self, query: str, top_k: int, scope: tuple = ()) -> Optional[dict]:
+        """
+        Return a cached entry ({"answer", "sources", "tokens", "cache"}) or None.
+        `scope` (e.g. MetadataFilter.key()) must match too.
+        """
+        key = (normalize_query(query), top_k, scope)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(key)
+                    self.hits["exact"] += 1
+                    CACHE_REQUESTS.inc(cache="query", result="exact")
+                    return dict(entry, cache="exact")
+                del self._entries[key]
+
+        if not self.semantic_enabled:
+            with self._lock:
+                self.misses += 1
+            CACHE_REQUESTS.inc(cache="query", result="miss")
+            return None
+
+        query_vec = self._embed(key[0])
+
+        with self._lock:
+            # Most recent entries first, same top_k and scope only
+            candidates = [
+                e for k, e in reversed(self._entries.items())
+                if k[1:] == key[1:] and e.get("embedding") is not None and not self._expired(e, now)
+            ][:self.recent]
+
+            if candidates:
+                sims = np.stack([e["embedding"] for e in candidates]) @ query_vec
+                best = int(np.argmax(sims))
+                if sims[best] >= self.similarity:
+                    self.hits["semantic"] += 1
+                    CACHE_REQUESTS.inc(cache="query", result="semantic")
+                    return dict(candidates[best], cache="semantic")
+
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache="query", result="miss")
+            return None
+
+    def store(self, query: str, top_k: int, answer: str, sources: list,
+              tokens: Optional[List[str]] = None, generation: Optional[int] = None,
+              scope: tuple = ()):
+        """
+        Cache a response. `generation` is the value read before the request
+        started; if the index changed meanwhile the result is dropped.
+        """
+        key = (normalize_query(query), top_k, scope)
+        embedding = self._embed(key[0]) if self.semantic_enabled else None
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "tokens": tokens if tokens is not None else [answer],
+                "embedding": embedding,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Drop every entry; called whenever the index changes.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
@@ -1,5 +1,22 @@
+import json
+import logging
 import math
-from backend.vectorstore import collection
+import os
+import time
+from collections import Counter
+from typing import Optional
+
+from backend.config import BM25_INDEX_PATH, BM25_INDEX_DIR
+from backend.metrics import stage
+from backend.rag import mmap_store
+from backend.rag.filters import FilterColumns, MetadataFilter
+from backend.rag.sparse_bm25 import SCIPY_AVAILABLE, SparseBM25
+
+if SCIPY_AVAILABLE:
+    import numpy as np
+    from scipy import sparse
+
+logger = logging.getLogger(__name__)
 
 
 # BM25 parameters
@@ -30,65 +47,301 @@ def compute_idf(corpus_tokens):
     return idf
 
 
-def bm25_search(query: str, top_k: int = 5):
+class BM25Index:
     """
-    BM25 lexical search over Chroma's stored documents.
-    Returns list of dicts with text + score.
+    Inverted index for BM25 scoring.
+
+    - postings: term -> [[doc_idx, tf], ...]
+    - doc_lens / avgdl / idf are computed once at build time
+    - docs keeps the text + metadata needed to return results
+    - metadata filters become a candidate mask over docs (see filters.py)
+
+    Query cost scales with the postings of the query terms,
+    not with the size of the corpus. When SciPy is installed the
+    postings are scored through a CSR matrix (see sparse_bm25.py).
     """
 
-    # ---- Fetch ALL documents from Chroma ----
-    all_docs = collection.get()
-    documents = all_docs["documents"]
-    metadatas = all_docs["metadatas"]
+    def __init__(self, postings=None, idf=None, doc_lens=None, docs=None, use_matrix=True):
+        self.postings = postings or {}
+        self.idf = idf or {}
+        self.doc_lens = doc_lens or []
+        self.docs = docs or []
+        self.avgdl = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+        self.use_matrix = use_matrix and SCIPY_AVAILABLE
+        self._matrix = None
+        self._columns = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = SparseBM25.from_postings(self.postings, self.doc_lens, k1=k1, b=b)
+        return self._matrix
+
+    @property
+    def columns(self) -> FilterColumns:
+        if self._columns is None:
+            self._columns = FilterColumns.from_metadatas(self.docs)
+        return self._columns
+
+    def prepare(self):
+        """
+        Build the CSR matrix up front so the first query doesn't pay for it.
+        """
+        if self.use_matrix and self.docs:
+            self.matrix
+        return self
+
+    @classmethod
+    def build(cls, documents, metadatas, ids=None):
+        """
+        Build the index from parallel lists of documents and metadatas
+        (the shape returned by Chroma's collection.get()).
+        """
+        ids = ids or [None] * len(documents)
+
+        corpus_tokens = [tokenize(doc or "") for doc in documents]
+        idf = compute_idf(corpus_tokens)
+
+        postings = {}
+        doc_lens = []
+        docs = []
+
+        for idx, tokens in enumerate(corpus_tokens):
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append([idx, tf])
+
+            meta = metadatas[idx] or {}
+            docs.append({
+                "id": ids[idx],
+                "text": documents[idx],
+                "source": meta.get("source"),
+                "page": meta.get("page"),
+                "page_end": meta.get("page_end"),
+                "doc_date": meta.get("doc_date"),
+            })
 
-    if not documents:
-        return []
+        return cls(postings=postings, idf=idf, doc_lens=doc_lens, docs=docs)
 
-    # ---- Tokenize corpus ----
-    corpus_tokens = [tokenize(doc) for doc in documents]
+    def save(self, path: str = BM25_INDEX_PATH):
+        """
+        Persist the index as JSON. Written to a temp file first so a
+        concurrent reader never sees a half-written index.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
 
-    # ---- Tokenize query ----
-    query_tokens = tokenize(query)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": k1,
+                "b": b,
+                "postings": self.postings,
+                "idf": self.idf,
+                "doc_lens": self.doc_lens,
+                "docs": self.docs,
+            }, f)
 
-    # ---- Compute IDF ----
-    idf = compute_idf(corpus_tokens)
+        os.replace(tmp_path, path)
 
-    # ---- BM25 scoring ----
-    avgdl = sum(len(doc) for doc in corpus_tokens) / len(corpus_tokens)
-    scores = []
+    @classmethod
+    def load(cls, path: str = BM25_INDEX_PATH):
+        if not os.path.exists(path):
+            return None
 
-    for idx, doc_tokens in enumerate(corpus_tokens):
-        score = 0
-        doc_len = len(doc_tokens)
-        tf_counts = {}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
 
-        for token in doc_tokens:
-            tf_counts[token] = tf_counts.get(token, 0) + 1
+        return cls(
+            postings=data["postings"],
+            idf=data["idf"],
+            doc_lens=data["doc_lens"],
+            docs=data["docs"],
+        )
 
-        for q in query_tokens:
-            if q not in tf_counts:
+    def export(self, root: str = BM25_INDEX_DIR) -> dict:
+        """
+        Write the CSR matrix, docs and filter columns as a new memory-mapped
+        generation under `root` (see mmap_store.py) and make it live.
+        Requires SciPy; open it with MappedBM25Index.
+        """
+        with mmap_store.build_lock(root):
+            generation, gen_dir = mmap_store.new_generation(root)
+            tf = self.matrix.tf
+
+            # One index dtype for indices + indptr, so SciPy wraps the mapped
+            # arrays as they are instead of casting them into private copies
+            idx_dtype = np.int32 if tf.nnz < 2 ** 31 else np.int64
+            np.save(os.path.join(gen_dir, "tf_data.npy"), tf.data.astype(np.float32, copy=False))
+            np.save(os.path.join(gen_dir, "tf_indices.npy"), tf.indices.astype(idx_dtype, copy=False))
+            np.save(os.path.join(gen_dir, "tf_indptr.npy"), tf.indptr.astype(idx_dtype, copy=False))
+            np.save(os.path.join(gen_dir, "doc_lens.npy"), np.asarray(self.doc_lens, dtype=np.float32))
+            with open(os.path.join(gen_dir, "vocab.json"), "w", encoding="utf-8") as f:
+                json.dump(list(self.matrix.vocab), f)
+
+            with mmap_store.DocsWriter(gen_dir) as writer:
+                for doc in self.docs:
+                    writer.write(doc)
+            mmap_store.save_doc_offsets(gen_dir, writer.offsets)
+            sources = mmap_store.save_filter_columns(gen_dir, self.columns)
+
+            header = {
+                "generation": generation,
+                "count": len(self.docs),
+                "vocab_size": tf.shape[0],
+                "nnz": int(tf.nnz),
+                "k1": k1,
+                "b": b,
+                "sources": sources,
+                "built_at": time.time(),
+            }
+            mmap_store.write_header(gen_dir, header)
+            mmap_store.set_current(root, generation)
+            logger.info(f"BM25 export {generation}: {len(self.docs)} docs, {tf.nnz} postings")
+            return header
+
+    def _score_postings(self, query: str, top_k: int, allowed=None):
+        scores = {}
+
+        for q in tokenize(query):
+            postings = self.postings.get(q)
+            if not postings:
                 continue
 
-            tf = tf_counts[q]
-            numerator = tf * (k1 + 1)
-            denominator = tf + k1 * (1 - b + b * (doc_len / avgdl))
-            score += idf.get(q, 0) * (numerator / denominator)
-
-        scores.append((idx, score))
-
-    # ---- Sort best → worst ----
-    scores.sort(key=lambda x: x[1], reverse=True)
-    top_scores = scores[:top_k]
-
-    # ---- Convert back into RAG doc format ----
-    results = []
-    for idx, score in top_scores:
-        results.append({
-            "text": documents[idx],
-            "score": float(-score),  # negative so lower = better
-            "source": metadatas[idx]["source"],
-            "page": metadatas[idx]["page"],
-            "chunk_index": idx
-        })
-
-    return results
+            idf = self.idf[q]
+            for idx, tf in postings:
+                if allowed is not None and not allowed[idx]:
+                    continue
+                doc_len = self.doc_lens[idx]
+                numerator = tf * (k1 + 1)
+                denominator = tf + k1 * (1 - b + b * (doc_len / self.avgdl))
+                scores[idx] = scores.get(idx, 0.0) + idf * (numerator / denominator)
+
+        # ---- Sort best → worst ----
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+    def search(self, query: str, top_k: int = 5, filters: MetadataFilter = None):
+        if not self.docs:
+            return []
+
+        allowed = None
+        if filters is not None and not filters.is_empty:
+            allowed = self.columns.mask(filters)
+            if not allowed.any():
+                return []
+
+        if self.use_matrix:
+            idxs, scores = self.matrix.top_k(tokenize(query), top_k, allowed)
+            top_scores = zip(idxs.tolist(), scores.tolist())
+        else:
+            top_scores = self._score_postings(query, top_k, allowed)
+
+        # ---- Convert back into RAG doc format ----
+        results = []
+        for idx, score in top_scores:
+            doc = self.docs[idx]
+            results.append({
+                "id": doc.get("id"),
+                "text": doc["text"],
+                "score": float(-score),  # negative so lower = better
+                "source": doc["source"],
+                "page": doc["page"],
+                "page_end": doc.get("page_end"),
+                "chunk_index": idx
+            })
+
+        return results
+
+
+class MappedBM25Index(BM25Index):
+    """
+    One exported generation, memory-mapped read-only: API workers share
+    the postings, docs and filter columns through the page cache. Only
+    the vocabulary map and per-term document frequencies are per process.
+    """
+
+    def __init__(self, gen_dir: str):
+        self.gen_dir = gen_dir
+        self.header = mmap_store.read_header(gen_dir)
+        self.generation = self.header["generation"]
+
+        super().__init__()
+        self.docs = mmap_store.DocStore(gen_dir)
+
+        def load(name):
+            return mmap_store.load_array(gen_dir, name)
+
+        with open(os.path.join(gen_dir, "vocab.json"), "r", encoding="utf-8") as f:
+            vocab = {term: i for i, term in enumerate(json.load(f))}
+
+        tf = sparse.csr_matrix(
+            (load("tf_data.npy"), load("tf_indices.npy"), load("tf_indptr.npy")),
+            shape=(self.header["vocab_size"], self.header["count"]),
+            copy=False,
+        )
+        tf.has_sorted_indices = True  # written sorted; skip the check
+        self._matrix = SparseBM25(vocab, tf, load("doc_lens.npy"), k1=self.header["k1"], b=self.header["b"])
+        self._columns = mmap_store.load_filter_columns(gen_dir, self.header["sources"])
+
+    def close(self):
+        self.docs.close()
+
+
+def open_index(root: str = BM25_INDEX_DIR) -> Optional[MappedBM25Index]:
+    """
+    The live exported generation under `root`, or None (no export yet,
+    it cannot be opened, or SciPy missing).
+    """
+    if not SCIPY_AVAILABLE:
+        return None
+    return mmap_store.open_current(root, MappedBM25Index)
+
+
+# -------------------------------------------------------
+# Process-wide index (loaded once at startup)
+# -------------------------------------------------------
+
+_INDEX = None
+
+
+def load_index(path: str = BM25_INDEX_PATH, root: str = BM25_INDEX_DIR):
+    """
+    Open the persisted index. Called on API startup and whenever another
+    process rebuilt it. With SciPy this maps the exported generation
+    (exporting a legacy JSON index once); without, it loads the JSON file.
+    """
+    global _INDEX
+    index = open_index(root)
+    if index is None:
+        index = BM25Index.load(path) or BM25Index()
+        if SCIPY_AVAILABLE and index.docs:
+            index.export(root)
+            index = open_index(root) or index
+    _INDEX = index.prepare()
+    return _INDEX
+
+
+def build_index(documents, metadatas, ids=None, path: str = BM25_INDEX_PATH, root: str = BM25_INDEX_DIR):
+    """
+    Build, persist and activate a new index.
+    Called at ingest / rebuild_index time.
+    """
+    global _INDEX
+    index = BM25Index.build(documents, metadatas, ids)
+    if SCIPY_AVAILABLE:
+        index.export(root)
+        _INDEX = (open_index(root) or index).prepare()
+    else:
+        index.save(path)
+        _INDEX = index.prepare()
+    return index
+
+
+def bm25_search(query: str, top_k: int = 5, filters: MetadataFilter = None):
+    """
+    BM25 lexical search over the persisted inverted index, restricted
+    to chunks matching `filters` if given.
+    Returns list of dicts with text + score.
+    """
+    index = _INDEX if _INDEX is not None else load_index()
+    with stage("bm25_search"):
+        return index.search(query, top_k, filters)
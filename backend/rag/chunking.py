@@ -1,33 +1,178 @@
-import uuid
+"""
+Word-window chunking for the backend ingestion path.
+
+chunk_pdf() streams a PDF page by page: only the words of the window
+being built are held, never the whole document text. iter_pdf_chunks()
+does the same for many PDFs with text extraction in a process pool, in
+page ranges, so at most a few ranges are in flight. Each chunk keeps
+- page / page_end: the (1-based) pages its first and last words are on
+- char_start / char_end: offsets into the document text, i.e. the pages'
+  extracted text joined with "\\n" (one past the last character)
+- doc_date: the document date (epoch seconds), for date filters
+Consecutive chunks share `overlap` words. Chunk ids hash the source and
+char_start, so re-ingesting a file with the same settings upserts the
+same ids.
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
 from pypdf import PdfReader
 
+from backend.config import CHUNK_SIZE, CHUNK_OVERLAP, INGEST_PAGES_PER_TASK, INGEST_WORKERS
+from backend.pipeline import parallel_map
 
-def chunk_pdf(path: str, chunk_size: int = 400):
-    reader = PdfReader(path)
-    chunks = []
-
-    all_text = ""
-    for page in reader.pages:
-        all_text += page.extract_text() + "\n"
-
-    words = all_text.split()
-    buffer = []
-
-    for idx, word in enumerate(words):
-        buffer.append(word)
-        if len(buffer) >= chunk_size:
-            chunks.append(" ".join(buffer))
-            buffer = []
-
-    if buffer:
-        chunks.append(" ".join(buffer))
-
-    return [
-        {
-            "id": str(uuid.uuid4()),
-            "text": c,
-            "source": path,
-            "page": i
+_WORD = re.compile(r"\S+")
+
+
+def chunk_id(source: str, offset) -> str:
+    """
+    Deterministic chunk id: hash of source + offset, so re-ingesting
+    the same file upserts the same ids instead of adding duplicates.
+    """
+    return hashlib.sha1(f"{source}:{offset}".encode("utf-8")).hexdigest()
+
+
+def chunker_version(chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> str:
+    """
+    Recorded in the ingest manifest: files chunked with other settings
+    or an older chunk metadata schema are re-chunked.
+    """
+    return f"pages-v2:{chunk_size}:{overlap}"
+
+
+def chunk_words(text: str, chunk_size: int = 400) -> List[str]:
+    """
+    Split text into consecutive windows of `chunk_size` words (the
+    page chunker over a single page, without overlap).
+    """
+    return [c["text"] for c in iter_page_chunks([(1, text)], "", chunk_size, overlap=0)]
+
+
+def document_date(path: str, reader: Optional[PdfReader] = None) -> float:
+    """
+    Epoch seconds of the PDF's creation date, else the file's mtime.
+    """
+    try:
+        created = (reader or PdfReader(path)).metadata.creation_date
+        if created is not None:
+            return created.timestamp()
+    except Exception:
+        pass  # missing or malformed document info
+    return os.path.getmtime(path)
+
+
+def iter_pdf_pages(path: str, reader: Optional[PdfReader] = None) -> Iterator[Tuple[int, str]]:
+    """
+    (page number, extracted text), one page at a time.
+    """
+    reader = reader or PdfReader(path)
+    for page_no, page in enumerate(reader.pages, start=1):
+        yield page_no, page.extract_text() or ""
+
+
+def iter_page_chunks(
+    pages: Iterable[Tuple[int, str]],
+    source: str,
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+    doc_date: Optional[float] = None,
+) -> Iterator[dict]:
+    """
+    Word windows over a stream of pages; windows run across page breaks.
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError(f"overlap must be in [0, chunk_size), got {overlap} for chunk_size {chunk_size}")
+
+    # Current window: (word, page, char_start, char_end) per word
+    window: List[Tuple[str, int, int, int]] = []
+    fresh = 0  # words in the window not already emitted with the previous chunk
+    base = 0   # document offset of the current page
+
+    def emit() -> dict:
+        start, end = window[0][2], window[-1][3]
+        return {
+            "id": chunk_id(source, start),
+            "text": " ".join(w[0] for w in window),
+            "source": source,
+            "page": window[0][1],
+            "page_end": window[-1][1],
+            "char_start": start,
+            "char_end": end,
+            "doc_date": doc_date,
         }
-        for i, c in enumerate(chunks)
-    ]
+
+    for page_no, text in pages:
+        for m in _WORD.finditer(text):
+            window.append((m.group(), page_no, base + m.start(), base + m.end()))
+            fresh += 1
+            if len(window) >= chunk_size:
+                yield emit()
+                del window[:len(window) - overlap]
+                fresh = 0
+        base += len(text) + 1
+
+    # Trailing words not covered by the last chunk
+    if fresh:
+        yield emit()
+
+
+def chunk_pdf(path: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[dict]:
+    """
+    Chunks of one PDF, extracted and chunked in this process.
+    """
+    reader = PdfReader(path)
+    pages = iter_pdf_pages(path, reader)
+    yield from iter_page_chunks(pages, path, chunk_size, overlap, doc_date=document_date(path, reader))
+
+
+def extract_pages(task: Tuple[str, int, int]) -> List[Tuple[int, str]]:
+    """
+    (page number, text) of pages start..end-1 (0-based) of one PDF; the
+    pool task of iter_pdf_chunks().
+    """
+    path, start, end = task
+    reader = PdfReader(path)
+    return [(n + 1, reader.pages[n].extract_text() or "") for n in range(start, end)]
+
+
+def iter_pdf_chunks(
+    paths: Sequence[str],
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+    workers: int = INGEST_WORKERS,
+    pages_per_task: int = INGEST_PAGES_PER_TASK,
+) -> Iterator[Tuple[str, Iterator[dict]]]:
+    """
+    (path, chunks) per PDF, in order. `chunks` is lazy: consume it before
+    taking the next pair. Page ranges are extracted ahead by parallel_map
+    (bounded by its max_pending), chunking runs here as they arrive.
+    """
+    dates: Dict[str, float] = {}
+
+    def tasks():
+        for path in paths:
+            reader = PdfReader(path)
+            dates[path] = document_date(path, reader)
+            count = len(reader.pages)
+            # A PDF without pages still gets one (empty) task, so it is reported
+            for start in range(0, max(count, 1), pages_per_task):
+                yield path, start, min(start + pages_per_task, count)
+
+    results = parallel_map(extract_pages, tasks(), workers=workers)
+    head = next(results, None)
+
+    def pages(path):
+        nonlocal head
+        while head is not None and head[0][0] == path:
+            yield from head[1]
+            head = next(results, None)
+
+    while head is not None:
+        path = head[0][0]
+        yield path, iter_page_chunks(pages(path), path, chunk_size, overlap, doc_date=dates[path])
+        # Skip what the caller left unread
+        for _ in pages(path):
+            pass
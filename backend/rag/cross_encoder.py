@@ -0,0 +1,117 @@
+"""
+Batched cross-encoder scoring shared by every reranker in the repo.
+
+- Tokenizes all (query, passage) pairs once, without padding
+- Sorts pairs by token length and scores them in buckets of
+  `batch_size`, padding each bucket only to its longest pair
+- Runs under torch.inference_mode()
+
+Scores are returned in the original passage order.
+
+TorchCrossEncoder / OnnxCrossEncoder (backend/rag/onnx_reranker.py) wrap
+a loaded model behind the same score(query, passages) call;
+load_cross_encoder() picks one by backend name.
+"""
+
+from typing import List, Optional
+
+import torch
+
+from backend.config import RERANK_BATCH_SIZE as DEFAULT_BATCH_SIZE
+
+
+def iter_buckets(
+    tokenizer,
+    query: str,
+    passages: List[str],
+    batch_size: Optional[int] = None,
+    max_length: int = 512,
+    return_tensors: str = "pt",
+):
+    """
+    Yield (indices, padded batch) over length-sorted buckets of pairs.
+    `indices` are positions in `passages`.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+
+    encoded = tokenizer(
+        [query] * len(passages),
+        passages,
+        truncation=True,
+        max_length=max_length,
+    )
+    keys = list(encoded.keys())
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+
+    # Length-sorted bucketing keeps padding inside each batch minimal
+    order = sorted(range(len(passages)), key=lambda i: lengths[i])
+
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        features = [{k: encoded[k][i] for k in keys} for i in bucket]
+        yield bucket, tokenizer.pad(features, padding="longest", return_tensors=return_tensors)
+
+
+def score_pairs(
+    tokenizer,
+    model,
+    query: str,
+    passages: List[str],
+    batch_size: Optional[int] = None,
+    max_length: int = 512,
+    device=None,
+) -> List[float]:
+    """
+    Score each passage against the query with a HuggingFace
+    sequence-classification cross-encoder. Returns raw logits.
+    """
+    if not passages:
+        return []
+
+    scores = [0.0] * len(passages)
+
+    with torch.inference_mode():
+        for bucket, batch in iter_buckets(tokenizer, query, passages, batch_size, max_length):
+            if device is not None:
+                batch = batch.to(device)
+
+            logits = model(**batch).logits
+            for i, score in zip(bucket, logits[:, 0].float().cpu().tolist()):
+                scores[i] = score
+
+    return scores
+
+
+class TorchCrossEncoder:
+    """
+    HuggingFace cross-encoder + tokenizer on GPU if available, else CPU.
+    """
+
+    def __init__(self, model_name: str, device=None):
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.model_name = model_name
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device)
+        self.model.eval()
+
+    def score(
+        self,
+        query: str,
+        passages: List[str],
+        batch_size: Optional[int] = None,
+        max_length: int = 512,
+    ) -> List[float]:
+        return score_pairs(self.tokenizer, self.model, query, passages, batch_size, max_length, self.device)
+
+
+def load_cross_encoder(model_name: str, backend: str = "torch"):
+    """
+    "torch" -> TorchCrossEncoder, "onnx" -> OnnxCrossEncoder (exported on first use).
+    """
+    if backend == "onnx":
+        from backend.rag.onnx_reranker import OnnxCrossEncoder, ensure_onnx
+
+        return OnnxCrossEncoder(ensure_onnx(model_name))
+    return TorchCrossEncoder(model_name)
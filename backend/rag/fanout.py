@@ -0,0 +1,77 @@
+"""
+Concurrent fan-out of independent retrieval legs (dense, BM25, ...).
+
+Each leg runs on the leg executor with its own deadline, measured from
+the moment the fan-out starts. A leg that misses its deadline or raises
+contributes no results, so the request degrades to the legs that did
+answer; only when every leg fails is an error raised.
+"""
+
+import contextvars
+import logging
+import time
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Callable, Dict, Tuple
+
+from backend.concurrency import get_leg_executor
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(fn: Callable[[], list]) -> Tuple[float, list]:
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+
+def run_legs(
+    legs: Dict[str, Callable[[], list]],
+    timeouts: Dict[str, float],
+) -> Tuple[Dict[str, list], Dict[str, dict]]:
+    """
+    Run every leg concurrently.
+
+    Returns (results, timings):
+    - results: leg name -> list (empty for a failed leg)
+    - timings: leg name -> {"ms", "status": ok | timeout | error, "hits"}
+    """
+    executor = get_leg_executor()
+    start = time.perf_counter()
+    # One context copy per leg: a context can only be entered by one thread
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, _timed, fn)
+        for name, fn in legs.items()
+    }
+
+    results: Dict[str, list] = {}
+    timings: Dict[str, dict] = {}
+    errors = []
+
+    for name, future in futures.items():
+        remaining = start + timeouts[name] - time.perf_counter()
+        try:
+            elapsed, value = future.result(timeout=max(remaining, 0.0))
+            results[name] = value
+            timings[name] = {"ms": round(elapsed * 1000, 2), "status": "ok", "hits": len(value)}
+            continue
+        except FuturesTimeout:
+            # The thread keeps running; its result is simply ignored
+            future.cancel()
+            status = "timeout"
+            errors.append(TimeoutError(f"{name} retrieval exceeded {timeouts[name]}s"))
+        except Exception as e:
+            status = "error"
+            errors.append(e)
+
+        logger.warning(f"Retrieval leg '{name}' failed ({status}): {errors[-1]}")
+        results[name] = []
+        timings[name] = {
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+            "status": status,
+            "hits": 0,
+        }
+
+    if len(errors) == len(legs):
+        raise errors[0]
+
+    return results, timings
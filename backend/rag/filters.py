@@ -0,0 +1,220 @@
+"""
+Metadata filters for retrieval (source, page range, document date).
+
+A filter is pushed down into each engine instead of post-filtering:
+- Chroma: to_chroma_where() becomes the query's `where` clause
+- BM25 / flat index: FilterColumns turns it into a boolean candidate
+  mask over the engine's rows, so only allowed documents are scored
+
+Chunk metadata fields used:
+- source:    path of the ingested file
+- page:      first page of the chunk; page_end its last (defaults to page)
+- doc_date:  document date, epoch seconds (PDF creation date or file mtime)
+
+Page ranges match chunks that overlap [page_from, page_to]; dates match
+date_from <= doc_date < date_to. Chunks missing a filtered field never match.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Candidate masks kept per FilterColumns (one per distinct filter)
+MASK_CACHE_SIZE = 64
+
+
+class MetadataFilter:
+    def __init__(
+        self,
+        sources: Optional[Sequence[str]] = None,
+        page_from: Optional[int] = None,
+        page_to: Optional[int] = None,
+        date_from: Optional[float] = None,
+        date_to: Optional[float] = None,
+    ):
+        if page_from is not None and page_to is not None and page_from > page_to:
+            raise ValueError(f"page_from ({page_from}) is after page_to ({page_to})")
+        if date_from is not None and date_to is not None and date_from >= date_to:
+            raise ValueError("date_from must be before date_to")
+
+        self.sources = sorted(set(sources)) if sources else None
+        self.page_from = page_from
+        self.page_to = page_to
+        self.date_from = date_from
+        self.date_to = date_to
+
+    @property
+    def is_empty(self) -> bool:
+        return self.key() == (None, None, None, None, None)
+
+    def key(self) -> tuple:
+        """
+        Hashable identity (cache keys).
+        """
+        return (
+            tuple(self.sources) if self.sources else None,
+            self.page_from, self.page_to, self.date_from, self.date_to,
+        )
+
+    def matches(self, meta: Optional[dict]) -> bool:
+        meta = meta or {}
+        if self.sources is not None and meta.get("source") not in self.sources:
+            return False
+
+        if self.page_from is not None or self.page_to is not None:
+            page = meta.get("page")
+            page_end = meta.get("page_end")
+            if page is None:
+                return False
+            if page_end is None:
+                page_end = page
+            if self.page_to is not None and page > self.page_to:
+                return False
+            if self.page_from is not None and page_end < self.page_from:
+                return False
+
+        if self.date_from is not None or self.date_to is not None:
+            date = meta.get("doc_date")
+            if date is None:
+                return False
+            if self.date_from is not None and date < self.date_from:
+                return False
+            if self.date_to is not None and date >= self.date_to:
+                return False
+
+        return True
+
+    def to_chroma_where(self) -> Optional[dict]:
+        clauses = []
+        if self.sources is not None:
+            clauses.append({"source": {"$in": list(self.sources)}})
+        if self.page_to is not None:
+            clauses.append({"page": {"$lte": self.page_to}})
+        if self.page_from is not None:
+            # Chunks without page_end (ingested before it existed) fall back
+            # to page, as in matches() / FilterColumns; page_end >= page, so
+            # the $or is exact for the others
+            clauses.append({"$or": [
+                {"page_end": {"$gte": self.page_from}},
+                {"page": {"$gte": self.page_from}},
+            ]})
+        if self.date_from is not None:
+            clauses.append({"doc_date": {"$gte": self.date_from}})
+        if self.date_to is not None:
+            clauses.append({"doc_date": {"$lt": self.date_to}})
+
+        if not clauses:
+            return None
+        # Chroma wants $and only for two or more conditions
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _float_column(metas: Sequence[Optional[dict]], field: str, fallback: Optional[str] = None) -> np.ndarray:
+    out = np.full(len(metas), np.nan)
+    for i, meta in enumerate(metas):
+        meta = meta or {}
+        value = meta.get(field)
+        if value is None and fallback is not None:
+            value = meta.get(fallback)
+        if value is not None:
+            out[i] = value
+    return out
+
+
+class FilterColumns:
+    """
+    Filterable metadata of an engine's rows as columns, so a filter becomes
+    a vectorized mask. Missing values are NaN (source: -1) and never match.
+    """
+
+    def __init__(self, source_codes, source_names: List[str], page, page_end, doc_date):
+        self.source_codes = source_codes
+        self.source_names = list(source_names)
+        self.page = page
+        self.page_end = page_end
+        self.doc_date = doc_date
+
+        self._source_index = {name: i for i, name in enumerate(self.source_names)}
+        self._masks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_metadatas(cls, metas: Sequence[Optional[dict]]) -> "FilterColumns":
+        names: Dict[str, int] = {}
+        codes = np.full(len(metas), -1, dtype=np.int32)
+        for i, meta in enumerate(metas):
+            source = (meta or {}).get("source")
+            if source is not None:
+                codes[i] = names.setdefault(source, len(names))
+
+        return cls(
+            codes,
+            list(names),
+            _float_column(metas, "page"),
+            _float_column(metas, "page_end", fallback="page"),
+            _float_column(metas, "doc_date"),
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["FilterColumns"]) -> "FilterColumns":
+        """
+        Rows of `parts` one after the other (source codes are remapped).
+        """
+        names: Dict[str, int] = {}
+        codes = []
+        for part in parts:
+            # Trailing -1 keeps missing sources (code -1) missing
+            remap = np.array([names.setdefault(n, len(names)) for n in part.source_names] + [-1], dtype=np.int32)
+            codes.append(remap[np.asarray(part.source_codes)])
+
+        def column(name):
+            return np.concatenate([getattr(p, name) for p in parts]) if parts else np.empty(0)
+
+        return cls(
+            np.concatenate(codes) if codes else np.empty(0, dtype=np.int32),
+            list(names),
+            column("page"),
+            column("page_end"),
+            column("doc_date"),
+        )
+
+    def take(self, rows: np.ndarray) -> "FilterColumns":
+        return FilterColumns(
+            self.source_codes[rows], self.source_names, self.page[rows], self.page_end[rows], self.doc_date[rows]
+        )
+
+    def __len__(self) -> int:
+        return len(self.source_codes)
+
+    def mask(self, flt: MetadataFilter) -> np.ndarray:
+        """
+        Rows allowed by `flt` (cached per filter; treat as read-only).
+        """
+        key = flt.key()
+        with self._lock:
+            cached = self._masks.get(key)
+            if cached is not None:
+                self._masks.move_to_end(key)
+                return cached
+
+        allowed = np.ones(len(self), dtype=bool)
+        # NaN comparisons are False, so rows missing a field drop out
+        if flt.sources is not None:
+            codes = [self._source_index[s] for s in flt.sources if s in self._source_index]
+            allowed &= np.isin(self.source_codes, codes)
+        if flt.page_to is not None:
+            allowed &= self.page <= flt.page_to
+        if flt.page_from is not None:
+            allowed &= self.page_end >= flt.page_from
+        if flt.date_from is not None:
+            allowed &= self.doc_date >= flt.date_from
+        if flt.date_to is not None:
+            allowed &= self.doc_date < flt.date_to
+
+        with self._lock:
+            self._masks[key] = allowed
+            while len(self._masks) > MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return allowed
@@ -0,0 +1,380 @@
+"""
+Memory-mapped flat / IVF dense index: a read-optimized alternative to
+Chroma's HNSW for the (mostly read-only) document corpus.
+
+Layout under FLAT_INDEX_DIR:
+
+    CURRENT                 name of the live generation
+    <generation>/
+        header.json         count, dim, dtype, nlist, build time
+        vectors.npy         L2-normalized embeddings, float32 | float16 | int8
+        scales.npy          int8 only: per-row dequantization scale
+        centroids.npy       IVF only: (nlist, dim) float32 coarse centroids
+        list_offsets.npy    IVF only: rows of list j are offsets[j]..offsets[j+1]-1
+        docs.jsonl          one {"id", "text", "metadata"} per chunk
+        doc_offsets.npy     byte offset of each row's docs.jsonl line
+        filter_*.npy        filterable metadata columns (source code, page,
+                            page_end, doc_date; source names in the header)
+
+- Arrays are opened with np.load(mmap_mode="r"): every API worker process
+  maps the same files and shares the OS page cache, nothing is copied in
+- Exact search is a blocked BLAS matmul over all rows; with IVF only the
+  rows of the `nprobe` lists nearest to the query are scanned (IVF rows
+  are stored grouped by list, so each list is one contiguous slice)
+- Chunk metadata is read from docs.jsonl for the top-k rows only
+- Metadata filters become a row mask (backend/rag/filters.py): only the
+  allowed rows are scanned, exactly when few enough of them remain
+- A build writes a new generation directory, then flips CURRENT
+  atomically; readers reopen on their next search (see get_flat_index
+  and mmap_store.py, which the BM25 export shares)
+- Scores are cosine distances (1 - cosine similarity, lower = better),
+  like the Chroma collection's
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from backend.config import FLAT_INDEX_DIR, FLAT_INDEX_DTYPE, FLAT_INDEX_NLIST, FLAT_INDEX_NPROBE
+from backend.rag.filters import FilterColumns, MetadataFilter
+from backend.rag.mmap_store import (
+    DocStore,
+    DocsWriter,
+    build_lock,
+    current_generation as _current_generation,
+    load_array,
+    load_filter_columns,
+    new_generation,
+    open_current,
+    read_header,
+    save_doc_offsets,
+    save_filter_columns,
+    set_current,
+    write_header,
+)
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ("float32", "float16", "int8")
+
+# Rows per matmul block (bounds the float32 copy of float16 / int8 blocks)
+SCAN_BLOCK_ROWS = 65536
+
+# k-means on at most this many sampled rows per list
+KMEANS_SAMPLE_PER_LIST = 256
+KMEANS_ITERATIONS = 20
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+    """
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+# -------------------------------------------------------
+# Build
+# -------------------------------------------------------
+
+def _kmeans(sample: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means: unit-norm centroids, assignment by inner product.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        # Re-seed empty lists with random rows
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def build_flat_index(
+    batches: Iterable[Tuple[Sequence[str], Sequence, Sequence[str], Sequence[dict]]],
+    count: int,
+    root: str = FLAT_INDEX_DIR,
+    dtype: str = FLAT_INDEX_DTYPE,
+    nlist: int = FLAT_INDEX_NLIST,
+) -> dict:
+    """
+    Write a new generation from (ids, embeddings, documents, metadatas)
+    batches holding `count` chunks in total, then make it live.
+    Only one batch plus the memory-mapped output is in memory at a time;
+    concurrent builds under `root` run one after the other.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown flat index dtype: {dtype} (expected one of {DTYPES})")
+
+    with build_lock(root):
+        generation, gen_dir = new_generation(root)
+
+        start_time = time.perf_counter()
+        raw_path = os.path.join(gen_dir, "raw.npy")
+        raw = None
+        filter_fields = []
+        row = 0
+
+        # 1. Normalized float32 rows + docs.jsonl, in collection order
+        with DocsWriter(gen_dir) as docs_writer:
+            for ids, embeddings, documents, metadatas in batches:
+                vectors = _normalize(embeddings)
+                if raw is None:
+                    raw = open_memmap(raw_path, mode="w+", dtype=np.float32, shape=(count, vectors.shape[1]))
+                raw[row:row + len(vectors)] = vectors
+
+                for i, chunk_id in enumerate(ids):
+                    meta = metadatas[i] or {}
+                    docs_writer.write({"id": chunk_id, "text": documents[i], "metadata": meta})
+                    filter_fields.append({f: meta.get(f) for f in ("source", "page", "page_end", "doc_date")})
+                row += len(vectors)
+        doc_offsets = np.asarray(docs_writer.offsets, dtype=np.int64)
+
+        if row != count:
+            shutil.rmtree(gen_dir, ignore_errors=True)
+            raise RuntimeError(f"Flat index build got {row} chunks, expected {count}")
+
+        dim = raw.shape[1] if raw is not None else 0
+        nlist = min(nlist, count) if nlist > 0 else 0
+
+        # 2. IVF: train centroids on a sample, group rows by nearest centroid
+        order = np.arange(count)
+        if nlist:
+            rng = np.random.default_rng(0)
+            sample_size = min(count, nlist * KMEANS_SAMPLE_PER_LIST)
+            sample = np.asarray(raw[np.sort(rng.choice(count, size=sample_size, replace=False))])
+            centroids = _kmeans(sample, nlist)
+            assign = _assign(raw, centroids)
+            order = np.argsort(assign, kind="stable")
+            list_offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+            np.save(os.path.join(gen_dir, "centroids.npy"), centroids)
+            np.save(os.path.join(gen_dir, "list_offsets.npy"), list_offsets)
+
+        # 3. Final rows in list order, stored as `dtype`
+        vectors_path = os.path.join(gen_dir, "vectors.npy")
+        scales = np.ones(count, dtype=np.float32)
+        if count:
+            vectors_out = open_memmap(vectors_path, mode="w+", dtype=np.dtype(dtype), shape=(count, dim))
+            for start in range(0, count, SCAN_BLOCK_ROWS):
+                rows = order[start:start + SCAN_BLOCK_ROWS]
+                block = np.asarray(raw[rows])
+                if dtype == "int8":
+                    block_scales = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127.0
+                    scales[start:start + len(rows)] = block_scales
+                    block = np.round(block / block_scales[:, None])
+                vectors_out[start:start + len(rows)] = block.astype(dtype)
+            vectors_out.flush()
+            del vectors_out, raw
+        else:
+            np.save(vectors_path, np.zeros((0, 0), dtype=dtype))
+
+        if dtype == "int8":
+            np.save(os.path.join(gen_dir, "scales.npy"), scales)
+        save_doc_offsets(gen_dir, doc_offsets[order])
+
+        sources = save_filter_columns(gen_dir, FilterColumns.from_metadatas([filter_fields[i] for i in order]))
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+        header = {
+            "generation": generation,
+            "count": count,
+            "dim": dim,
+            "dtype": dtype,
+            "nlist": nlist,
+            "sources": sources,
+            "built_at": time.time(),
+            "build_sec": round(time.perf_counter() - start_time, 3),
+        }
+        write_header(gen_dir, header)
+
+        set_current(root, generation)
+        logger.info(f"Flat index generation {generation}: {count} x {dim} {dtype}, nlist={nlist}")
+        return header
+
+
+def current_generation(root: str = FLAT_INDEX_DIR) -> Optional[str]:
+    return _current_generation(root)
+
+
+# -------------------------------------------------------
+# Search
+# -------------------------------------------------------
+
+class FlatIndex:
+    """
+    One generation, memory-mapped read-only.
+    """
+
+    def __init__(self, gen_dir: str):
+        self.gen_dir = gen_dir
+        self.header = read_header(gen_dir)
+
+        self.generation = self.header["generation"]
+        self.count = self.header["count"]
+        self.dim = self.header["dim"]
+        self.nlist = self.header["nlist"]
+
+        self.vectors = load_array(gen_dir, "vectors.npy")
+        self.scales = load_array(gen_dir, "scales.npy", required=False)
+        self.centroids = load_array(gen_dir, "centroids.npy", required=False)
+        self.list_offsets = load_array(gen_dir, "list_offsets.npy", required=False)
+        self.docs = DocStore(gen_dir)
+        self._columns = None
+
+    def close(self):
+        self.docs.close()
+
+    def _scan(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """
+        Cosine similarities of `queries` with rows start..end-1, (m, end - start).
+        """
+        out = np.empty((len(queries), end - start), dtype=np.float32)
+        for lo in range(start, end, SCAN_BLOCK_ROWS):
+            hi = min(lo + SCAN_BLOCK_ROWS, end)
+            block = self.vectors[lo:hi]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            sims = queries @ block.T
+            if self.scales is not None:
+                sims *= self.scales[lo:hi]
+            out[:, lo - start:hi - start] = sims
+        return out
+
+    def _scan_rows(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarities of `queries` with the given (sorted) rows.
+        """
+        out = np.empty((len(queries), len(rows)), dtype=np.float32)
+        for lo in range(0, len(rows), SCAN_BLOCK_ROWS):
+            block_rows = rows[lo:lo + SCAN_BLOCK_ROWS]
+            sims = queries @ np.asarray(self.vectors[block_rows], dtype=np.float32).T
+            if self.scales is not None:
+                sims *= self.scales[block_rows]
+            out[:, lo:lo + len(block_rows)] = sims
+        return out
+
+    def _rows_to_probe(self, query: np.ndarray, nprobe: int) -> List[Tuple[int, int]]:
+        lists = _top_k(self.centroids @ query, min(nprobe, self.nlist))
+        return [(int(self.list_offsets[j]), int(self.list_offsets[j + 1])) for j in np.sort(lists)]
+
+    @property
+    def columns(self) -> FilterColumns:
+        if self._columns is None:
+            self._columns = load_filter_columns(self.gen_dir, self.header.get("sources", []))
+            if self._columns is None:
+                # Generation built before filter columns existed
+                self._columns = FilterColumns.from_metadatas([self.doc(r)["metadata"] for r in range(self.count)])
+        return self._columns
+
+    def search_batch(
+        self, queries, k: int, nprobe: int = FLAT_INDEX_NPROBE, allowed: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k (row, cosine distance) per query, best first. `allowed`
+        (bool per row) restricts the search to those rows.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        if self.count == 0 or k <= 0:
+            return [[] for _ in queries]
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match flat index dimension {self.dim}")
+
+        def ranked(rows, sims):
+            top = _top_k(sims, k)
+            return [(int(rows[t]), float(1.0 - sims[t])) for t in top]
+
+        if allowed is not None:
+            rows = np.flatnonzero(allowed)
+            # Few enough candidates: exact over just those rows beats probing
+            if not self.nlist or len(rows) <= SCAN_BLOCK_ROWS:
+                return [ranked(rows, sims) for sims in self._scan_rows(queries, rows)]
+
+        if not self.nlist:
+            # Exact: one matmul for all queries
+            rows = np.arange(self.count)
+            return [ranked(rows, sims) for sims in self._scan(queries, 0, self.count)]
+
+        results = []
+        for query in queries:
+            ranges = self._rows_to_probe(query, nprobe)
+            if allowed is not None:
+                rows = np.concatenate([lo + np.flatnonzero(allowed[lo:hi]) for lo, hi in ranges])
+                sims = self._scan_rows(query[None], rows)[0]
+            else:
+                rows = np.concatenate([np.arange(lo, hi) for lo, hi in ranges])
+                sims = np.concatenate([self._scan(query[None], lo, hi)[0] for lo, hi in ranges])
+            results.append(ranked(rows, sims))
+        return results
+
+    def search(
+        self, query, k: int, nprobe: int = FLAT_INDEX_NPROBE, filters: Optional[MetadataFilter] = None
+    ) -> List[dict]:
+        """
+        Top-k {"id", "text", "metadata", "score"} for one query embedding,
+        restricted to chunks matching `filters` if given.
+        """
+        allowed = None
+        if filters is not None and not filters.is_empty:
+            allowed = self.columns.mask(filters)
+        hits = self.search_batch(query, k, nprobe, allowed)[0]
+        return [{**self.doc(row), "score": distance} for row, distance in hits]
+
+    def doc(self, row: int) -> dict:
+        return self.docs[row]
+
+
+_INDEXES: Dict[str, FlatIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_flat_index(root: str = FLAT_INDEX_DIR) -> Optional[FlatIndex]:
+    """
+    The live generation under `root` (None before the first build, or if
+    it cannot be opened). Cheap per request: reopens only when CURRENT names a new generation.
+    """
+    generation = current_generation(root)
+    if generation is None:
+        return None
+
+    index = _INDEXES.get(root)
+    if index is not None and index.generation == generation:
+        return index
+
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(root)
+        if index is None or index.generation != generation:
+            index = open_current(root, FlatIndex)
+            if index is None:
+                return None
+            # The old generation stays open for searches already using it
+            _INDEXES[root] = index
+    return index
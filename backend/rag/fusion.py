@@ -0,0 +1,107 @@
+"""
+Result fusion for hybrid retrieval.
+
+Dense (distance, lower = better) and BM25 (unbounded, higher = better)
+scores live on different scales, so they are never compared directly:
+
+- rrf:    reciprocal rank fusion, sum of w / (k + rank)
+- minmax: per-list min-max normalisation, then weighted sum
+- zscore: per-list z-score normalisation, then weighted sum
+
+Results are keyed by chunk id (or a hash of the text when no id is
+available), so a chunk returned by both retrievers appears once.
+"""
+
+import hashlib
+import math
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def chunk_key(doc: dict) -> str:
+    """
+    Chunk id when the retriever provides one, otherwise a text hash.
+    """
+    if doc.get("id"):
+        return str(doc["id"])
+    return text_key(doc)
+
+
+def text_key(doc: dict) -> str:
+    text = doc.get("text") or doc.get("content") or ""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(scores: List[float], method: str, higher_is_better: bool) -> List[float]:
+    if not scores:
+        return []
+
+    if not higher_is_better:
+        scores = [-s for s in scores]
+
+    if method == "minmax":
+        lo, hi = min(scores), max(scores)
+        if hi == lo:
+            return [1.0] * len(scores)
+        return [(s - lo) / (hi - lo) for s in scores]
+
+    if method == "zscore":
+        mean = sum(scores) / len(scores)
+        std = math.sqrt(sum((s - mean) ** 2 for s in scores) / len(scores))
+        if std == 0:
+            return [0.0] * len(scores)
+        return [(s - mean) / std for s in scores]
+
+    raise ValueError(f"Unknown normalisation: {method}")
+
+
+def fuse(
+    result_lists: Sequence[List[dict]],
+    method: str = "rrf",
+    weights: Optional[Sequence[float]] = None,
+    higher_is_better: Optional[Sequence[bool]] = None,
+    rrf_k: int = 60,
+    key: Callable[[dict], str] = chunk_key,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """
+    Fuse ranked result lists (each sorted best-first) into one deduplicated list.
+
+    Each returned doc is a copy of its first occurrence with an added
+    "fusion_score" (higher = better). `higher_is_better` gives the
+    direction of each list's "score"; it is ignored by rrf.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    higher_is_better = higher_is_better or [True] * len(result_lists)
+
+    fused: Dict[str, dict] = {}
+    totals: Dict[str, float] = {}
+
+    for docs, weight, hib in zip(result_lists, weights, higher_is_better):
+        if method == "rrf":
+            contrib = [weight / (rrf_k + rank) for rank in range(1, len(docs) + 1)]
+        else:
+            norm = _normalize([float(d["score"]) for d in docs], method, hib)
+            contrib = [weight * n for n in norm]
+
+        seen = set()
+        for doc, c in zip(docs, contrib):
+            k = key(doc)
+            if k in seen:  # duplicate inside one list: keep its best rank only
+                continue
+            seen.add(k)
+
+            if k not in fused:
+                fused[k] = dict(doc)
+                totals[k] = 0.0
+            totals[k] += c
+
+    ranked = sorted(fused, key=lambda k: totals[k], reverse=True)
+    if limit is not None:
+        ranked = ranked[:limit]
+
+    out = []
+    for k in ranked:
+        doc = fused[k]
+        doc["fusion_score"] = totals[k]
+        out.append(doc)
+    return out
@@ -0,0 +1,222 @@
+"""
+On-disk layout shared by the memory-mapped indexes (flat dense index,
+BM25 postings).
+
+    <root>/CURRENT          name of the live generation
+    <root>/<generation>/    one immutable build:
+        *.npy               arrays, opened with np.load(mmap_mode="r")
+        docs.jsonl          one JSON document per row
+        doc_offsets.npy     byte offset of each row's docs.jsonl line
+        filter_*.npy        filterable metadata columns (filters.py)
+
+A build writes a new generation directory, then flips CURRENT atomically.
+Builds under one root are serialized across processes by build_lock().
+Every process maps the same files, so API workers share one copy through
+the OS page cache instead of each holding the index in its heap.
+"""
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+import uuid
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from backend.rag.filters import FilterColumns
+from backend.workers import InterProcessLock
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Reopen attempts while builds keep replacing the generation being opened
+OPEN_RETRIES = 3
+
+
+def build_lock(root: str) -> InterProcessLock:
+    """
+    Held by a build from new_generation() through set_current(), so only
+    one process at a time writes a generation under `root`.
+    """
+    return InterProcessLock(os.path.join(root, "BUILD.lock"))
+
+
+def new_generation(root: str) -> Tuple[str, str]:
+    """
+    (generation, directory) for a new build under `root`.
+    """
+    generation = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    gen_dir = os.path.join(root, generation)
+    os.makedirs(gen_dir)
+    return generation, gen_dir
+
+
+def set_current(root: str, generation: str):
+    """
+    Make `generation` live, then drop the fully written generations built
+    before it. Call with build_lock(root) held.
+    """
+    tmp_path = os.path.join(root, f"CURRENT.{os.getpid()}.{uuid.uuid4().hex[:6]}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(tmp_path, os.path.join(root, "CURRENT"))
+
+    # Older generations: processes that still map them keep their pages
+    # until they reopen (POSIX), so they can go right away. A directory
+    # without a header is still being written (or was abandoned) and stays
+    built_at = read_header(os.path.join(root, generation))["built_at"]
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name == generation or not os.path.isdir(path):
+            continue
+        try:
+            header = read_header(path)
+        except (OSError, ValueError):
+            continue
+        if header.get("built_at", 0) <= built_at:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def current_generation(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, "CURRENT"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def open_current(root: str, open_fn: Callable[[str], T]) -> Optional[T]:
+    """
+    open_fn(gen_dir) on the live generation, or None (nothing built yet,
+    or it cannot be opened: callers fall back to their other backend).
+    A FileNotFoundError is retried only while CURRENT moves on to another
+    generation, at most OPEN_RETRIES times.
+    """
+    generation = current_generation(root)
+    for _ in range(OPEN_RETRIES):
+        if generation is None:
+            return None
+        try:
+            return open_fn(os.path.join(root, generation))
+        except FileNotFoundError as e:
+            latest = current_generation(root)
+            if latest == generation:
+                logger.error(f"Cannot open generation {generation} under {root}: {e}")
+                return None
+            # A newer build replaced it between reading CURRENT and opening
+            generation = latest
+
+    logger.error(f"Gave up opening {root}: replaced {OPEN_RETRIES} times while opening")
+    return None
+
+
+def load_array(gen_dir: str, name: str, required: bool = True):
+    """
+    Memory-map `name`. A missing required array raises FileNotFoundError;
+    a missing optional one is None.
+    """
+    path = os.path.join(gen_dir, name)
+    if not required and not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def write_header(gen_dir: str, header: dict):
+    # Written last and atomically: a generation with a header is complete
+    path = os.path.join(gen_dir, "header.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_header(gen_dir: str) -> dict:
+    with open(os.path.join(gen_dir, "header.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# -------------------------------------------------------
+# Documents
+# -------------------------------------------------------
+
+class DocsWriter:
+    """
+    Appends rows to docs.jsonl, recording each row's byte offset.
+    """
+
+    def __init__(self, gen_dir: str):
+        self._file = open(os.path.join(gen_dir, "docs.jsonl"), "wb")
+        self.offsets: List[int] = []
+
+    def write(self, doc: dict) -> int:
+        self.offsets.append(self._file.tell())
+        self._file.write(json.dumps(doc).encode("utf-8") + b"\n")
+        return self.offsets[-1]
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def save_doc_offsets(gen_dir: str, offsets):
+    np.save(os.path.join(gen_dir, "doc_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+
+class DocStore:
+    """
+    Read-only rows of docs.jsonl, parsed on access.
+    """
+
+    def __init__(self, gen_dir: str):
+        self.offsets = load_array(gen_dir, "doc_offsets.npy")
+        self._file = open(os.path.join(gen_dir, "docs.jsonl"), "rb")
+        self._docs = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self.offsets) else None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, row: int) -> dict:
+        start = int(self.offsets[row])
+        end = self._docs.find(b"\n", start)
+        return json.loads(self._docs[start:end])
+
+    def close(self):
+        if self._docs is not None:
+            self._docs.close()
+        self._file.close()
+
+
+# -------------------------------------------------------
+# Filter columns
+# -------------------------------------------------------
+
+def save_filter_columns(gen_dir: str, columns: FilterColumns):
+    """
+    Writes the columns; returns the source names for the header.
+    """
+    np.save(os.path.join(gen_dir, "filter_source.npy"), columns.source_codes)
+    np.save(os.path.join(gen_dir, "filter_page.npy"), columns.page)
+    np.save(os.path.join(gen_dir, "filter_page_end.npy"), columns.page_end)
+    np.save(os.path.join(gen_dir, "filter_doc_date.npy"), columns.doc_date)
+    return columns.source_names
+
+
+def load_filter_columns(gen_dir: str, source_names: List[str]) -> Optional[FilterColumns]:
+    if not os.path.exists(os.path.join(gen_dir, "filter_source.npy")):
+        return None
+    return FilterColumns(
+        load_array(gen_dir, "filter_source.npy"),
+        source_names,
+        load_array(gen_dir, "filter_page.npy"),
+        load_array(gen_dir, "filter_page_end.npy"),
+        load_array(gen_dir, "filter_doc_date.npy"),
+    )
@@ -0,0 +1,252 @@
+"""
+ONNX Runtime backend for the cross-encoder reranker (CPU serving).
+
+- export_onnx(): HuggingFace cross-encoder (hub name, or a local dir such
+  as models/reranker/versions/<version> written by backend/training.py) -> model.onnx
+  plus a dynamically int8-quantized model.int8.onnx, tokenizer alongside
+- OnnxCrossEncoder: serves either file through onnxruntime with a fixed
+  intra-op thread count and the same length-bucketed batching as
+  score_pairs(); returns raw logits
+- parity_check(): ONNX scores vs. the PyTorch model (correlation, max
+  diff, top-1 agreement); export_onnx() runs it and stores the result
+  in export.json next to the model
+
+CLI:
+    python -m backend.rag.onnx_reranker --model models/reranker/versions/<version>
+"""
+
+import argparse
+import inspect
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.config import ONNX_RERANKER_DIR, ONNX_QUANTIZE, ORT_INTRA_OP_THREADS
+from backend.rag.cross_encoder import iter_buckets, score_pairs
+
+try:
+    import onnxruntime as ort
+
+    ORT_AVAILABLE = True
+except ImportError:
+    ORT_AVAILABLE = False
+
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+# Pairs used for the post-export parity check
+PARITY_QUERY = "how often are encryption keys rotated"
+PARITY_PASSAGES = [
+    "Encryption keys are rotated every twelve months or after a suspected compromise.",
+    "Customer data must be encrypted at rest using AES-256.",
+    "Access rights are recertified quarterly by line managers.",
+    "The liquidity coverage ratio is calculated daily by treasury.",
+    "Keys",
+    "Backups inherit the encryption settings of the source system and are stored in a separate region, "
+    "while application teams may not implement their own cryptographic primitives.",
+    "Severity one incidents trigger the on-call incident commander within fifteen minutes.",
+    "Rotation of encryption keys is handled by the central key management service.",
+]
+
+
+def onnx_dir_for(model_name: str) -> str:
+    """
+    Export location for a model: ONNX_RERANKER_DIR/<name with / as -->.
+    """
+    return os.path.join(ONNX_RERANKER_DIR, model_name.strip("/").replace("/", "--"))
+
+
+# -------------------------------------------------------
+# Export + quantization
+# -------------------------------------------------------
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = ONNX_QUANTIZE, opset: int = 17) -> Dict:
+    """
+    Export a sequence-classification cross-encoder to ONNX with dynamic
+    batch / sequence axes, optionally add an int8 copy, then check parity.
+    Returns the export metadata (also written to export.json).
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    dummy = tokenizer(["query", "query"], ["a passage", "another passage"], padding=True, return_tensors="pt")
+    input_names = list(dummy.keys())
+
+    class _LogitsOnly(torch.nn.Module):
+        # Positional inputs in tokenizer order -> logits tensor
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).logits
+
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.inference_mode():
+        torch.onnx.export(
+            _LogitsOnly(model).eval(),  # export restores the wrapper's train/eval mode
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={
+                **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+            **extra,
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+    meta = {
+        "source": model_name,
+        "opset": opset,
+        "quantized": quantize,
+        "parity": {
+            "fp32": parity_check(model, tokenizer, OnnxCrossEncoder(output_dir, quantized=False)),
+        },
+    }
+    if quantize:
+        meta["parity"]["int8"] = parity_check(model, tokenizer, OnnxCrossEncoder(output_dir, quantized=True))
+
+    with open(os.path.join(output_dir, "export.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+def ensure_onnx(model_name: str, quantize: bool = ONNX_QUANTIZE) -> str:
+    """
+    Directory holding the ONNX export of `model_name`, exporting it first
+    if it is missing.
+    """
+    output_dir = onnx_dir_for(model_name)
+    wanted = INT8_FILE if quantize else FP32_FILE
+    if not os.path.exists(os.path.join(output_dir, wanted)):
+        export_onnx(model_name, output_dir, quantize=quantize)
+    return output_dir
+
+
+# -------------------------------------------------------
+# Serving
+# -------------------------------------------------------
+
+class OnnxCrossEncoder:
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = ONNX_QUANTIZE,
+        intra_op_threads: int = ORT_INTRA_OP_THREADS,
+    ):
+        if not ORT_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed")
+
+        from transformers import AutoTokenizer
+
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def score(
+        self,
+        query: str,
+        passages: List[str],
+        batch_size: Optional[int] = None,
+        max_length: int = 512,
+    ) -> List[float]:
+        """
+        Raw logits, in passage order (same contract as score_pairs()).
+        """
+        if not passages:
+            return []
+
+        scores = [0.0] * len(passages)
+        for bucket, batch in iter_buckets(self.tokenizer, query, passages, batch_size, max_length, return_tensors="np"):
+            feeds = {k: v.astype(np.int64) for k, v in batch.items() if k in self.input_names}
+            logits = self.session.run(["logits"], feeds)[0]
+            for i, score in zip(bucket, logits[:, 0].tolist()):
+                scores[i] = float(score)
+
+        return scores
+
+
+# -------------------------------------------------------
+# Parity
+# -------------------------------------------------------
+
+def _ranks(x: np.ndarray) -> np.ndarray:
+    return np.argsort(np.argsort(x)).astype(np.float64)
+
+
+def compare_scores(reference: List[float], candidate: List[float]) -> Dict[str, float]:
+    ref = np.asarray(reference, dtype=np.float64)
+    cand = np.asarray(candidate, dtype=np.float64)
+    return {
+        "pearson": round(float(np.corrcoef(ref, cand)[0, 1]), 6),
+        "spearman": round(float(np.corrcoef(_ranks(ref), _ranks(cand))[0, 1]), 6),
+        "max_abs_diff": round(float(np.max(np.abs(ref - cand))), 6),
+        "top1_agreement": bool(np.argmax(ref) == np.argmax(cand)),
+    }
+
+
+def parity_check(
+    torch_model,
+    tokenizer,
+    onnx_model: OnnxCrossEncoder,
+    query: str = PARITY_QUERY,
+    passages: Optional[List[str]] = None,
+) -> Dict[str, float]:
+    """
+    Score the same pairs with the PyTorch model and the ONNX session.
+    """
+    passages = passages or PARITY_PASSAGES
+    reference = score_pairs(tokenizer, torch_model, query, passages)
+    return compare_scores(reference, onnx_model.score(query, passages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="Hub name or local dir (e.g. models/reranker/versions/<version>)")
+    parser.add_argument("--output", default=None, help="Defaults to ONNX_RERANKER_DIR/<model>")
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    meta = export_onnx(
+        args.model,
+        args.output or onnx_dir_for(args.model),
+        quantize=not args.no_quantize,
+        opset=args.opset,
+    )
+    print(json.dumps(meta, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,64 @@
-from sentence_transformers import CrossEncoder
+import math
+
+from backend.config import RERANKER_MODEL, RERANKER_BACKEND
+from backend.metrics import stage, RERANK_CANDIDATES
+from backend.rag.reranker_versions import ServingModel
 
 
 class CrossEncoderReranker:
     """
     Wrapper around a HuggingFace CrossEncoder for reranking retrieved documents.
 
-    - Lazy-loads the model on first use to avoid heavy startup cost.
+    - The model comes from the process-wide model registry: loaded once,
+      warmed at API startup and shared with the app stack's reranker.
+    - Serves the active version from backend/rag/reranker_versions.py
+      ("base" = the pretrained model); activate() / rollback() swap it in
+      the background without touching in-flight requests.
     - Safely handles the case where there are no documents (returns [] instead of crashing).
+    - backend="onnx" serves the model through ONNX Runtime (int8 by default),
+      exporting it on first load.
+    - Scores keep the CrossEncoder.predict sigmoid scale.
     """
 
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(self, model_name: str = RERANKER_MODEL, backend: str = RERANKER_BACKEND, on_swap=None):
         self.model_name = model_name
-        self.model = None  # will be loaded lazily
+        self.backend = backend
+        self.serving = ServingModel(model_name, backend, on_swap=on_swap)
+
+    @property
+    def version(self) -> str:
+        return self.serving.version
 
     def load(self):
-        if self.model is None:
-            self.model = CrossEncoder(self.model_name)
+        return self.serving.current()
+
+    def activate(self, version: str) -> dict:
+        return self.serving.activate(version)
+
+    def rollback(self) -> dict:
+        return self.serving.rollback()
+
+    def _predict(self, model, query: str, pairs: list) -> list:
+        # CrossEncoder.predict applies a sigmoid to single-logit models
+        logits = model.score(query, [text for _, text in pairs])
+        return [1.0 / (1.0 + math.exp(-x)) for x in logits]
 
     def rerank(self, query: str, documents: list) -> list:
         """
         Rerank a list of documents based on relevance to a query.
 
         Each document is expected to be a dict with at least a "text" field.
-        Returns a new list sorted by descending score.
+        Returns a new list sorted by descending score; every document is
+        tagged with the "reranker_version" that scored it.
         """
 
         # If there are no documents, just return an empty list
         if not documents:
             return []
 
-        # Ensure model is loaded
-        self.load()
+        # One (version, model) pair for the whole request
+        self.serving.sync()
+        version, model = self.load()
 
         # Build pairs [query, document_text] for all documents
         pairs = []
@@ -43,11 +71,14 @@ class CrossEncoderReranker:
             return documents
 
         # Predict relevance scores
-        scores = self.model.predict(pairs)
+        with stage("rerank"):
+            scores = self._predict(model, query, pairs)
+        RERANK_CANDIDATES.inc(len(pairs))
 
         # Attach scores back to documents
         for i, score in enumerate(scores):
             documents[i]["score"] = float(score)
+            documents[i]["reranker_version"] = version
 
         # Sort by score descending (higher is better)
         reranked = sorted(documents, key=lambda x: x["score"], reverse=True)
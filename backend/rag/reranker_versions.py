@@ -0,0 +1,269 @@
+"""
+Versioned reranker artifacts and atomic hot swap.
+
+Layout under RERANKER_DIR:
+
+    versions/<version>/     fine-tuned model files + version.json
+    active.json             {"active": <version>, "history": [<older>, ...]}
+
+- "base" is the pretrained RERANKER_MODEL and always exists
+- ServingModel holds the (version, model) pair requests score with. A
+  swap loads + warms the new version through the model registry in a
+  background thread, then replaces the pair in a single assignment:
+  in-flight requests finish on the model they started with
+- rollback() re-activates the previous version from the history
+- active.json is written atomically; other processes (and the app stack)
+  pick a change up on their next request via sync()
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.config import RERANKER_DIR, RERANKER_MODEL, RERANKER_BACKEND
+from backend.model_registry import cross_encoder_key, get_model_registry, register_cross_encoder
+
+logger = logging.getLogger(__name__)
+
+BASE_VERSION = "base"
+MAX_HISTORY = 10
+
+VERSIONS_DIR = os.path.join(RERANKER_DIR, "versions")
+STATE_PATH = os.path.join(RERANKER_DIR, "active.json")
+
+
+# -------------------------------------------------------
+# Artifacts
+# -------------------------------------------------------
+
+def new_version() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def version_dir(version: str) -> str:
+    return os.path.join(VERSIONS_DIR, version)
+
+
+def version_exists(version: str) -> bool:
+    return version == BASE_VERSION or os.path.exists(os.path.join(version_dir(version), "version.json"))
+
+
+def write_version_meta(version: str, meta: dict):
+    """
+    Written last, after the model files: a version without version.json is
+    an incomplete save and is never served.
+    """
+    path = os.path.join(version_dir(version), "version.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "created_at": time.time(), **meta}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def list_versions() -> List[dict]:
+    versions = [{"version": BASE_VERSION, "source": RERANKER_MODEL}]
+    if os.path.isdir(VERSIONS_DIR):
+        for name in sorted(os.listdir(VERSIONS_DIR)):
+            meta_path = os.path.join(VERSIONS_DIR, name, "version.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    versions.append(json.load(f))
+    return versions
+
+
+def model_source(version: str, base_model: str = RERANKER_MODEL) -> str:
+    return base_model if version == BASE_VERSION else version_dir(version)
+
+
+# -------------------------------------------------------
+# Active pointer
+# -------------------------------------------------------
+
+_state_cache: Tuple[Optional[float], Optional[dict]] = (None, None)
+
+
+def read_state() -> dict:
+    """
+    Current active.json (cached on mtime; cheap enough to call per request).
+    """
+    global _state_cache
+
+    try:
+        mtime = os.path.getmtime(STATE_PATH)
+    except OSError:
+        return {"active": BASE_VERSION, "history": []}
+
+    cached_mtime, cached = _state_cache
+    if cached is not None and cached_mtime == mtime:
+        return cached
+
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    _state_cache = (mtime, state)
+    return state
+
+
+def write_state(active: str, history: List[str]):
+    global _state_cache
+
+    os.makedirs(RERANKER_DIR, exist_ok=True)
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"active": active, "history": history[-MAX_HISTORY:], "updated_at": time.time()}, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+    _state_cache = (None, None)
+
+
+# -------------------------------------------------------
+# Serving
+# -------------------------------------------------------
+
+class ServingModel:
+    """
+    The reranker model requests score with, swappable at runtime.
+
+    current() returns a (version, model) pair; callers score with that
+    pair for the whole request, so a swap never changes a model under them.
+    """
+
+    def __init__(
+        self,
+        base_model: str = RERANKER_MODEL,
+        backend: str = RERANKER_BACKEND,
+        on_swap: Optional[Callable[[str], Any]] = None,
+    ):
+        self.base_model = base_model
+        self.backend = backend
+        self.on_swap = on_swap
+        self._serving: Optional[Tuple[str, Any]] = None
+        self._lock = threading.Lock()
+        self._loaded = set()  # versions this handle loaded into the model registry
+        self._loaded_lock = threading.Lock()
+        self.swap = {"state": "idle", "target": None, "error": None}
+
+    def _key(self, version: str) -> str:
+        return cross_encoder_key(model_source(version, self.base_model), self.backend)
+
+    def _load(self, version: str):
+        key = register_cross_encoder(model_source(version, self.base_model), self.backend)
+        get_model_registry().warm(key)
+        model = get_model_registry().get(key)
+        with self._loaded_lock:
+            self._loaded.add(version)
+        return model
+
+    def register(self) -> str:
+        """
+        Register the active version with the model registry (for startup warm-up).
+        """
+        return register_cross_encoder(model_source(self._wanted(), self.base_model), self.backend)
+
+    def _wanted(self) -> str:
+        version = read_state()["active"]
+        if not version_exists(version):
+            logger.error(f"Active reranker version {version} not found, serving {BASE_VERSION}")
+            return BASE_VERSION
+        return version
+
+    def current(self) -> Tuple[str, Any]:
+        serving = self._serving
+        if serving is None:
+            with self._lock:
+                if self._serving is None:
+                    version = self._wanted()
+                    self._serving = (version, self._load(version))
+                serving = self._serving
+        return serving
+
+    @property
+    def version(self) -> str:
+        return self._serving[0] if self._serving is not None else self._wanted()
+
+    def activate(self, version: str) -> dict:
+        """
+        Load + warm `version` in the background, then switch to it.
+        """
+        return self._start(version, "activate")
+
+    def rollback(self) -> dict:
+        history = read_state()["history"]
+        if not history:
+            raise ValueError("No previous reranker version to roll back to")
+        return self._start(history[-1], "rollback")
+
+    def sync(self):
+        """
+        Follow active.json when another process changed it.
+        """
+        if self._serving is None or self.swap["state"] == "loading":
+            return
+        version = read_state()["active"]
+        if self.swap["state"] == "error" and self.swap["target"] == version:
+            return  # already failed to load; wait for an explicit activate
+        if version != self._serving[0] and version_exists(version):
+            try:
+                self._start(version, "sync")
+            except RuntimeError:
+                pass
+
+    def _start(self, version: str, mode: str) -> dict:
+        if not version_exists(version):
+            raise ValueError(f"Unknown reranker version: {version}")
+
+        with self._lock:
+            if self.swap["state"] == "loading":
+                raise RuntimeError(f"Reranker swap to {self.swap['target']} already in progress")
+            self.swap = {"state": "loading", "target": version, "error": None}
+
+        threading.Thread(
+            target=self._swap_to, args=(version, mode), name="reranker-swap", daemon=True
+        ).start()
+        return self.status()
+
+    def _swap_to(self, version: str, mode: str):
+        try:
+            model = self._load(version)
+        except Exception as e:
+            logger.error(f"Could not load reranker version {version}: {e}")
+            self.swap = {"state": "error", "target": version, "error": str(e)}
+            return
+
+        with self._lock:
+            previous = self._serving[0] if self._serving is not None else read_state()["active"]
+            history = list(read_state()["history"])
+
+            if mode == "activate" and previous != version:
+                history.append(previous)
+            elif mode == "rollback" and history and history[-1] == version:
+                history.pop()
+
+            if mode != "sync":
+                write_state(version, history)
+            self._serving = (version, model)
+            self.swap = {"state": "idle", "target": None, "error": None}
+
+        logger.info(f"Reranker switched {previous} -> {version} ({mode})")
+        self._release(keep={version, history[-1] if history else BASE_VERSION})
+
+        if self.on_swap is not None:
+            self.on_swap(version)
+
+    def _release(self, keep: set):
+        # Keep the active model and the rollback target loaded, free the rest
+        with self._loaded_lock:
+            doomed = self._loaded - keep - {BASE_VERSION}
+            self._loaded -= doomed
+        for version in doomed:
+            get_model_registry().unload(self._key(version))
+
+    def status(self) -> Dict[str, Any]:
+        state = read_state()
+        return {
+            "active": self.version,
+            "history": state["history"],
+            "swap": dict(self.swap),
+        }
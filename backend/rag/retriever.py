@@ -1,40 +1,104 @@
-from backend.vectorstore import collection
+from backend.vectorstore import get_collection, embedding_function
 from backend.rag.bm25 import bm25_search
+from backend.rag.flat_index import get_flat_index
+from backend.rag.filters import MetadataFilter
+from backend.rag.fusion import fuse
+from backend.rag.fanout import run_legs
+from backend.metrics import stage
+from backend.config import (
+    FUSION_METHOD,
+    FUSION_DENSE_WEIGHT,
+    FUSION_SPARSE_WEIGHT,
+    RRF_K,
+    DENSE_LEG_TIMEOUT,
+    SPARSE_LEG_TIMEOUT,
+    DENSE_BACKEND,
+)
 
-def hybrid_retrieve(query: str, top_k: int = 5):
+
+def _flat_dense_search(index, query: str, top_k: int, filters: MetadataFilter = None):
+    query_embedding = embedding_function([query])[0]
+    return [
+        {
+            "id": hit["id"],
+            "text": hit["text"],
+            "score": hit["score"],
+            "source": hit["metadata"].get("source"),
+            "page": hit["metadata"].get("page"),
+            "page_end": hit["metadata"].get("page_end"),
+            "chunk_index": i,
+        }
+        for i, hit in enumerate(index.search(query_embedding, top_k, filters=filters))
+    ]
+
+
+def dense_search(query: str, top_k: int, filters: MetadataFilter = None):
     """
-    Hybrid retrieval combining:
-    - Dense vector search (Chroma)
-    - BM25 keyword search
+    Dense vector search from Chroma, or from the memory-mapped flat index
+    with DENSE_BACKEND=flat (cosine distance, lower = better). `filters`
+    restricts the candidates before ranking (Chroma `where` / row mask).
     """
+    if DENSE_BACKEND == "flat":
+        # Until the first export exists, Chroma still answers
+        index = get_flat_index()
+        if index is not None:
+            with stage("dense_search"):
+                return _flat_dense_search(index, query, top_k, filters)
 
-    # ---- Dense search from Chroma ----
-    dense_results = collection.query(
-        query_texts=[query],
-        n_results=top_k
-    )
+    where = filters.to_chroma_where() if filters is not None else None
+    with stage("dense_search"):
+        dense_results = get_collection().query(
+            query_texts=[query],
+            n_results=top_k,
+            where=where,
+        )
 
     dense_docs = []
     for i in range(len(dense_results["documents"][0])):
         dense_docs.append({
+            "id": dense_results["ids"][0][i],
             "text": dense_results["documents"][0][i],
             "score": float(dense_results["distances"][0][i]),
             "source": dense_results["metadatas"][0][i]["source"],
             "page": dense_results["metadatas"][0][i]["page"],
+            "page_end": dense_results["metadatas"][0][i].get("page_end"),
             "chunk_index": i
         })
+    return dense_docs
+
 
-    # ---- BM25 search ----
-    bm25_docs = bm25_search(query, top_k)
+def hybrid_retrieve_timed(query: str, top_k: int = 5, filters: MetadataFilter = None):
+    """
+    Hybrid retrieval combining:
+    - Dense vector search (Chroma)
+    - BM25 keyword search
+    run concurrently, then fused by rank (or normalized score) and
+    deduplicated by chunk id. `filters` is pushed into both legs.
+
+    Returns (docs, timings); a leg that times out or fails is dropped
+    and reported in timings instead of failing the request.
+    """
+    results, timings = run_legs(
+        {
+            "dense": lambda: dense_search(query, top_k, filters),
+            "sparse": lambda: bm25_search(query, top_k, filters),
+        },
+        timeouts={"dense": DENSE_LEG_TIMEOUT, "sparse": SPARSE_LEG_TIMEOUT},
+    )
 
-    # ---- Combine results ----
-    combined = dense_docs + bm25_docs
+    # ---- Fuse: both lists are best-first, lower score = better ----
+    with stage("fusion"):
+        fused = fuse(
+            [results["dense"], results["sparse"]],
+            method=FUSION_METHOD,
+            weights=[FUSION_DENSE_WEIGHT, FUSION_SPARSE_WEIGHT],
+            higher_is_better=[False, False],
+            rrf_k=RRF_K,
+            limit=top_k,
+        )
 
-    # Lower score = better for dense → convert to a unified ranking
-    for doc in combined:
-        doc["rank_score"] = float(doc["score"])
+    return fused, timings
 
-    # Sort best → worst
-    combined = sorted(combined, key=lambda x: x["rank_score"])
 
-    return combined[:top_k]
+def hybrid_retrieve(query: str, top_k: int = 5, filters: MetadataFilter = None):
+    return hybrid_retrieve_timed(query, top_k, filters)[0]
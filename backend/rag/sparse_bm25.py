@@ -0,0 +1,179 @@
+"""
+Vectorized BM25 scoring over a SciPy CSR term-document matrix.
+
+The matrix stores raw term frequencies with one row per vocabulary
+term (vocab maps term -> row) and one column per document. A query
+selects the rows of its terms, so work scales with the matching
+postings; IDF and length normalisation are applied to those postings
+with NumPy at query time, and top-k uses argpartition instead of a
+full sort.
+
+An index split into segments (app/rag/hybrid_search.py: a base matrix
+plus a small delta of new documents) scores each segment with the
+corpus-wide N / df / avgdl, and hstack() merges segments at compaction.
+
+Shared by backend/rag/bm25.py and app/rag/hybrid_search.py.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+
+    SCIPY_AVAILABLE = True
+
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+
+class SparseBM25:
+    """
+    CSR term-document matrix + vocabulary map.
+    """
+
+    def __init__(self, vocab: Dict[str, int], tf_matrix, doc_lens, k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.tf = tf_matrix
+        self.doc_lens = np.asarray(doc_lens, dtype=np.float32)
+        self.df = np.diff(tf_matrix.indptr)
+        self.k1 = k1
+        self.b = b
+
+        self.num_docs = tf_matrix.shape[1]
+        self.avgdl = float(self.doc_lens.mean(dtype=np.float64)) if self.num_docs else 0.0
+
+    @classmethod
+    def from_postings(
+        cls,
+        postings: Dict[str, Iterable[Tuple[int, int]]],
+        doc_lens: List[int],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> "SparseBM25":
+        """
+        Build from term -> [(doc_idx, tf), ...] postings.
+        """
+        vocab = {}
+        indptr = [0]
+        indices = []
+        data = []
+
+        for term, plist in postings.items():
+            vocab[term] = len(vocab)
+            for doc_idx, tf in plist:
+                indices.append(doc_idx)
+                data.append(tf)
+            indptr.append(len(indices))
+
+        tf_matrix = sparse.csr_matrix(
+            (
+                np.asarray(data, dtype=np.float32),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(vocab), len(doc_lens)),
+        )
+        tf_matrix.sort_indices()
+
+        return cls(vocab, tf_matrix, doc_lens, k1=k1, b=b)
+
+    @classmethod
+    def hstack(cls, parts: List[Tuple["SparseBM25", Optional["np.ndarray"]]]) -> "SparseBM25":
+        """
+        One matrix with the columns of each (engine, keep) part in order;
+        `keep` (bool per column, or None for all) drops columns. Terms
+        left without postings are dropped from the vocabulary.
+        """
+        vocab: Dict[str, int] = {}
+        blocks = []
+        doc_lens = []
+
+        for engine, keep in parts:
+            tf = engine.tf if keep is None else engine.tf[:, np.flatnonzero(keep)]
+            # engine.vocab is in row order
+            row_map = np.fromiter(
+                (vocab.setdefault(t, len(vocab)) for t in engine.vocab), dtype=np.int64, count=len(engine.vocab)
+            )
+            coo = tf.tocoo()
+            blocks.append((coo.data, row_map[coo.row], coo.col, tf.shape[1]))
+            doc_lens.append(engine.doc_lens if keep is None else engine.doc_lens[keep])
+
+        tf = sparse.hstack(
+            [sparse.coo_matrix((data, (rows, cols)), shape=(len(vocab), n)) for data, rows, cols, n in blocks],
+            format="csr",
+        )
+        nonempty = np.flatnonzero(np.diff(tf.indptr))
+        terms = list(vocab)
+        tf = tf[nonempty]
+        tf.sort_indices()
+
+        first = parts[0][0]
+        return cls(
+            {terms[r]: i for i, r in enumerate(nonempty.tolist())},
+            tf,
+            np.concatenate(doc_lens),
+            k1=first.k1,
+            b=first.b,
+        )
+
+    def scores(
+        self,
+        tokens: List[str],
+        allowed: Optional["np.ndarray"] = None,
+        corpus: Optional[Tuple[int, Dict[str, int], float]] = None,
+    ):
+        """
+        Score every document that contains at least one query term.
+        `allowed` (bool per document) restricts scoring to those documents.
+        `corpus` = (num_docs, df, avgdl) overrides this matrix's own
+        statistics when it is one segment of a larger index.
+        Returns (doc_indices, scores) as NumPy arrays.
+        """
+        counts = Counter(t for t in tokens if t in self.vocab)
+        if not counts or not self.num_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows = np.fromiter((self.vocab[t] for t in counts), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+
+        if corpus is None:
+            num_docs, df, avgdl = self.num_docs, self.df[rows], self.avgdl
+        else:
+            num_docs, corpus_df, avgdl = corpus
+            df = np.fromiter((corpus_df.get(t, 0) for t in counts), dtype=np.float64, count=len(counts))
+
+        # Sparse query vector times matrix: only the query rows are touched
+        sub = self.tf[rows]
+        idf = np.log(1 + (num_docs - df + 0.5) / (df + 0.5)) * weights
+
+        tf = sub.data
+        indices = sub.indices
+        row_idf = np.repeat(idf, np.diff(sub.indptr))
+
+        if allowed is not None:
+            # Candidate allowlist: drop the other postings before any scoring
+            keep = allowed[indices]
+            tf, indices, row_idf = tf[keep], indices[keep], row_idf[keep]
+
+        dl = self.doc_lens[indices]
+        contrib = row_idf * (tf * (self.k1 + 1)) / (
+            tf + self.k1 * (1 - self.b + self.b * (dl / avgdl))
+        )
+
+        docs, inverse = np.unique(indices, return_inverse=True)
+        return docs, np.bincount(inverse, weights=contrib)
+
+    def top_k(self, tokens: List[str], k: int, allowed: Optional["np.ndarray"] = None, corpus=None):
+        """
+        Best k documents, sorted by descending score.
+        """
+        docs, scores = self.scores(tokens, allowed, corpus)
+
+        if k < len(scores):
+            part = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[part], scores[part]
+
+        order = np.argsort(-scores, kind="stable")
+        return docs[order], scores[order]
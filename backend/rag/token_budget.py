@@ -0,0 +1,189 @@
+"""
+Token-accurate context budgeting for the LLM prompt.
+
+- TokenCounter: the model's tiktoken encoding (o200k / cl100k), falling
+  back to a ~4 characters per token estimate when tiktoken is missing.
+  Per-chunk counts are cached (LRU) by content hash, so a chunk is
+  encoded once per process and a re-ingested chunk whose text changed
+  under the same id is counted again
+- pack(): takes chunks in rank order until the budget is spent; the first
+  chunk that does not fit is cut at its last sentence boundary that fits
+  (dropped if that leaves too little), everything after it is dropped
+- context_budget(): tokens available for context = min(CONTEXT_MAX_TOKENS,
+  model context window - ANSWER_RESERVE_TOKENS - prompt overhead)
+- count_messages(): exact prompt size of a chat request, for reporting
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend.config import CONTEXT_MAX_TOKENS, ANSWER_RESERVE_TOKENS, TOKEN_COUNT_CACHE_SIZE
+
+try:
+    import tiktoken
+
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+
+# Context windows (tokens) of the chat models used in this repo
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Chat format overhead (OpenAI cookbook): per message, plus reply priming
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# A truncated last chunk shorter than this is not worth sending
+MIN_TRUNCATED_TOKENS = 32
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s)|\n\s*\n")
+
+
+class _CharEstimate:
+    """
+    tiktoken stand-in: 4-character pieces, so counts and truncation keep
+    the same shape (~1 token per 4 characters of English).
+    """
+
+    def encode(self, text: str) -> List[str]:
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    if not TIKTOKEN_AVAILABLE:
+        return _CharEstimate()
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def context_window(model: str) -> int:
+    # Longest matching prefix, so dated snapshots (gpt-4o-2024-08-06) resolve
+    for name in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_CONTEXT_WINDOWS[name]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def context_budget(model: str, overhead_tokens: int = 0, max_tokens: int = CONTEXT_MAX_TOKENS) -> int:
+    available = context_window(model) - ANSWER_RESERVE_TOKENS - overhead_tokens
+    return max(0, min(max_tokens, available))
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TokenCounter:
+    def __init__(self, model: str, cache_size: int = TOKEN_COUNT_CACHE_SIZE):
+        self.model = model
+        self.encoding = get_encoding(model)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str, key: Optional[str] = None) -> int:
+        """
+        Token count of `text`, cached under its content hash (`key`:
+        text_key(text), if the caller already has it; never a chunk id).
+        """
+        key = key or text_key(text)
+        with self._lock:
+            n = self._cache.get(key)
+            if n is not None:
+                self._cache.move_to_end(key)
+                return n
+
+        n = len(self.encoding.encode(text))
+
+        with self._lock:
+            self._cache[key] = n
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return n
+
+    def count_messages(self, messages: List[dict]) -> int:
+        total = TOKENS_PER_REPLY
+        for message in messages:
+            total += TOKENS_PER_MESSAGE + len(self.encoding.encode(message["content"]))
+        return total
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Longest prefix of `text` within `max_tokens` that ends on a sentence
+        boundary ("" if there is none).
+        """
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+
+        prefix = self.encoding.decode(tokens[:max_tokens])
+        ends = [m.end() for m in _SENTENCE_END.finditer(prefix)]
+        return prefix[:ends[-1]].rstrip() if ends else ""
+
+    def pack(
+        self,
+        texts: List[str],
+        budget: int,
+        keys: Optional[List[Optional[str]]] = None,
+        overheads: Optional[List[int]] = None,
+    ) -> Tuple[List[Tuple[int, str]], int]:
+        """
+        Chunks to send, in rank order, as (index into texts, text) pairs,
+        plus the tokens they use. `keys` are the texts' content hashes if
+        already known (see count()). `overheads` are per-chunk formatting
+        tokens (source labels, separators) counted against the budget.
+        """
+        packed: List[Tuple[int, str]] = []
+        used = 0
+
+        for i, text in enumerate(texts):
+            overhead = overheads[i] if overheads else 0
+            n = self.count(text, keys[i] if keys else None) + overhead
+
+            if used + n <= budget:
+                packed.append((i, text))
+                used += n
+                continue
+
+            # Does not fit: keep whole sentences of it if that is worth it
+            room = budget - used - overhead
+            if room >= MIN_TRUNCATED_TOKENS:
+                cut = self.truncate(text, room)
+                if cut:
+                    packed.append((i, cut))
+                    used += len(self.encoding.encode(cut)) + overhead
+            break
+
+        return packed, used
+
+
+_COUNTERS: Dict[str, TokenCounter] = {}
+_COUNTERS_LOCK = threading.Lock()
+
+
+def get_token_counter(model: str) -> TokenCounter:
+    """
+    One counter (and chunk-count cache) per model, shared by both stacks.
+    """
+    with _COUNTERS_LOCK:
+        if model not in _COUNTERS:
+            _COUNTERS[model] = TokenCounter(model)
+        return _COUNTERS[model]
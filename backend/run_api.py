@@ -1,9 +1,27 @@
+import logging
+
 import uvicorn
 
+from backend.config import API_WORKERS, DENSE_BACKEND
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "backend.api:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    )
+    if API_WORKERS > 1:
+        # Production: build the shared read-only indexes once, then start
+        # the workers; each maps them instead of loading its own copy
+        from backend.vectorstore import prepare_shared_indexes
+
+        logging.basicConfig(level=logging.INFO)
+        prepare_shared_indexes()
+        if DENSE_BACKEND != "flat":
+            logging.getLogger(__name__).warning(
+                "API_WORKERS > 1 with DENSE_BACKEND=chroma: every worker loads its own HNSW index; "
+                "DENSE_BACKEND=flat shares one memory-mapped copy"
+            )
+        uvicorn.run("backend.api:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
+    else:
+        uvicorn.run(
+            "backend.api:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True
+        )
@@ -1,12 +1,18 @@
 from sentence_transformers import CrossEncoder
 import os
-from backend.config import RERANKER_DIR
+from backend.config import RERANKER_DIR, RERANKER_MODEL
+from backend.rag.reranker_versions import new_version, version_dir, write_version_meta
 
 os.makedirs(RERANKER_DIR, exist_ok=True)
 
 
 def train_crossencoder(samples, epochs, batch_size):
-    model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+    """
+    Fine-tune the base cross-encoder and save it as a new version under
+    RERANKER_DIR/versions/. Returns (version, save_path); serving it is
+    a separate activate step.
+    """
+    model = CrossEncoder(RERANKER_MODEL)
 
     train_data = [
         ([s.query, pos], 1)
@@ -20,7 +26,15 @@ def train_crossencoder(samples, epochs, batch_size):
 
     model.fit(train_data, epochs=epochs, batch_size=batch_size)
 
-    save_path = os.path.join(RERANKER_DIR, "latest")
+    version = new_version()
+    save_path = version_dir(version)
     model.save(save_path)
+    write_version_meta(version, {
+        "base": RERANKER_MODEL,
+        "samples": len(samples),
+        "pairs": len(train_data),
+        "epochs": epochs,
+        "batch_size": batch_size,
+    })
 
-    return save_path
+    return version, save_path
@@ -1,46 +1,279 @@
 import os
 import shutil
+import time
 import chromadb
 from chromadb.config import Settings
-from backend.config import VECTOR_DB_DIR, DATA_DIR
-from backend.rag.chunking import chunk_pdf
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils import embedding_functions
+from backend.config import (
+    VECTOR_DB_DIR, DATA_DIR, MANIFEST_PATH,
+    INDEX_BATCH_SIZE, INDEX_BATCH_MAX_CHARS, INGEST_WORKERS,
+    DENSE_BACKEND,
+)
+from backend.rag.chunking import chunker_version, iter_pdf_chunks
+from backend.manifest import IngestManifest, file_sha256
+from backend.embedding_cache import get_embedding_cache
+from backend.rag.bm25 import build_index, load_index
+from backend.rag.flat_index import build_flat_index, get_flat_index
+from backend.jobs import disallow_cancel, report_progress
+from backend.workers import get_index_generation
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function backed by the shared embedding cache.
+    Only texts that were never embedded by this model hit the model.
+    """
+
+    def __init__(self, inner=None, model_name: str = "all-MiniLM-L6-v2"):
+        self.inner = inner or embedding_functions.DefaultEmbeddingFunction()
+        self.model_name = model_name
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return get_embedding_cache().embed(self.model_name, input, self.inner)
+
+
+embedding_function = CachedEmbeddingFunction()
+
 
 # Create Chroma client using NEW API (post–2024)
 client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
 
 collection = client.get_or_create_collection(
     name="rag_docs",
-    metadata={"hnsw:space": "cosine"}
+    metadata={"hnsw:space": "cosine"},
+    embedding_function=embedding_function,
 )
 
+
+def get_collection():
+    """
+    Current collection. rebuild_index() replaces the module global,
+    so callers should not hold on to an imported reference.
+    """
+    return collection
+
+
+def reopen_collection():
+    """
+    Reopen the client after another process (a background job) wrote to
+    or rebuilt VECTOR_DB_DIR; Chroma caches its system per path.
+    """
+    global client, collection
+    client.clear_system_cache()
+    client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
+    collection = client.get_or_create_collection(
+        name="rag_docs",
+        metadata={"hnsw:space": "cosine"},
+        embedding_function=embedding_function,
+    )
+    return collection
+
+
+class BatchWriter:
+    """
+    Accumulates chunks and writes them with one upsert per batch.
+
+    A batch is flushed once it holds `max_chunks` chunks or
+    `max_chars` characters of text, so Chroma embeds each batch with
+    a single embedding call and a single write transaction.
+    """
+
+    def __init__(self, target, max_chunks: int = INDEX_BATCH_SIZE, max_chars: int = INDEX_BATCH_MAX_CHARS):
+        self.target = target
+        self.max_chunks = max_chunks
+        self.max_chars = max_chars
+
+        self._ids, self._docs, self._metas = [], [], []
+        self._chars = 0
+
+        self.chunk_count = 0
+        self.batch_count = 0
+        self.progress = []
+        self._start = time.perf_counter()
+
+    def add(self, chunk: dict):
+        self._ids.append(chunk["id"])
+        self._docs.append(chunk["text"])
+        self._metas.append({
+            "source": chunk["source"],
+            "page": chunk["page"],
+            "page_end": chunk["page_end"],
+            "char_start": chunk["char_start"],
+            "char_end": chunk["char_end"],
+            "doc_date": chunk["doc_date"],
+        })
+        self._chars += len(chunk["text"])
+
+        if len(self._ids) >= self.max_chunks or self._chars >= self.max_chars:
+            self.flush()
+
+    def flush(self):
+        if not self._ids:
+            return
+
+        self.target.upsert(ids=self._ids, documents=self._docs, metadatas=self._metas)
+
+        self.chunk_count += len(self._ids)
+        self.batch_count += 1
+        elapsed = time.perf_counter() - self._start
+        self.progress.append({
+            "batch": self.batch_count,
+            "batch_chunks": len(self._ids),
+            "indexed_chunks": self.chunk_count,
+            "elapsed_sec": round(elapsed, 3),
+        })
+        report_progress(**self.progress[-1])
+
+        self._ids, self._docs, self._metas = [], [], []
+        self._chars = 0
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self._start
+        return {
+            "indexed_chunks": self.chunk_count,
+            "batches": self.batch_count,
+            "elapsed_sec": round(elapsed, 3),
+            "chunks_per_sec": round(self.chunk_count / elapsed, 1) if elapsed > 0 else 0.0,
+            "progress": self.progress,
+        }
+
+
 def list_documents():
     return [f for f in os.listdir(DATA_DIR) if f.endswith(".pdf")]
 
 
-def delete_document(filename: str):
+def delete_chunks(ids, batch_size: int = INDEX_BATCH_SIZE):
+    """
+    Delete chunks by id, one Chroma call per batch.
+    """
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+
+
+def remove_document(filename: str):
     path = os.path.join(DATA_DIR, filename)
     if os.path.exists(path):
         os.remove(path)
 
 
-def rebuild_index():
-    # Reset database
-    shutil.rmtree(VECTOR_DB_DIR, ignore_errors=True)
-    os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+def delete_document(filename: str) -> dict:
+    """
+    Remove a PDF and drop its chunks so they stop showing up in search
+    results. Rebuilds the indexes, so the API runs it as an "index" job.
+    """
+    remove_document(filename)
 
-    global client, collection
-    client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
-    collection = client.get_or_create_collection("rag_docs")
+    path = os.path.join(DATA_DIR, filename)
+    manifest = IngestManifest.load(MANIFEST_PATH)
+    stale_ids = manifest.chunk_ids([path])
+    if stale_ids:
+        delete_chunks(stale_ids)
+        manifest.forget(path)
+        manifest.save()
+        refresh_indexes()
+    return {"filename": filename, "deleted_chunks": len(stale_ids)}
 
-    chunk_count = 0
-    for pdf in list_documents():
-        chunks = chunk_pdf(os.path.join(DATA_DIR, pdf))
-        for chunk in chunks:
-            collection.add(
-                ids=[chunk["id"]],
-                documents=[chunk["text"]],
-                metadatas=[{"source": chunk["source"], "page": chunk["page"]}]
+
+def refresh_bm25_index():
+    """
+    Rebuild the persisted BM25 inverted index from the current collection.
+    """
+    all_docs = collection.get()
+    build_index(all_docs["documents"], all_docs["metadatas"], all_docs["ids"])
+
+
+def refresh_flat_index(batch_size: int = INDEX_BATCH_SIZE * 4):
+    """
+    Export the collection's stored embeddings into a new generation of
+    the memory-mapped flat index (DENSE_BACKEND=flat), page by page.
+    """
+    count = collection.count()
+
+    def batches():
+        for offset in range(0, count, batch_size):
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset
             )
-            chunk_count += 1
+            yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+
+    return build_flat_index(batches(), count)
+
+
+def refresh_indexes():
+    """
+    Rebuild the indexes derived from the collection after it changed,
+    then bump the index generation so every API worker reopens them.
+    """
+    refresh_bm25_index()
+    if DENSE_BACKEND == "flat":
+        refresh_flat_index()
+    get_index_generation().bump()
+
+
+def prepare_shared_indexes():
+    """
+    Build the read-only indexes workers map (BM25 export, flat index) if
+    they do not exist yet. Called once by the launcher before it starts
+    API_WORKERS processes, so they don't all build them at startup.
+    """
+    if not load_index().docs:
+        refresh_bm25_index()
+    if DENSE_BACKEND == "flat" and get_flat_index() is None:
+        refresh_flat_index()
+
+
+def rebuild_index(
+    batch_size: int = INDEX_BATCH_SIZE,
+    batch_max_chars: int = INDEX_BATCH_MAX_CHARS,
+    workers: int = INGEST_WORKERS,
+):
+    """
+    Rebuild the collection from every PDF in DATA_DIR.
+
+    PDF pages are extracted in a process pool; this process chunks them
+    and is the single writer that batches chunks into the collection.
+    The new collection is built in a staging directory and only swapped
+    in once complete, so cancelling the job while it builds leaves the
+    live collection and manifest as they were. The swap and the index
+    refresh after it cannot be cancelled (jobs.disallow_cancel).
+    Returns indexing stats (chunk count, batches, throughput, per-batch progress).
+    """
+    staging_dir = VECTOR_DB_DIR.rstrip(os.sep) + ".staging"
+    old_dir = VECTOR_DB_DIR.rstrip(os.sep) + ".old"
+    # Left over by a cancelled rebuild
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    staging_client = chromadb.PersistentClient(path=staging_dir)
+    staging = staging_client.get_or_create_collection(
+        name="rag_docs",
+        metadata={"hnsw:space": "cosine"},
+        embedding_function=embedding_function,
+    )
+
+    manifest = IngestManifest(MANIFEST_PATH)
+    writer = BatchWriter(staging, max_chunks=batch_size, max_chars=batch_max_chars)
+    paths = [os.path.join(DATA_DIR, pdf) for pdf in list_documents()]
+    for path, chunks in iter_pdf_chunks(paths, workers=workers):
+        ids = []
+        for chunk in chunks:
+            writer.add(chunk)
+            ids.append(chunk["id"])
+        manifest.record(path, file_sha256(path), ids, chunker_version())
+    writer.flush()
+
+    # Commit: swap the staged collection in, then the manifest and indexes
+    disallow_cancel()
+    staging_client.clear_system_cache()  # Chroma's per-path cache: drops the live system too
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(VECTOR_DB_DIR):
+        os.rename(VECTOR_DB_DIR, old_dir)
+    os.rename(staging_dir, VECTOR_DB_DIR)
+    manifest.save()
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    reopen_collection()
+    refresh_indexes()
 
-    return chunk_count
+    return writer.summary()
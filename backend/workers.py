@@ -0,0 +1,119 @@
+"""
+Coordination between API worker processes (API_WORKERS > 1).
+
+- InterProcessLock: an advisory file lock (flock), released by the OS if
+  the holder dies. Used to serialize generation bumps and to elect the one
+  worker that dispatches background jobs
+- IndexGeneration: a counter file bumped after every index rebuild. Each
+  worker polls it per request and reopens its indexes (BM25, Chroma) and
+  drops its caches when it moved, so every worker answers from the same
+  generation shortly after an ingest in any one of them
+
+On platforms without fcntl the lock is a no-op (single-worker only).
+"""
+
+import os
+import threading
+from typing import Dict
+
+from backend.config import INDEX_GENERATION_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class InterProcessLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if self._fd is not None:
+            return True
+        self._open()
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                os.close(self._fd)
+                self._fd = None
+                return False
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class IndexGeneration:
+    def __init__(self, path: str = INDEX_GENERATION_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._seen = self.read()
+
+    def read(self) -> int:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump(self) -> int:
+        """
+        Announce a rebuilt index to every worker. This process already
+        serves the new indexes, so it does not see its own bump as a change.
+        """
+        with self._lock, InterProcessLock(self.path + ".lock"):
+            value = self.read() + 1
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(value))
+            os.replace(tmp_path, self.path)
+            self._seen = value
+        return value
+
+    def changed(self) -> bool:
+        """
+        True once per generation this process has not seen yet.
+        """
+        value = self.read()
+        with self._lock:
+            if value == self._seen:
+                return False
+            self._seen = value
+            return True
+
+
+_GENERATIONS: Dict[str, IndexGeneration] = {}
+_GENERATIONS_LOCK = threading.Lock()
+
+
+def get_index_generation(path: str = INDEX_GENERATION_PATH) -> IndexGeneration:
+    """
+    The process-wide counter for `path` (one per stack).
+    """
+    with _GENERATIONS_LOCK:
+        if path not in _GENERATIONS:
+            _GENERATIONS[path] = IndexGeneration(path)
+        return _GENERATIONS[path]
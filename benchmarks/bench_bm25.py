@@ -0,0 +1,106 @@
+"""
+BM25 engine benchmark: dict-based postings vs. the CSR matrix engine.
+
+Compares, on a synthetic Zipf-distributed corpus:
+- backend BM25Index with dict postings
+- backend BM25Index with the CSR engine (backend/rag/sparse_bm25.py)
+- app IncrementalBM25 with dict postings
+- app IncrementalBM25 with the CSR engine
+
+Usage:
+    python -m benchmarks.bench_bm25 --sizes 10000,100000,1000000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backend.rag.bm25 import BM25Index
+from app.rag.hybrid_search import IncrementalBM25
+
+
+def synthetic_corpus(num_docs: int, doc_len: int, vocab_size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ids = (rng.zipf(1.2, size=(num_docs, doc_len)) - 1) % vocab_size
+    return [" ".join(f"t{i}" for i in row) for row in ids]
+
+
+def synthetic_queries(num_queries: int, query_len: int, vocab_size: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    ids = (rng.zipf(1.2, size=(num_queries, query_len)) - 1) % vocab_size
+    return [" ".join(f"t{i}" for i in row) for row in ids]
+
+
+def time_queries(search, queries, k):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        search(q, k)
+        latencies.append(time.perf_counter() - start)
+
+    lat = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "qps": round(len(queries) / float(sum(latencies)), 1),
+    }
+
+
+def bench_size(num_docs: int, args):
+    docs = synthetic_corpus(num_docs, args.doc_len, args.vocab_size)
+    queries = synthetic_queries(args.queries, args.query_len, args.vocab_size)
+    metas = [{"source": "synthetic.pdf", "page": i} for i in range(num_docs)]
+
+    results = {"num_docs": num_docs}
+
+    start = time.perf_counter()
+    backend = BM25Index.build(docs, metas)
+    results["backend_build_s"] = round(time.perf_counter() - start, 2)
+
+    backend.use_matrix = False
+    results["backend_dict"] = time_queries(backend.search, queries, args.k)
+
+    backend.use_matrix = True
+    start = time.perf_counter()
+    backend.prepare()
+    results["backend_matrix_build_s"] = round(time.perf_counter() - start, 2)
+    results["backend_matrix"] = time_queries(backend.search, queries, args.k)
+
+    app_index = IncrementalBM25(use_matrix=False)
+    for i, text in enumerate(docs):
+        app_index.add(str(i), text)
+    results["app_dict"] = time_queries(app_index.search, queries, args.k)
+
+    app_index.use_matrix = True
+    app_index.search(queries[0], args.k)  # build the CSR snapshot
+    results["app_matrix"] = time_queries(app_index.search, queries, args.k)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--doc-len", type=int, default=80)
+    parser.add_argument("--vocab-size", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-len", type=int, default=4)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    all_results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        res = bench_size(size, args)
+        all_results.append(res)
+        print(json.dumps(res))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(all_results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+App chunker benchmark: the original string-based semantic_adaptive_chunk
+vs. the offset-based one in app/rag/chunking.py.
+
+For each synthetic page both versions run on the same sentences; the
+benchmark fails if any chunk differs, then reports pages/s for each:
+once with a single setting per page, once re-chunking every page with
+all settings (where the tokenized-page cache pays off).
+Pages mix short sentences, long ones (hard split) and irregular
+whitespace, and are chunked with a few (max, min, overlap) settings.
+
+Usage:
+    python -m benchmarks.bench_chunking --pages 200 --page-words 600
+    python -m benchmarks.bench_chunking --sentences regex   # without punkt data
+"""
+
+import argparse
+import json
+import re
+import time
+from typing import List
+
+import numpy as np
+
+from app.rag.chunking import _tokenize_page, semantic_adaptive_chunk, split_into_sentences
+
+
+SETTINGS = [(350, 80, 40), (120, 30, 20), (60, 40, 0), (40, 10, 15)]
+
+_REGEX_SENTENCE = re.compile(r"[^.!?]+[.!?]*")
+
+
+def regex_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _REGEX_SENTENCE.findall(text) if s.strip()]
+
+
+def legacy_chunk(text, max_tokens=350, min_tokens=80, overlap_tokens=40, tokenizer=None, splitter=None):
+    """
+    The chunker as it was before offsets (kept verbatim as the reference).
+    """
+    if tokenizer is None:
+        tokenizer = lambda s: len(s.split())
+
+    sentences = (splitter or split_into_sentences)(text)
+
+    chunks = []
+    current_chunk = []
+    current_len = 0
+
+    for sentence in sentences:
+        sent_len = tokenizer(sentence)
+
+        if sent_len > max_tokens:
+            words = sentence.split()
+            temp = []
+            count = 0
+
+            for w in words:
+                if count + 1 > max_tokens:
+                    chunks.append(" ".join(temp))
+                    temp = []
+                    count = 0
+                temp.append(w)
+                count += 1
+
+            if temp:
+                chunks.append(" ".join(temp))
+
+            continue
+
+        if current_len + sent_len > max_tokens:
+            chunks.append(" ".join(current_chunk).strip())
+            current_chunk = [sentence]
+            current_len = sent_len
+        else:
+            current_chunk.append(sentence)
+            current_len += sent_len
+
+    if current_chunk:
+        chunks.append(" ".join(current_chunk).strip())
+
+    merged = []
+    for c in chunks:
+        if not merged:
+            merged.append(c)
+            continue
+
+        if len(merged[-1].split()) < min_tokens:
+            merged[-1] = merged[-1] + " " + c
+        else:
+            merged.append(c)
+
+    final_chunks = []
+    for idx, c in enumerate(merged):
+        if idx == 0:
+            final_chunks.append(c)
+            continue
+
+        prev_words = merged[idx - 1].split()
+        overlap = " ".join(prev_words[-overlap_tokens:])
+        final_chunks.append(f"{overlap} {c}".strip())
+
+    return final_chunks
+
+
+def synthetic_pages(num_pages: int, page_words: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    separators = [" ", " ", " ", "  ", "\n", " \t", "\n\n"]
+    pages = []
+    for _ in range(num_pages):
+        parts = []
+        words = 0
+        while words < page_words:
+            # Mostly 5-30 word sentences, now and then a 400-word run-on
+            n = int(rng.integers(400, 450)) if rng.random() < 0.02 else int(rng.integers(5, 30))
+            for i in range(n):
+                parts.append(f"w{int(rng.zipf(1.3)) % 5000}")
+                parts.append(separators[int(rng.integers(len(separators)))])
+            parts[-1] = ". " if rng.random() < 0.9 else "? \n"
+            words += n
+        pages.append("".join(parts))
+    return pages
+
+
+def time_chunker(fn, pages, settings):
+    start = time.perf_counter()
+    for text in pages:
+        for max_tokens, min_tokens, overlap in settings:
+            fn(text, max_tokens, min_tokens, overlap)
+    elapsed = time.perf_counter() - start
+    return {"s": round(elapsed, 3), "pages_per_s": round(len(pages) * len(settings) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-words", type=int, default=600)
+    parser.add_argument("--sentences", choices=["punkt", "regex"], default="punkt")
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    splitter = regex_sentences if args.sentences == "regex" else split_into_sentences
+    pages = synthetic_pages(args.pages, args.page_words)
+
+    legacy = lambda text, *a: legacy_chunk(text, *a, splitter=splitter)
+    current = lambda text, *a: semantic_adaptive_chunk(text, *a, sentence_splitter=splitter)
+
+    mismatches = 0
+    for text in pages:
+        for setting in SETTINGS:
+            if legacy(text, *setting) != current(text, *setting):
+                mismatches += 1
+    if mismatches:
+        raise SystemExit(f"{mismatches} page/setting pairs differ from the legacy chunker")
+
+    results = {
+        "pages": args.pages,
+        "page_words": args.page_words,
+        "sentences": args.sentences,
+        "identical": True,
+    }
+    for name, settings in (("one_setting", SETTINGS[:1]), ("all_settings", SETTINGS)):
+        # Cold page cache: the first setting pays for tokenizing each page
+        _tokenize_page.cache_clear()
+        legacy_t = time_chunker(legacy, pages, settings)
+        offsets_t = time_chunker(current, pages, settings)
+        results[name] = {"legacy": legacy_t, "offsets": offsets_t, "speedup": round(legacy_t["s"] / offsets_t["s"], 2)}
+    print(json.dumps(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
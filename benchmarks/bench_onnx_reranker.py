@@ -0,0 +1,79 @@
+"""
+Cross-encoder backend benchmark: PyTorch vs. ONNX Runtime fp32 / int8.
+
+For each backend reports throughput (pairs/sec) per ORT intra-op thread
+count, and parity against the PyTorch scores (Pearson / Spearman, max
+abs diff, top-1 agreement) on the same synthetic candidates.
+
+Usage:
+    python -m benchmarks.bench_onnx_reranker --model models/reranker/versions/<version> --threads 1,2,4
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from backend.rag.cross_encoder import score_pairs
+from backend.rag.onnx_reranker import INT8_FILE, OnnxCrossEncoder, compare_scores, export_onnx
+from benchmarks.bench_reranker import pairs_per_sec, synthetic_passages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--onnx-dir", default=None, help="Existing export; exported to a temp dir if omitted")
+    parser.add_argument("--candidates", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--min-words", type=int, default=20)
+    parser.add_argument("--max-words", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    onnx_dir = args.onnx_dir
+    if onnx_dir is None or not os.path.exists(os.path.join(onnx_dir, INT8_FILE)):
+        onnx_dir = onnx_dir or tempfile.mkdtemp(prefix="onnx-reranker-")
+        export_onnx(args.model, onnx_dir, quantize=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model).eval()
+
+    query = "What are the customer data encryption procedures?"
+    passages = synthetic_passages(args.candidates, args.min_words, args.max_words)
+    n = len(passages)
+
+    def torch_scores():
+        return score_pairs(tokenizer, model, query, passages, batch_size=args.batch_size, max_length=args.max_length)
+
+    reference = torch_scores()
+    results = {
+        "model": args.model,
+        "onnx_dir": onnx_dir,
+        "candidates": n,
+        "batch_size": args.batch_size,
+        "torch": {"torch_threads": torch.get_num_threads(), "pairs_per_sec": pairs_per_sec(torch_scores, n, args.repeats)},
+        "onnx": {},
+    }
+
+    for variant, quantized in (("fp32", False), ("int8", True)):
+        results["onnx"][variant] = {"throughput": {}}
+        for threads in (int(t) for t in args.threads.split(",")):
+            encoder = OnnxCrossEncoder(onnx_dir, quantized=quantized, intra_op_threads=threads)
+            results["onnx"][variant]["throughput"][threads] = pairs_per_sec(
+                lambda: encoder.score(query, passages, batch_size=args.batch_size, max_length=args.max_length),
+                n, args.repeats,
+            )
+        results["onnx"][variant]["parity"] = compare_scores(
+            reference, encoder.score(query, passages, batch_size=args.batch_size, max_length=args.max_length)
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
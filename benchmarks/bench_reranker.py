@@ -0,0 +1,103 @@
+"""
+Cross-encoder throughput benchmark (pairs/sec).
+
+Compares the legacy one-forward-pass-per-pair loop (optionally padded
+to max_length, as app/models/reranker.py used to do) with the batched,
+length-sorted scorer in backend/rag/cross_encoder.py.
+
+Usage:
+    python -m benchmarks.bench_reranker --candidates 40 --batch-sizes 8,16,32
+"""
+
+import argparse
+import json
+import random
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from backend.rag.cross_encoder import score_pairs
+
+
+WORDS = (
+    "policy customer data encryption access control retention audit risk "
+    "capital liquidity report quarterly review compliance procedure transfer"
+).split()
+
+
+def synthetic_passages(n: int, min_words: int, max_words: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+        for _ in range(n)
+    ]
+
+
+def legacy_loop(tokenizer, model, query, passages, max_length, pad_to_max):
+    scores = []
+    for p in passages:
+        inputs = tokenizer(
+            query,
+            p,
+            truncation=True,
+            padding="max_length" if pad_to_max else False,
+            max_length=max_length,
+            return_tensors="pt",
+        )
+        with torch.no_grad():
+            scores.append(float(model(**inputs).logits[0, 0]))
+    return scores
+
+
+def pairs_per_sec(fn, num_pairs: int, repeats: int):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return round(num_pairs * repeats / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--candidates", type=int, default=40)
+    parser.add_argument("--batch-sizes", default="4,8,16,32")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--min-words", type=int, default=20)
+    parser.add_argument("--max-words", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model).eval()
+
+    query = "What are the customer data encryption procedures?"
+    passages = synthetic_passages(args.candidates, args.min_words, args.max_words)
+    n = len(passages)
+
+    results = {
+        "model": args.model,
+        "candidates": n,
+        "legacy_loop": pairs_per_sec(
+            lambda: legacy_loop(tokenizer, model, query, passages, args.max_length, False),
+            n, args.repeats,
+        ),
+        "legacy_loop_pad_to_max": pairs_per_sec(
+            lambda: legacy_loop(tokenizer, model, query, passages, args.max_length, True),
+            n, args.repeats,
+        ),
+        "batched": {},
+    }
+
+    for bs in (int(x) for x in args.batch_sizes.split(",")):
+        results["batched"][bs] = pairs_per_sec(
+            lambda: score_pairs(tokenizer, model, query, passages, batch_size=bs, max_length=args.max_length),
+            n, args.repeats,
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
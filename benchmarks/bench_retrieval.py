@@ -0,0 +1,419 @@
+"""
+End-to-end retrieval benchmark: per-stage latency and relevance.
+
+Runs fully offline on the fixture corpus (benchmarks/fixtures) or a
+synthetic one, with a hashing stub embedder in place of a network model.
+
+Stages timed (p50/p95/p99 per call, throughput):
+- chunking       backend word-window chunker (or the app's sentence chunker)
+- embedding      stub embedder, in batches
+- dense_search   query embedding + brute-force cosine (or Chroma in-memory)
+- bm25_search    backend BM25Index
+- fusion         backend/rag/fusion.py
+- rerank         cross-encoder via backend/rag/cross_encoder.py (skipped
+                 when the model cannot be loaded)
+- context_build  app/rag/context_builder.py
+
+Relevance (recall@k, MRR, nDCG) is computed at document level for the
+dense, bm25, fused and reranked rankings against the qrels file.
+
+Usage:
+    python -m benchmarks.bench_retrieval --output bench.json
+    python -m benchmarks.bench_retrieval --synthetic 5000 --no-rerank
+    python -m benchmarks.bench_retrieval --baseline bench.json   # exit 1 on regression
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from backend.rag.bm25 import BM25Index, tokenize
+from backend.rag.chunking import chunk_words
+from backend.rag.fusion import fuse
+from app.rag.context_builder import build_context
+from benchmarks.retrieval_eval import dedup_ranking, evaluate, latency_summary
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+# -------------------------------------------------------
+# Corpus + qrels
+# -------------------------------------------------------
+
+def load_fixture(corpus_path: str, qrels_path: str):
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    with open(qrels_path, "r", encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+    return corpus, queries
+
+
+def synthetic_fixture(num_docs: int, num_queries: int, doc_len: int = 120, seed: int = 0):
+    """
+    Topic-structured corpus: each doc mixes words from one topic with
+    Zipf-distributed common words. Each query samples topic words from a
+    target doc (grade 2); other docs containing every query word get
+    grade 1.
+    """
+    rng = np.random.default_rng(seed)
+    num_topics = max(5, num_docs // 50)
+    topic_words = [[f"topic{t}w{j}" for j in range(40)] for t in range(num_topics)]
+
+    corpus, doc_topic, doc_words = [], [], []
+    for i in range(num_docs):
+        t = int(rng.integers(num_topics))
+        n_topic = doc_len * 2 // 5
+        words = list(rng.choice(topic_words[t], size=n_topic))
+        words += [f"c{w}" for w in (rng.zipf(1.3, size=doc_len - n_topic) - 1) % 5000]
+        rng.shuffle(words)
+        corpus.append({"id": f"doc{i}", "text": " ".join(words)})
+        doc_topic.append(t)
+        doc_words.append(set(words))
+
+    queries = []
+    for q in range(num_queries):
+        target = int(rng.integers(num_docs))
+        own = sorted(w for w in doc_words[target] if w.startswith("topic"))
+        terms = list(rng.choice(own, size=min(3, len(own)), replace=False))
+
+        relevant = {corpus[target]["id"]: 2}
+        for i in range(num_docs):
+            if i != target and doc_topic[i] == doc_topic[target]:
+                if doc_words[i].issuperset(terms):
+                    relevant[corpus[i]["id"]] = 1
+
+        queries.append({"id": f"q{q}", "query": " ".join(terms), "relevant": relevant})
+
+    return corpus, queries
+
+
+# -------------------------------------------------------
+# Stub embedder (offline, deterministic)
+# -------------------------------------------------------
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of word unigrams and character trigrams,
+    L2-normalised. Cheap and deterministic; good enough to exercise the
+    dense path and give it non-trivial recall.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str):
+        tokens = tokenize(text)
+        feats = list(tokens)
+        for tok in tokens:
+            padded = f"#{tok}#"
+            feats.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return feats
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = int.from_bytes(hashlib.md5(feat.encode("utf-8")).digest()[:8], "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+
+# -------------------------------------------------------
+# Dense stores
+# -------------------------------------------------------
+
+class NumpyDenseStore:
+    def __init__(self, embedder, vectors: np.ndarray, chunks: List[dict]):
+        self.embedder = embedder
+        self.vectors = vectors
+        self.chunks = chunks
+
+    def search(self, query: str, k: int) -> List[dict]:
+        q = self.embedder([query])[0]
+        sims = self.vectors @ q
+        k = min(k, len(sims))
+        idx = np.argpartition(-sims, k - 1)[:k]
+        idx = idx[np.argsort(-sims[idx], kind="stable")]
+        return [
+            dict(self.chunks[i], score=float(1.0 - sims[i]))  # cosine distance
+            for i in idx
+        ]
+
+
+class ChromaDenseStore:
+    """
+    In-memory Chroma collection fed with precomputed stub embeddings.
+    """
+
+    def __init__(self, embedder, vectors: np.ndarray, chunks: List[dict]):
+        import chromadb
+        from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+        class _StubEF(EmbeddingFunction[Documents]):
+            def __call__(self, input: Documents) -> Embeddings:
+                return embedder(list(input)).tolist()
+
+        self.chunks = {c["id"]: c for c in chunks}
+        self.collection = chromadb.EphemeralClient().create_collection(
+            name="bench", metadata={"hnsw:space": "cosine"}, embedding_function=_StubEF()
+        )
+        for start in range(0, len(chunks), 1000):
+            part = chunks[start:start + 1000]
+            self.collection.add(
+                ids=[c["id"] for c in part],
+                documents=[c["text"] for c in part],
+                embeddings=vectors[start:start + 1000].tolist(),
+            )
+
+    def search(self, query: str, k: int) -> List[dict]:
+        res = self.collection.query(query_texts=[query], n_results=k)
+        return [
+            dict(self.chunks[cid], score=float(dist))
+            for cid, dist in zip(res["ids"][0], res["distances"][0])
+        ]
+
+
+# -------------------------------------------------------
+# Reranker (optional)
+# -------------------------------------------------------
+
+def load_reranker(model_name: str):
+    """
+    Returns (rerank(query, docs), None), or (None, reason) if the model
+    cannot be loaded.
+    """
+    try:
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        from backend.rag.cross_encoder import score_pairs
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+    def rerank(query: str, docs: List[dict]) -> List[dict]:
+        scores = score_pairs(tokenizer, model, query, [d["text"] for d in docs])
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [dict(docs[i], rerank_score=float(scores[i])) for i in order]
+
+    return rerank, None
+
+
+# -------------------------------------------------------
+# Benchmark
+# -------------------------------------------------------
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - start
+
+
+def chunk_corpus(corpus, args):
+    if args.chunker == "app":
+        from app.rag.chunking import semantic_adaptive_chunk
+        split = lambda text: semantic_adaptive_chunk(text, max_tokens=args.chunk_size)
+    else:
+        split = lambda text: chunk_words(text, args.chunk_size)
+
+    chunks, latencies = [], []
+    for doc in corpus:
+        pieces, elapsed = timed(split, doc["text"])
+        latencies.append(elapsed)
+        for i, text in enumerate(pieces):
+            chunks.append({"id": f"{doc['id']}#{i}", "doc_id": doc["id"], "text": text})
+    return chunks, latencies
+
+
+def run(args) -> Dict:
+    if args.synthetic:
+        corpus, queries = synthetic_fixture(args.synthetic, args.queries)
+        corpus_name = f"synthetic-{args.synthetic}"
+    else:
+        corpus, queries = load_fixture(args.corpus, args.qrels)
+        corpus_name = os.path.relpath(args.corpus)
+
+    stages: Dict[str, Dict] = {}
+    ks = [int(k) for k in args.ks.split(",")]
+    k_max = max(ks)
+
+    # ---- Chunking ----
+    chunks, lat = chunk_corpus(corpus, args)
+    stages["chunking"] = latency_summary(lat, len(corpus), "docs")
+
+    # ---- Embedding (stub) ----
+    embedder = HashingEmbedder(args.dim)
+    vectors, lat = [], []
+    for start in range(0, len(chunks), args.embed_batch):
+        batch, elapsed = timed(embedder, [c["text"] for c in chunks[start:start + args.embed_batch]])
+        vectors.append(batch)
+        lat.append(elapsed)
+    vectors = np.vstack(vectors)
+    stages["embedding"] = latency_summary(lat, len(chunks), "texts")
+
+    # ---- Index build ----
+    store_cls = ChromaDenseStore if args.dense == "chroma" else NumpyDenseStore
+    store, elapsed = timed(store_cls, embedder, vectors, chunks)
+    stages["dense_build"] = latency_summary([elapsed], len(chunks), "chunks")
+
+    metas = [{"source": c["doc_id"], "page": 0} for c in chunks]
+    bm25, elapsed = timed(BM25Index.build, [c["text"] for c in chunks], metas, [c["id"] for c in chunks])
+    bm25.prepare()
+    stages["bm25_build"] = latency_summary([elapsed], len(chunks), "chunks")
+
+    rerank, rerank_skipped = (None, "disabled") if args.no_rerank else load_reranker(args.reranker)
+
+    # ---- Per-query pipeline ----
+    lat = {name: [] for name in ("dense_search", "bm25_search", "fusion", "rerank", "context_build")}
+    rankings = {name: [] for name in ("dense", "bm25", "fused", "reranked")}
+    doc_of = {c["id"]: c["doc_id"] for c in chunks}
+
+    for rep in range(args.repeats):
+        for q in queries:
+            dense, t = timed(store.search, q["query"], args.candidates)
+            lat["dense_search"].append(t)
+
+            sparse, t = timed(bm25.search, q["query"], args.candidates)
+            lat["bm25_search"].append(t)
+
+            fused, t = timed(
+                lambda: fuse([dense, sparse], method=args.fusion, higher_is_better=[False, False],
+                             limit=args.rerank_candidates)
+            )
+            lat["fusion"].append(t)
+
+            final = fused
+            if rerank is not None:
+                final, t = timed(rerank, q["query"], fused)
+                lat["rerank"].append(t)
+
+            _, t = timed(build_context, [d["text"] for d in final[:args.final_k]])
+            lat["context_build"].append(t)
+
+            if rep == 0:
+                rankings["dense"].append(dedup_ranking(doc_of[d["id"]] for d in dense))
+                rankings["bm25"].append(dedup_ranking(doc_of[d["id"]] for d in sparse))
+                rankings["fused"].append(dedup_ranking(doc_of[d["id"]] for d in fused))
+                if rerank is not None:
+                    rankings["reranked"].append(dedup_ranking(doc_of[d["id"]] for d in final))
+
+    for name, values in lat.items():
+        if values:
+            stages[name] = latency_summary(values, len(values), "queries")
+
+    qrels = [q["relevant"] for q in queries]
+    quality = {
+        name: evaluate(ranks, qrels, ks)
+        for name, ranks in rankings.items() if ranks
+    }
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "corpus": corpus_name,
+            "num_docs": len(corpus),
+            "num_chunks": len(chunks),
+            "num_queries": len(queries),
+            "dense": args.dense,
+            "fusion": args.fusion,
+            "reranker": None if rerank is None else args.reranker,
+            "rerank_skipped": rerank_skipped,
+            "k": k_max,
+        },
+        "stages": stages,
+        "quality": quality,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+# -------------------------------------------------------
+# Regression check against a previous run
+# -------------------------------------------------------
+
+def compare(current: Dict, baseline: Dict, latency_tol: float, quality_tol: float) -> List[str]:
+    """
+    Regressions: p95 slower than baseline by more than latency_tol (ratio),
+    or any relevance metric lower by more than quality_tol (absolute).
+    """
+    regressions = []
+
+    for stage, cur in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base and base["p95_ms"] > 0 and cur["p95_ms"] > base["p95_ms"] * (1 + latency_tol):
+            regressions.append(f"{stage}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+
+    for ranking, metrics in current["quality"].items():
+        base = baseline.get("quality", {}).get(ranking, {})
+        for metric, value in metrics.items():
+            if metric in base and value < base[metric] - quality_tol:
+                regressions.append(f"{ranking} {metric}: {base[metric]} -> {value}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(FIXTURES_DIR, "corpus.jsonl"))
+    parser.add_argument("--qrels", default=os.path.join(FIXTURES_DIR, "qrels.json"))
+    parser.add_argument("--synthetic", type=int, default=0, help="Use a synthetic corpus of N docs instead")
+    parser.add_argument("--queries", type=int, default=200, help="Synthetic queries")
+    parser.add_argument("--chunker", choices=["backend", "app"], default="backend")
+    parser.add_argument("--chunk-size", type=int, default=60)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--embed-batch", type=int, default=64)
+    parser.add_argument("--dense", choices=["numpy", "chroma"], default="numpy")
+    parser.add_argument("--fusion", choices=["rrf", "minmax", "zscore"], default="rrf")
+    parser.add_argument("--candidates", type=int, default=10, help="Per-retriever top k")
+    parser.add_argument("--rerank-candidates", type=int, default=20)
+    parser.add_argument("--reranker", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--no-rerank", action="store_true")
+    parser.add_argument("--final-k", type=int, default=5)
+    parser.add_argument("--ks", default="1,5,10")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    parser.add_argument("--baseline", default=None, help="Previous JSON output to compare against")
+    parser.add_argument("--latency-tolerance", type=float, default=0.2)
+    parser.add_argument("--quality-tolerance", type=float, default=0.01)
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("corpus") != results["meta"]["corpus"]:
+            print("WARNING baseline was run on a different corpus", file=sys.stderr)
+        regressions = compare(results, baseline, args.latency_tolerance, args.quality_tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Relevance and latency metrics shared by the retrieval benchmarks.
+
+Rankings are lists of doc ids (best first); qrels map doc id -> graded
+relevance (0 = not relevant). Every metric is averaged over queries by
+the caller.
+"""
+
+import math
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+def dedup_ranking(doc_ids: Sequence[str]) -> List[str]:
+    """
+    Collapse chunk-level results to doc level, keeping first occurrence.
+    """
+    seen = set()
+    out = []
+    for d in doc_ids:
+        if d not in seen:
+            seen.add(d)
+            out.append(d)
+    return out
+
+
+def recall_at_k(ranking: Sequence[str], qrels: Dict[str, int], k: int) -> float:
+    relevant = {d for d, rel in qrels.items() if rel > 0}
+    if not relevant:
+        return 0.0
+    return len(relevant.intersection(ranking[:k])) / len(relevant)
+
+
+def mrr_at_k(ranking: Sequence[str], qrels: Dict[str, int], k: int) -> float:
+    for rank, d in enumerate(ranking[:k], start=1):
+        if qrels.get(d, 0) > 0:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(ranking: Sequence[str], qrels: Dict[str, int], k: int) -> float:
+    def dcg(grades):
+        return sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(grades))
+
+    ideal = dcg(sorted((g for g in qrels.values() if g > 0), reverse=True)[:k])
+    if ideal == 0:
+        return 0.0
+    return dcg([qrels.get(d, 0) for d in ranking[:k]]) / ideal
+
+
+def evaluate(rankings: List[List[str]], qrels: List[Dict[str, int]], ks: Sequence[int]) -> Dict[str, float]:
+    """
+    Mean recall@k for each k, MRR and nDCG at the largest k.
+    """
+    k_max = max(ks)
+    out = {}
+    for k in ks:
+        out[f"recall@{k}"] = float(np.mean([recall_at_k(r, q, k) for r, q in zip(rankings, qrels)]))
+    out[f"mrr@{k_max}"] = float(np.mean([mrr_at_k(r, q, k_max) for r, q in zip(rankings, qrels)]))
+    out[f"ndcg@{k_max}"] = float(np.mean([ndcg_at_k(r, q, k_max) for r, q in zip(rankings, qrels)]))
+    return {name: round(v, 4) for name, v in out.items()}
+
+
+def latency_summary(latencies_s: Sequence[float], items: int, unit: str) -> Dict[str, float]:
+    """
+    p50/p95/p99 per call in ms, plus throughput in `unit`s per second.
+    """
+    lat = np.asarray(latencies_s) * 1000
+    total = float(np.sum(latencies_s))
+    return {
+        "calls": len(latencies_s),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "throughput": round(items / total, 1) if total > 0 else None,
+        "unit": f"{unit}/s",
+    }
@@ -89,11 +89,25 @@ $("trainBtn").addEventListener("click", async () => {
 
         const data = await response.json();
 
+        // Training runs as a background job: poll until it ends
+        let job = { status: data.status };
+        while (!["succeeded", "failed", "cancelled"].includes(job.status)) {
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+            job = await (await fetch(`${API_BASE}/jobs/${data.job_id}`)).json();
+            showMessage(trainStatus, `Training ${job.status}...`);
+        }
+
+        if (job.status !== "succeeded") {
+            showMessage(trainStatus, `Training ${job.status}: ${job.error || ""}`, true);
+            return;
+        }
+
         // Display final training status
         trainStatus.innerHTML = `
             <h3>Training Complete 🎉</h3>
-            <p><strong>Message:</strong> ${data.message}</p>
-            <p><strong>Saved Model Path:</strong> ${data.model_path}</p>
+            <p><strong>Job:</strong> ${data.job_id}</p>
+            <p><strong>Version:</strong> ${job.result.version} (swapping in once warmed)</p>
+            <pre>${job.result.logs}</pre>
         `;
         trainStatus.style.color = "green";
     } catch (err) {
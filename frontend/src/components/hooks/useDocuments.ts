@@ -1,4 +1,5 @@
 import { useState } from "react";
+import { waitForJob } from "@/lib/utils";
 
 interface DocumentsListResponse {
   documents: string[];
@@ -38,7 +39,10 @@ export function useDocuments(apiBase: string = "http://localhost:8000") {
         body: formData
       });
 
-      const json: DocumentsListResponse = await res.json();
+      // Indexing runs as a background job
+      const json: DocumentsListResponse & { job_id: string } = await res.json();
+      const job = await waitForJob(apiBase, json.job_id);
+      if (job.status !== "succeeded") setError(job.error || "Indexing failed.");
       return json.documents;
     } catch (err) {
       setError("Failed to upload documents.");
@@ -76,8 +80,9 @@ export function useDocuments(apiBase: string = "http://localhost:8000") {
         method: "POST"
       });
 
-      const data = await res.json();
-      return data.indexed_chunks || 0;
+      const { job_id } = await res.json();
+      const job = await waitForJob(apiBase, job_id);
+      return job.result?.indexed_chunks || 0;
     } catch (err) {
       setError("Failed to reindex documents.");
       return 0;
@@ -1,4 +1,5 @@
 import { useState } from "react";
+import { waitForJob } from "@/lib/utils";
 
 interface TrainRerankerRequest {
   samples: Array<{
@@ -11,8 +12,9 @@ interface TrainRerankerRequest {
 }
 
 interface TrainRerankerResponse {
-  status: string;
+  version: string;
   model_path: string;
+  activate: boolean;
 }
 
 export function useModels(apiBase: string = "http://localhost:8000") {
@@ -32,16 +34,26 @@ export function useModels(apiBase: string = "http://localhost:8000") {
         body: JSON.stringify(request)
       });
 
-      const json: TrainRerankerResponse | { detail: string } = await res.json();
+      const json = await res.json();
 
       if (!res.ok) {
-        setError((json as any).detail || "Training failed.");
+        setError(json.detail || "Training failed.");
+        setStatus(null);
+        return null;
+      }
+
+      // Training runs as a background job
+      const job = await waitForJob<TrainRerankerResponse>(apiBase, json.job_id, (j) =>
+        setStatus(`Training reranker model… (${j.status})`)
+      );
+      if (job.status !== "succeeded") {
+        setError(job.error || `Training ${job.status}.`);
         setStatus(null);
         return null;
       }
 
       setStatus("Training completed successfully.");
-      return json as TrainRerankerResponse;
+      return job.result;
     } catch (err) {
       setError("Failed to reach the server.");
       return null;
@@ -31,3 +31,18 @@ export function truncate(text: string, max = 120): string {
   if (text.length <= max) return text;
   return text.substring(0, max) + "…";
 }
+
+// Poll GET /jobs/{id} until the background job ends; returns the final job
+export async function waitForJob<T = any>(
+  apiBase: string,
+  jobId: string,
+  onUpdate?: (job: any) => void,
+  intervalMs = 1500
+): Promise<{ status: string; result: T | null; error: string | null }> {
+  for (;;) {
+    const job = await (await fetch(`${apiBase}/jobs/${jobId}`)).json();
+    onUpdate?.(job);
+    if (["succeeded", "failed", "cancelled"].includes(job.status)) return job;
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
@@ -9,8 +9,15 @@ interface ChatMessage {
   role: "user" | "assistant";
   content: string;
   sources?: any[];
+  status?: string;
 }
 
+const STATUS_LABELS: Record<string, string> = {
+  started: "Searching documents…",
+  retrieved: "Ranking results…",
+  reranked: "Generating answer…",
+};
+
 const ChatPage: React.FC = () => {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [query, setQuery] = useState("");
@@ -62,6 +69,43 @@ const ChatPage: React.FC = () => {
         return;
       }
 
+      const updateLast = (fn: (msg: ChatMessage) => void) => {
+        setMessages((prev) => {
+          const updated = [...prev];
+          const last = updated[updated.length - 1];
+          if (!last || last.role !== "assistant") return prev;
+          fn(last);
+          return updated;
+        });
+      };
+
+      // Events: progress → sources → token… → meta (heartbeats in between)
+      const handleEvent = (evt: any) => {
+        if (evt.type === "progress") {
+          const status = STATUS_LABELS[evt.stage];
+          if (status) updateLast((last) => (last.status = status));
+        } else if (evt.type === "sources" || evt.type === "meta") {
+          const sources = evt.sources || [];
+          updateLast((last) => {
+            last.sources = sources;
+            if (evt.type === "meta") last.status = undefined;
+          });
+        } else if (evt.type === "token") {
+          const token: string = evt.content || "";
+          if (!token) return;
+          updateLast((last) => {
+            last.content += token;
+            last.status = undefined;
+          });
+          scrollToBottom();
+        } else if (evt.type === "error") {
+          updateLast((last) => {
+            last.content = `⚠️ ${evt.detail || "Request failed."}`;
+            last.status = undefined;
+          });
+        }
+      };
+
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let buffer = "";
@@ -78,36 +122,11 @@ const ChatPage: React.FC = () => {
           const trimmed = line.trim();
           if (!trimmed) continue;
 
-          let evt: any;
           try {
-            evt = JSON.parse(trimmed);
+            handleEvent(JSON.parse(trimmed));
           } catch {
             continue;
           }
-
-          if (evt.type === "token") {
-            const token: string = evt.content || "";
-            if (!token) continue;
-
-            setMessages((prev) => {
-              const updated = [...prev];
-              const last = updated[updated.length - 1];
-              if (!last || last.role !== "assistant") return prev;
-              last.content += token;
-              return updated;
-            });
-
-            scrollToBottom();
-          } else if (evt.type === "meta") {
-            const sources = evt.sources || [];
-            setMessages((prev) => {
-              const updated = [...prev];
-              const last = updated[updated.length - 1];
-              if (!last || last.role !== "assistant") return prev;
-              last.sources = sources;
-              return updated;
-            });
-          }
         }
       }
 
@@ -115,17 +134,7 @@ const ChatPage: React.FC = () => {
       const finalLine = buffer.trim();
       if (finalLine) {
         try {
-          const evt = JSON.parse(finalLine);
-          if (evt.type === "meta") {
-            const sources = evt.sources || [];
-            setMessages((prev) => {
-              const updated = [...prev];
-              const last = updated[updated.length - 1];
-              if (!last || last.role !== "assistant") return prev;
-              last.sources = sources;
-              return updated;
-            });
-          }
+          handleEvent(JSON.parse(finalLine));
         } catch {
           // ignore
         }
@@ -163,6 +172,9 @@ const ChatPage: React.FC = () => {
                 }`}
               >
                 <CardContent>
+                  {msg.status && !msg.content && (
+                    <p className="text-sm italic text-muted-foreground">{msg.status}</p>
+                  )}
                   <p className="whitespace-pre-wrap">{msg.content}</p>
 
                   {msg.sources && msg.sources.length > 0 && (
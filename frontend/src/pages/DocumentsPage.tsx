@@ -2,7 +2,7 @@ import React, { useEffect, useState } from "react";
 import { Button } from "@/components/ui/Button";
 import { Card, CardHeader, CardTitle, CardContent } from "@/components/ui/Card";
 import { Input } from "@/components/ui/Input";
-import { formatBytes } from "@/lib/utils";
+import { formatBytes, waitForJob } from "@/lib/utils";
 import { FileText, Upload, Trash2, RefreshCw } from "lucide-react";
 
 const API_BASE = "http://localhost:8000";
@@ -41,8 +41,10 @@ const DocumentsPage: React.FC = () => {
       body: formData
     });
 
+    // Indexing runs as a background job
     const data = await res.json();
     setDocs(data.documents);
+    await waitForJob(API_BASE, data.job_id);
     setUploading(false);
     setFiles(null);
   };
@@ -58,7 +60,9 @@ const DocumentsPage: React.FC = () => {
 
   const reindex = async () => {
     setReindexing(true);
-    await fetch(`${API_BASE}/documents/reindex`, { method: "POST" });
+    const res = await fetch(`${API_BASE}/documents/reindex`, { method: "POST" });
+    const { job_id } = await res.json();
+    await waitForJob(API_BASE, job_id);
     setReindexing(false);
   };
 
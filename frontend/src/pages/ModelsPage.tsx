@@ -1,4 +1,5 @@
 import React, { useState } from "react";
+import { waitForJob } from "@/lib/utils";
 import { Button } from "@/components/ui/Button";
 import { Input } from "@/components/ui/Input";
 import { Textarea } from "@/components/ui/Textarea";
@@ -46,8 +47,11 @@ const ModelsPage: React.FC = () => {
     });
 
     const json = await res.json();
-    if (res.ok) setStatus(`Model trained: ${json.model_path}`);
-    else setStatus(`Error: ${json.detail}`);
+    if (res.ok) {
+      const job = await waitForJob(backendUrl, json.job_id, (j) => setStatus(`Training model… (${j.status})`));
+      if (job.status === "succeeded") setStatus(`Model trained: version ${job.result.version} (swapping in once warmed)`);
+      else setStatus(`Error: ${job.error || job.status}`);
+    } else setStatus(`Error: ${json.detail}`);
 
     setLoading(false);
   };
@@ -5,6 +5,13 @@
 export interface QueryRequest {
   query: string;
   top_k?: number;
+  include_timings?: boolean;
+  // Metadata filters, applied inside retrieval
+  sources?: string[];   // document filenames
+  page_from?: number;   // 1-based, inclusive
+  page_to?: number;
+  date_from?: string;   // YYYY-MM-DD, inclusive
+  date_to?: string;
 }
 
 export interface RetrievedSource {
@@ -13,13 +20,47 @@ export interface RetrievedSource {
   chunk_index?: number;
   score?: number;
   page?: number;
+  page_end?: number;
+  reranker_version?: string;
+}
+
+export interface RetrievalLegTiming {
+  ms: number;
+  status: "ok" | "timeout" | "error";
+  hits: number;
 }
 
 export interface QueryResponse {
   answer: string;
   sources: RetrievedSource[];
+  cache?: "exact" | "semantic";
+  timings?: Record<string, RetrievalLegTiming>;
+  stage_ms?: Record<string, number>;
+  reranker_version?: string;
+  // Absent on cache hits (no LLM call)
+  prompt_tokens?: number;
+  context_chunks?: number;
 }
 
+// /query-stream JSON-lines events, in order:
+// progress* → sources → token* → meta (heartbeat at any point; error ends the stream)
+export type QueryStreamEvent =
+  | { type: "progress"; stage: "started" | "retrieved" | "reranked"; count?: number }
+  | { type: "heartbeat" }
+  | { type: "sources"; sources: RetrievedSource[]; cache?: "exact" | "semantic" }
+  | { type: "token"; content: string }
+  | {
+      type: "meta";
+      sources: RetrievedSource[];
+      cache?: "exact" | "semantic";
+      timings?: Record<string, RetrievalLegTiming>;
+      stage_ms?: Record<string, number>;
+      reranker_version?: string;
+      prompt_tokens?: number;
+      context_chunks?: number;
+    }
+  | { type: "error"; detail: string };
+
 // ----------------------------
 // Documents API
 // ----------------------------
@@ -28,8 +69,44 @@ export interface DocumentListResponse {
   documents: string[];
 }
 
+export interface ReindexProgress {
+  batch: number;
+  batch_chunks: number;
+  indexed_chunks: number;
+  elapsed_sec: number;
+}
+
+// ----------------------------
+// Background jobs (/jobs)
+// ----------------------------
+
+export type JobStatus = "queued" | "running" | "succeeded" | "failed" | "cancelled";
+
+export interface JobSubmitted {
+  job_id: string;
+  status: JobStatus;
+}
+
+export interface Job<T = unknown> {
+  id: string;
+  kind: string;
+  status: JobStatus;
+  params: Record<string, unknown>;
+  progress: Record<string, unknown>;
+  result: T | null;
+  error: string | null;
+  created_at: number;
+  started_at: number | null;
+  finished_at: number | null;
+}
+
+// Result of a finished "reindex" / "ingest" job
 export interface ReindexResponse {
   indexed_chunks: number;
+  batches?: number;
+  elapsed_sec?: number;
+  chunks_per_sec?: number;
+  progress?: ReindexProgress[];
 }
 
 // ----------------------------
@@ -46,9 +123,18 @@ export interface TrainRerankerRequest {
   samples: TrainingSample[];
   num_epochs: number;
   batch_size: number;
+  activate?: boolean;
+}
+
+export interface RerankerSwapStatus {
+  active: string;
+  history: string[];
+  swap: { state: "idle" | "loading" | "error"; target: string | null; error: string | null };
 }
 
+// Result of a finished "train_reranker" job
 export interface TrainRerankerResponse {
-  status: string;
+  version: string;
   model_path: string;
+  activate: boolean;
 }
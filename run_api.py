@@ -1,4 +1,17 @@
+import logging
+
 import uvicorn
 
+from backend.config import API_WORKERS
+
 if __name__ == "__main__":
-    uvicorn.run("app.api:app", host="0.0.0.0", port=8000, reload=True)
+    if API_WORKERS > 1:
+        # Production: build the shared read-only indexes once, then start
+        # the workers; each maps them instead of loading its own copy
+        from app.ingestion import prepare_shared_indexes
+
+        logging.basicConfig(level=logging.INFO)
+        prepare_shared_indexes()
+        uvicorn.run("app.api:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
+    else:
+        uvicorn.run("app.api:app", host="0.0.0.0", port=8000, reload=True)